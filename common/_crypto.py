@@ -1,22 +1,32 @@
+import concurrent.futures
 import hashlib
 import hmac
 import logging
 import os
+from abc import ABC, abstractmethod
 from base64 import b64decode
+from functools import lru_cache
 from hashlib import sha1
-from typing import Tuple, Union
+from typing import List, Optional, Tuple, Union
 
-import boto3
 import eth_utils
 from Crypto.Hash import keccak
 from botocore.exceptions import ClientError
-from eth_account import Account as EthAccount
 from eth_utils import to_checksum_address
 from pyasn1.codec.der.decoder import decode as der_decode
 from pyasn1.codec.der.encoder import encode as der_encode
 from pyasn1.type import namedtype, univ
 from pyasn1.type.univ import SequenceOf, Integer
 
+from common.utils.aws import fetch_kms_key_id, get_client
+
+# Number of derived addresses kept in memory. One garage address is ~100 bytes with key.
+DERIVE_CACHE_SIZE = 65536
+# Order of secp256k1 curve
+SECP256K1_N = int.from_bytes(b64decode("/////////////////////rqu3OavSKA7v9JejNA2QUE="), "big")
+# Concurrent KMS sign requests in batch signing
+KMS_SIGN_CONCURRENCY = 8
+
 
 class ECDSASignatureRecord(univ.Sequence):
     componentType = namedtype.NamedTypes(
@@ -39,9 +49,46 @@ class SPKIRecord(univ.Sequence):
     )
 
 
-class Account:
+class Signer(ABC):
+    """
+    Signer of 9c transactions.
+    Implementations only have to sign SHA256 message hash, and `sign_tx` makes DER encoded low-s signature.
+    """
+    address: str
+    pubkey: bytes
+
+    @abstractmethod
+    def _sign_hash(self, msg_hash: bytes) -> Tuple[int, int]:
+        """
+        Sign 32 bytes message hash and return (r, s).
+        """
+        raise NotImplementedError
+
+    def get_item_garage_addr(self, item_id: str):
+        return derive_address_cached(derive_address_cached(self.address, "garage"), item_id)
+
+    def sign_tx(self, unsigned_tx: bytes) -> bytes:
+        msg_hash = hashlib.sha256(unsigned_tx).digest()
+        r, s = self._sign_hash(msg_hash)
+
+        seq = SequenceOf(componentType=Integer())
+        seq.extend([r, min(s, SECP256K1_N - s)])
+        return der_encode(seq)
+
+    def sign_tx_list(self, unsigned_tx_list: List[bytes]) -> List[bytes]:
+        """
+        Sign many transactions. Result is in the same order with `unsigned_tx_list`.
+        """
+        return [self.sign_tx(unsigned_tx) for unsigned_tx in unsigned_tx_list]
+
+
+class Account(Signer):
+    """
+    Signer using AWS KMS key. Every signature costs one KMS `sign` request.
+    """
+
     def __init__(self, kms_key: str):
-        self.client = boto3.client("kms", region_name=os.environ.get("REGION_NAME"))  # specify region
+        self.client = get_client("kms", os.environ.get("REGION_NAME"))  # specify region
         self._kms_key: str = kms_key
         try:
             self.pubkey_der: bytes = self.client.get_public_key(KeyId=self._kms_key)["PublicKey"]
@@ -54,9 +101,6 @@ class Account:
         record, _ = der_decode(self.pubkey_der, asn1Spec=SPKIRecord())
         self.pubkey: bytes = record["subjectPublicKey"].asOctets()
 
-    def get_item_garage_addr(self, item_id: str):
-        return derive_address(derive_address(self.address, "garage"), item_id)
-
     def __public_key_int_to_eth_address(self, pubkey: int) -> str:
         """
         Given an integer public key, calculate the ethereum address.
@@ -99,6 +143,9 @@ class Account:
         Given a message hash, r, s and an ethereum address, recover the
         recovery parameter v.
         """
+        # eth_account takes most of import time of this module and only used here
+        from eth_account import Account as EthAccount
+
         acc = EthAccount()
         recovered = acc._recover_hash(msg_hash, vrs=(27, r, s))
         recovered2 = acc._recover_hash(msg_hash, vrs=(28, r, s))
@@ -132,16 +179,62 @@ class Account:
         act_signature = signature["Signature"]
         return self.__get_sig_r_s_v(msg_hash, act_signature, self.address)
 
-    def sign_tx(self, unsigned_tx: bytes) -> bytes:
-        msg_hash = hashlib.sha256(unsigned_tx).digest()
+    def _sign_hash(self, msg_hash: bytes) -> Tuple[int, int]:
         r, s, _ = self.__sign_msg_hash(msg_hash)
+        return r, s
 
-        n = int.from_bytes(
-            b64decode("/////////////////////rqu3OavSKA7v9JejNA2QUE="), "big"
-        )
-        seq = SequenceOf(componentType=Integer())
-        seq.extend([r, min(s, n - s)])
-        return der_encode(seq)
+    def sign_tx_list(self, unsigned_tx_list: List[bytes]) -> List[bytes]:
+        # KMS client is thread safe. Send sign requests concurrently to hide network round-trip.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=KMS_SIGN_CONCURRENCY) as executor:
+            return list(executor.map(self.sign_tx, unsigned_tx_list))
+
+
+class LocalAccount(Signer):
+    """
+    Signer using in-process secp256k1 private key. This is for tests and load runs, not for real assets.
+    """
+
+    def __init__(self, private_key: Optional[Union[str, bytes]] = None):
+        """
+        :param private_key: Hex string or bytes of private key. New random key is used if not provided.
+        """
+        # eth_keys comes with eth_account and only local signer needs it
+        from eth_keys import keys
+
+        if private_key is None:
+            private_key = os.urandom(32)
+        elif isinstance(private_key, str):
+            private_key = bytes.fromhex(private_key[2:] if private_key.startswith("0x") else private_key)
+        self._key = keys.PrivateKey(private_key)
+        self.address: str = self._key.public_key.to_checksum_address()
+        self.pubkey: bytes = b"\x04" + self._key.public_key.to_bytes()
+
+    def _sign_hash(self, msg_hash: bytes) -> Tuple[int, int]:
+        signature = self._key.sign_msg_hash(msg_hash)
+        return signature.r, signature.s
+
+
+def get_account(stage: str, region: str) -> Signer:
+    """
+    Get signer selected by `SIGNER` env. variable.
+    Signer is kept for the process lifetime (e.g., Lambda container), so KMS public key is fetched only once.
+
+    - `kms` (default): AWS KMS key of given stage
+    - `local`: In-process key from `LOCAL_SIGNER_KEY`. New random key is used if not set.
+      This cannot be used in mainnet.
+    """
+    return _load_account(os.environ.get("SIGNER", "kms").lower(), stage, region, os.environ.get("LOCAL_SIGNER_KEY"))
+
+
+@lru_cache(maxsize=None)
+def _load_account(signer: str, stage: str, region: str, local_key: Optional[str]) -> Signer:
+    if signer == "kms":
+        return Account(fetch_kms_key_id(stage, region))
+    if signer == "local":
+        if stage == "mainnet":
+            raise ValueError("Local signer cannot be used in mainnet")
+        return LocalAccount(local_key)
+    raise ValueError(f"Unknown signer {signer}. Use one of `kms` or `local`.")
 
 
 def derive_address(address: Union[str, bytes], key: Union[str, bytes], get_byte: bool = False) -> Union[bytes, str]:
@@ -168,6 +261,15 @@ def derive_address(address: Union[str, bytes], key: Union[str, bytes], get_byte:
     return derived if get_byte else checksum_encode(derived)
 
 
+@lru_cache(maxsize=DERIVE_CACHE_SIZE)
+def derive_address_cached(address: str, key: str) -> str:
+    """
+    Memoized `derive_address` for checksum encoded string result.
+    Cache is kept for the process lifetime and keyed by (address, key).
+    """
+    return derive_address(address, key)
+
+
 def checksum_encode(addr: bytes) -> str:  # Takes a 20-byte binary address as input
     """
     Convert input address to checksum encoded address without prefix "0x"
@@ -177,25 +279,8 @@ def checksum_encode(addr: bytes) -> str:  # Takes a 20-byte binary address as in
     :return: checksum encoded address as string
     """
     hex_addr = addr.hex()
-    checksum_buffer = ""
-
     # Treat the hex address as ascii/utf-8 for keccak256 hashing
     hashed_address = eth_utils.keccak(text=hex_addr).hex()
-
-    # Iterate over each character in the hex address
-    for nibble_index, character in enumerate(hex_addr):
-        if character in "0123456789":
-            # We can't upper-case the decimal digits
-            checksum_buffer += character
-        elif character in "abcdef":
-            # Check if the corresponding hex digit (nibble) in the hash is 8 or higher
-            hashed_address_nibble = int(hashed_address[nibble_index], 16)
-            if hashed_address_nibble > 7:
-                checksum_buffer += character.upper()
-            else:
-                checksum_buffer += character
-        else:
-            raise eth_utils.ValidationError(
-                f"Unrecognized hex character {character!r} at position {nibble_index}"
-            )
-    return checksum_buffer
+    # Upper-case letters where the corresponding hex digit (nibble) in the hash is 8 or higher.
+    # Hex digits compare in the same order as their values, and decimal digits are not changed by `upper()`.
+    return "".join(c.upper() if h > "7" else c for c, h in zip(hex_addr, hashed_address))
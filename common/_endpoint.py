@@ -0,0 +1,188 @@
+import concurrent.futures
+import os
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type, TypeVar
+
+import requests
+
+from common import logger
+from common.consts import HOST_LIST
+
+T = TypeVar("T")
+
+HEALTH_CHECK_QUERY = {"query": "{ __typename }"}
+
+
+@dataclass
+class EndpointStat:
+    url: str
+    latency: Optional[float] = None  # EWMA of response time in seconds
+    success: int = 0
+    failure: int = 0
+    consecutive_failure: int = 0
+    open_until: float = 0  # Circuit is open (endpoint is not selected) until this monotonic time
+
+    @property
+    def is_open(self) -> bool:
+        return self.open_until > time.monotonic()
+
+
+class EndpointPool:
+    """
+    Pool of equivalent GQL endpoints (e.g., RPC nodes of one planet).
+
+    - Endpoint is selected randomly, weighted by inverse of its recent latency.
+    - Endpoint failed `failure_threshold` times in a row is excluded for `cooldown` seconds (circuit open).
+      After cooldown, the endpoint is selected again and one success closes the circuit.
+    - Failed call is retried transparently on another endpoint until all endpoints are tried.
+    """
+
+    def __init__(self, url_list: Iterable[str], *, timeout: float = 10, failure_threshold: int = 3,
+                 cooldown: float = 30, initial_latency: float = 0.5, latency_decay: float = 0.3):
+        url_list = [x for x in dict.fromkeys(url_list) if x]
+        if not url_list:
+            raise ValueError("At least one endpoint URL is required")
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.initial_latency = initial_latency
+        self.latency_decay = latency_decay
+        self._stat_dict: Dict[str, EndpointStat] = {url: EndpointStat(url=url) for url in url_list}
+        self._lock = threading.Lock()
+        self._http = requests.Session()
+
+    @property
+    def url_list(self) -> List[str]:
+        return list(self._stat_dict.keys())
+
+    def select(self, exclude: Iterable[str] = ()) -> str:
+        exclude = set(exclude)
+        with self._lock:
+            candidates = [x for x in self._stat_dict.values() if x.url not in exclude]
+            if not candidates:
+                raise ValueError("No endpoint left to select")
+            closed = [x for x in candidates if not x.is_open]
+            if not closed:
+                # Every endpoint is broken: try the one to be recovered first rather than failing without a try.
+                return min(candidates, key=lambda x: x.open_until).url
+            weights = [1 / max(x.latency if x.latency is not None else self.initial_latency, 0.001) for x in closed]
+            return random.choices(closed, weights=weights)[0].url
+
+    def record_success(self, url: str, latency: float):
+        with self._lock:
+            stat = self._stat_dict[url]
+            stat.success += 1
+            stat.consecutive_failure = 0
+            stat.open_until = 0
+            stat.latency = latency if stat.latency is None else (
+                    self.latency_decay * latency + (1 - self.latency_decay) * stat.latency
+            )
+
+    def record_failure(self, url: str):
+        with self._lock:
+            stat = self._stat_dict[url]
+            stat.failure += 1
+            stat.consecutive_failure += 1
+            if stat.consecutive_failure >= self.failure_threshold:
+                stat.open_until = time.monotonic() + self.cooldown
+                logger.warning(f"Endpoint {url} failed {stat.consecutive_failure} times in a row. "
+                               f"Exclude it for {self.cooldown} seconds.")
+
+    def call(self, fn: Callable[[str], T], retry_on: Tuple[Type[Exception], ...] = (Exception,)) -> T:
+        """
+        Call `fn` with selected endpoint URL. Retry with another endpoint if `fn` raises one of `retry_on`.
+
+        :param fn: Function receives endpoint URL
+        :param retry_on: Exceptions which mean endpoint failure.
+        :return: Return value of `fn`
+        """
+        tried = []
+        while True:
+            url = self.select(exclude=tried)
+            tried.append(url)
+            start = time.perf_counter()
+            try:
+                result = fn(url)
+            except retry_on as e:
+                self.record_failure(url)
+                if len(tried) >= len(self._stat_dict):
+                    raise e
+                logger.warning(f"Request to {url} failed: {e}. Retry with another endpoint.")
+                continue
+            self.record_success(url, time.perf_counter() - start)
+            return result
+
+    def post(self, json: Dict[str, Any], **kwargs) -> requests.Response:
+        """
+        POST to endpoint and retry to another endpoint on connection error or 5xx response.
+        Response of the last tried endpoint is returned when all endpoints failed with 5xx response.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        last_resp = None
+
+        def _post(url: str) -> requests.Response:
+            nonlocal last_resp
+            resp = self._http.post(url, json=json, **kwargs)
+            if resp.status_code >= 500:
+                last_resp = resp
+                raise requests.HTTPError(f"{resp.status_code} from {url}", response=resp)
+            return resp
+
+        try:
+            return self.call(_post, retry_on=(requests.RequestException,))
+        except requests.HTTPError:
+            if last_resp is not None:
+                return last_resp
+            raise
+
+    def health_check(self) -> Dict[str, bool]:
+        """
+        Send lightweight query to all endpoints concurrently and update their stats.
+        """
+
+        def _check(url: str) -> bool:
+            start = time.perf_counter()
+            try:
+                resp = self._http.post(url, json=HEALTH_CHECK_QUERY, timeout=self.timeout)
+                healthy = resp.status_code == 200
+            except requests.RequestException:
+                healthy = False
+            if healthy:
+                self.record_success(url, time.perf_counter() - start)
+            else:
+                self.record_failure(url)
+            return healthy
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(self._stat_dict)) as executor:
+            return dict(zip(self.url_list, executor.map(_check, self.url_list)))
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{**asdict(x), "open": x.is_open} for x in self._stat_dict.values()]
+
+
+_pool_dict: Dict[Tuple[str, ...], EndpointPool] = {}
+
+
+def get_pool(url_list: Iterable[str]) -> EndpointPool:
+    """
+    Get shared pool of given endpoints. Stats are kept for the process lifetime (e.g., Lambda container).
+    """
+    key = tuple(url_list)
+    if key not in _pool_dict:
+        _pool_dict[key] = EndpointPool(key)
+    return _pool_dict[key]
+
+
+def get_headless_pool(stage: Optional[str] = None, path: str = "/graphql") -> EndpointPool:
+    """
+    Get shared pool of headless nodes of given stage in `HOST_LIST`.
+
+    :param stage: Stage name. `STAGE` environment variable is used if not provided.
+    :param path: GQL path of endpoint. Use `/graphql/explorer` for explorer.
+    """
+    stage = stage or os.environ.get("STAGE", "development")
+    return get_pool(f"{host}{path}" for host in HOST_LIST.get(stage, HOST_LIST["development"]))
@@ -3,28 +3,68 @@ import logging
 import os
 from typing import Union, Dict, Any, Tuple, Optional
 
+import requests
 from gql import Client
 from gql.dsl import DSLSchema, dsl_gql, DSLQuery, DSLMutation
+from gql.transport import exceptions as transport_exceptions
 from gql.transport.requests import RequestsHTTPTransport
 from graphql import DocumentNode, ExecutionResult
 
+from common._endpoint import EndpointPool, get_pool
 from common.consts import CURRENCY_LIST
 
+# Exceptions which mean node failure, not a query failure. GQL request is retried on another node.
+NODE_ERRORS = tuple(
+    x for x in (
+        requests.RequestException,
+        transport_exceptions.TransportServerError,
+        transport_exceptions.TransportProtocolError,
+        # gql>=4 wraps connection errors of requests
+        getattr(transport_exceptions, "TransportConnectionFailed", None),
+    ) if x is not None
+)
+
 
 class GQL:
-    def __init__(self, url: str = f"{os.environ.get('HEADLESS')}/graphql"):
-        self._url = url
-        self.client = None
+    def __init__(self, url: Optional[str] = f"{os.environ.get('HEADLESS')}/graphql",
+                 pool: Optional[EndpointPool] = None):
+        """
+        :param url: Headless GQL URL. Ignored if `pool` is provided.
+        :param pool: Pool of headless GQL URLs. Requests fail over to another node in pool.
+        """
+        self.pool = pool or get_pool([url])
+        self._client_dict: Dict[str, Client] = {}
         self.ds = None
-        transport = RequestsHTTPTransport(url=self._url, verify=True, retries=2)
-        self.client = Client(transport=transport, fetch_schema_from_transport=True)
-        with self.client as _:
-            assert self.client.schema is not None
-            self.ds = DSLSchema(self.client.schema)
+        self.schema = self.pool.call(self._fetch_schema, retry_on=NODE_ERRORS)
+        self.ds = DSLSchema(self.schema)
+
+    @property
+    def client(self) -> Client:
+        return self._get_client(self.pool.select())
+
+    def _fetch_schema(self, url: str):
+        client = Client(transport=RequestsHTTPTransport(url=url, verify=True, retries=2),
+                        fetch_schema_from_transport=True)
+        with client as _:
+            assert client.schema is not None
+        self._client_dict[url] = client
+        return client.schema
+
+    def _get_client(self, url: str) -> Client:
+        if url not in self._client_dict:
+            # All nodes in pool serve the same schema. Reuse it instead of introspecting every node.
+            self._client_dict[url] = Client(
+                transport=RequestsHTTPTransport(url=url, verify=True, retries=2, timeout=int(self.pool.timeout)),
+                schema=self.schema,
+            )
+        return self._client_dict[url]
 
     def execute(self, query: DocumentNode) -> Union[Dict[str, Any], ExecutionResult]:
-        with self.client as sess:
-            return sess.execute(query)
+        def _execute(url: str):
+            with self._get_client(url) as sess:
+                return sess.execute(query)
+
+        return self.pool.call(_execute, retry_on=NODE_ERRORS)
 
     def get_next_nonce(self, address: str) -> int:
         """
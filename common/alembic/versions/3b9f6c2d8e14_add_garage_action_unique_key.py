@@ -0,0 +1,37 @@
+"""Add unique key of garage action history
+
+Revision ID: 3b9f6c2d8e14
+Revises: 6d2e9a0f51c8
+Create Date: 2023-12-07 10:41:19.226374
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '3b9f6c2d8e14'
+down_revision = '6d2e9a0f51c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('garage_action_history', sa.Column('action_index', sa.Integer(), nullable=True))
+    # Number existing garage actions of each Tx. in insert order, same as `sync_block` does.
+    op.execute("""
+        UPDATE garage_action_history h SET action_index = n.action_index
+        FROM (
+            SELECT id, row_number() OVER (PARTITION BY planet_id, tx_hash ORDER BY id) - 1 AS action_index
+            FROM garage_action_history
+        ) n
+        WHERE h.id = n.id
+    """)
+    op.alter_column('garage_action_history', 'action_index', nullable=False)
+    op.create_unique_constraint('garage_action_history_planet_id_tx_hash_action_index_key', 'garage_action_history',
+                                ['planet_id', 'tx_hash', 'action_index'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('garage_action_history_planet_id_tx_hash_action_index_key', 'garage_action_history',
+                       type_='unique')
+    op.drop_column('garage_action_history', 'action_index')
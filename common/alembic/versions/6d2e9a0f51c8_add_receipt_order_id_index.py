@@ -0,0 +1,26 @@
+"""Add receipt index of store order ID
+
+Revision ID: 6d2e9a0f51c8
+Revises: f2b8d41c7a93
+Create Date: 2023-12-06 15:08:42.530917
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '6d2e9a0f51c8'
+down_revision = 'f2b8d41c7a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Receipt table is large. Build index without locking writes of purchase API.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_receipt_store_order_id', 'receipt', ['store', 'order_id'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_receipt_store_order_id', table_name='receipt', postgresql_concurrently=True)
@@ -0,0 +1,29 @@
+"""Add receipt index for keyset pagination
+
+Revision ID: f2b8d41c7a93
+Revises: c81e4f2d6b57
+Create Date: 2023-12-04 10:41:27.118204
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'f2b8d41c7a93'
+down_revision = 'c81e4f2d6b57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Receipt table is large. Build indexes without locking writes of purchase API.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_receipt_purchased_at_id', 'receipt', ['purchased_at', 'id'],
+                        unique=False, postgresql_concurrently=True)
+        op.create_index('ix_receipt_agent_addr_purchased_at_id', 'receipt', ['agent_addr', 'purchased_at', 'id'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_receipt_agent_addr_purchased_at_id', table_name='receipt', postgresql_concurrently=True)
+        op.drop_index('ix_receipt_purchased_at_id', table_name='receipt', postgresql_concurrently=True)
@@ -307,3 +307,31 @@ class ProductRarity(Enum):
     EPIC = "Epic"
     UNIQUE = "Unique"
     LEGENDARY = "Legendary"
+
+
+class GoldenDustWorkStatus(Enum):
+    """
+    # GoldenDustWorkStatus
+    ---
+    Validation status of Golden Dust by NCG request. Value is shown in Golden Dust work sheet.
+    """
+    REQ = "Requested"
+    ACK = "Acknowledged"
+    VALID = "Valid"
+    INVALID = "Invalid"
+    INVALID_CAN_REFUND = "Invalid - Can Refund"
+    INVALID_CANNOT_REFUND = "Invalid - Cannot Refund"
+
+
+class GoldenDustTxStatus(Enum):
+    """
+    # GoldenDustTxStatus
+    ---
+    Status of Golden Dust request/unload Tx. Value is shown in Golden Dust work sheet.
+    """
+    NOT_CREATED = "Not Created"
+    NOT_FOUND = "Not Found"
+    STAGING = "Staging"
+    SUCCESS = "Success"
+    INVALID = "Invalid"
+    FAILURE = "Failure"
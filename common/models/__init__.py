@@ -2,4 +2,5 @@ __all__ = [
     "garage",
     "receipt",
     "product",
+    "golden_dust",
 ]
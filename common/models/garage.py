@@ -1,8 +1,11 @@
-from sqlalchemy import BigInteger, Column, Enum, ForeignKey, Integer, Numeric, Text
+from sqlalchemy import (
+    BigInteger, Column, Enum, ForeignKey, Index, Integer, LargeBinary, Numeric, Text, UniqueConstraint,
+)
 from sqlalchemy.orm import backref, relationship
 
 from common.enums import Currency, GarageActionType, TxStatus
 from common.models.base import AutoIdMixin, Base, TimeStampMixin
+from common.utils.receipt import PlanetID
 
 
 class GarageFavStatus(AutoIdMixin, TimeStampMixin, Base):
@@ -27,9 +30,16 @@ class GarageItemStatus(AutoIdMixin, TimeStampMixin, Base):
 
 class GarageActionHistory(AutoIdMixin, TimeStampMixin, Base):
     __tablename__ = "garage_action_history"
-    block_index = Column(BigInteger, nullable=False)
+    __table_args__ = (
+        # Same block can be synced again by forward sync and backfill
+        UniqueConstraint("planet_id", "tx_hash", "action_index"),
+    )
+    planet_id = Column(LargeBinary(length=12), nullable=False, default=PlanetID.ODIN.value, index=True,
+                       doc="An identifier of planets")
+    block_index = Column(BigInteger, nullable=False, index=True)
     block_hash = Column(Text, nullable=False)
     tx_hash = Column(Text, nullable=False)
+    action_index = Column(Integer, nullable=False, doc="Index of this action among garage actions of Tx.")
     tx_status = Column(Enum(TxStatus))
     action_type = Column(Enum(GarageActionType), nullable=False, index=True)
     signer = Column(Text, nullable=False, index=True)
@@ -58,3 +68,33 @@ class GarageItemHistory(AutoIdMixin, TimeStampMixin, Base):
     item_id = Column(Integer)
     fungible_id = Column(Text, nullable=False, index=True)
     amount = Column(Integer, nullable=False, default=0)
+
+
+class GarageSyncCursor(AutoIdMixin, TimeStampMixin, Base):
+    """
+    Last fully committed block of garage history sync for each planet.
+
+    Forward sync always resumes from `block_index + 1`.
+    `block_hash` is compared with the chain before resuming to detect reorg.
+    """
+    __tablename__ = "garage_sync_cursor"
+    planet_id = Column(LargeBinary(length=12), nullable=False, unique=True, doc="An identifier of planets")
+    block_index = Column(BigInteger, nullable=False, doc="Last fully committed block index")
+    block_hash = Column(Text, nullable=False, doc="Hash of last fully committed block")
+
+
+class GarageSyncRange(AutoIdMixin, TimeStampMixin, Base):
+    """
+    Committed block range of garage history sync.
+
+    Adjacent ranges are merged when committed, so uncovered blocks between ranges are sync gaps.
+    """
+    __tablename__ = "garage_sync_range"
+    __table_args__ = (
+        Index("ix_garage_sync_range_planet_id_start_index", "planet_id", "start_index", unique=True),
+    )
+    planet_id = Column(LargeBinary(length=12), nullable=False, doc="An identifier of planets")
+    start_index = Column(BigInteger, nullable=False, doc="First block index of this range (inclusive)")
+    start_hash = Column(Text, nullable=False)
+    end_index = Column(BigInteger, nullable=False, doc="Last block index of this range (inclusive)")
+    end_hash = Column(Text, nullable=False)
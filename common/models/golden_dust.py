@@ -0,0 +1,63 @@
+from sqlalchemy import Boolean, Column, Float, Index, Integer, Text, UniqueConstraint, text
+from sqlalchemy.dialects.postgresql import ENUM
+
+from common.enums import GoldenDustTxStatus, GoldenDustWorkStatus
+from common.models.base import AutoIdMixin, Base, TimeStampMixin
+
+
+class GoldenDustCursor(AutoIdMixin, TimeStampMixin, Base):
+    """
+    Read cursor of Golden Dust request form sheet.
+
+    Form rows before `next_form_row` are already recorded to `golden_dust_request`,
+    so each run reads only new form rows instead of whole form sheet.
+    """
+    __tablename__ = "golden_dust_cursor"
+    __table_args__ = (
+        UniqueConstraint("form_sheet", "work_sheet"),
+    )
+    form_sheet = Column(Text, nullable=False, doc="Name of form sheet")
+    work_sheet = Column(Text, nullable=False, doc="Name of work sheet")
+    next_form_row = Column(Integer, nullable=False, default=2, doc="First form row not treated yet")
+    next_work_row = Column(Integer, nullable=False, default=2, doc="Work sheet row for next new request")
+    ledger_imported = Column(Boolean, nullable=False, default=False,
+                             doc="Requests recorded in work sheet before ledger are imported")
+
+
+class GoldenDustRequest(AutoIdMixin, TimeStampMixin, Base):
+    """
+    Ledger of Golden Dust by NCG requests.
+
+    This is the source of truth of request validation and unload Tx.
+    Golden Dust work sheet is just an exported view of this table.
+    """
+    __tablename__ = "golden_dust_request"
+    __table_args__ = (
+        # Duplicated requests are kept to show in work sheet, but only one request can own request Tx.
+        Index("ix_golden_dust_request_request_tx_hash", "request_tx_hash", unique=True,
+              postgresql_where=text("NOT request_duplicated")),
+    )
+    agent_addr = Column(Text, nullable=False, doc="9c agent address who requested")
+    avatar_addr = Column(Text, nullable=False, doc="9c avatar address to get Golden Dust")
+    request_tx_hash = Column(Text, nullable=False, doc="Lower-cased hash of NCG transfer Tx.")
+    request_tx_status = Column(ENUM(GoldenDustTxStatus, create_type=False), nullable=False,
+                               default=GoldenDustTxStatus.NOT_FOUND, doc="Status of NCG transfer Tx.")
+    request_duplicated = Column(Boolean, nullable=False, default=False,
+                                doc="Request Tx. is already owned by another request")
+    sent_ncg = Column(Float, nullable=True, doc="Amount of NCG transferred by request Tx.")
+    request_dust_set = Column(Integer, nullable=False, doc="Requested set of Golden Dust")
+    email = Column(Text, nullable=True)
+    token = Column(Text, nullable=False, unique=True, doc="Unique token of form request")
+    status = Column(ENUM(GoldenDustWorkStatus, create_type=False), nullable=False, index=True,
+                    default=GoldenDustWorkStatus.REQ, doc="Validation status of request")
+    tx_hash = Column(Text, nullable=True, index=True, doc="Golden Dust unload Tx. hash")
+    tx_status = Column(ENUM(GoldenDustTxStatus, create_type=False), nullable=False, index=True,
+                       default=GoldenDustTxStatus.NOT_CREATED, doc="Status of Golden Dust unload Tx.")
+    block_index = Column(Integer, nullable=True)
+    nonce = Column(Integer, nullable=True, doc="Nonce used for unload Tx. Set before Tx. is staged.")
+    plain_text = Column(Text, nullable=True, doc="Hex of unsigned unload Tx.")
+    stage_attempt = Column(Integer, nullable=False, default=0, doc="Number of rejected staging of unload Tx.")
+    comment = Column(Text, nullable=True)
+    sheet_row = Column(Integer, nullable=True, unique=True, doc="Row of work sheet to export this request")
+    exported = Column(Boolean, nullable=False, default=False, index=True,
+                      doc="Latest data is exported to work sheet")
@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, Text, UUID, DateTime, Integer, ForeignKey, LargeBinary
+from sqlalchemy import Column, Text, UUID, DateTime, Integer, ForeignKey, Index, LargeBinary
 from sqlalchemy.dialects.postgresql import ENUM, JSONB
 from sqlalchemy.orm import relationship, backref
 
@@ -12,6 +12,13 @@ from common.utils.receipt import PlanetID
 
 class Receipt(AutoIdMixin, TimeStampMixin, Base):
     __tablename__ = "receipt"
+    __table_args__ = (
+        # Keyset pagination of receipts in purchase order
+        Index("ix_receipt_purchased_at_id", "purchased_at", "id"),
+        Index("ix_receipt_agent_addr_purchased_at_id", "agent_addr", "purchased_at", "id"),
+        # Receipts are found by store order ID in purchase and refund
+        Index("ix_receipt_store_order_id", "store", "order_id"),
+    )
     store = Column(ENUM(Store, create_type=False), nullable=False, index=True, doc="Purchased Store Type")
     order_id = Column(Text, nullable=False, doc="Play store / Appstore IAP receipt id")
     uuid = Column(UUID(as_uuid=True), nullable=False, index=True, default=uuid.uuid4,
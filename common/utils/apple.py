@@ -1,9 +1,15 @@
 from time import time
+from typing import Any, Callable, Dict, Iterator, List
+from urllib.parse import urlsplit
 
-import jwt
+import requests
+
+NOTIFICATION_HISTORY_PATH = "/inApps/v1/notifications/history"
 
 
 def get_jwt(credential: str, bundle_id: str, key_id: str, issuer_id: str) -> str:
+    import jwt
+
     header = {
         "alg": "ES256",
         "kid": key_id,
@@ -17,3 +23,54 @@ def get_jwt(credential: str, bundle_id: str, key_id: str, issuer_id: str) -> str
         "bid": bundle_id
     }
     return jwt.encode(data, credential, algorithm="ES256", headers=header)
+
+
+def get_notification_history_url(validation_url: str) -> str:
+    """
+    Get URL of `Get Notification History` API in the same App Store Server API environment with `validation_url`.
+    Sandbox stages validate receipts with `api.storekit-sandbox.itunes.apple.com`, so they read sandbox history too.
+
+    :param validation_url: `APPLE_VALIDATION_URL` used for receipt validation.
+                           e.g., `https://api.storekit.itunes.apple.com/inApps/v1/transactions/{transactionId}`
+    """
+    url = urlsplit(validation_url)
+    return f"{url.scheme}://{url.netloc}{NOTIFICATION_HISTORY_PATH}"
+
+
+def iter_refund_notifications(history_url: str, get_token: Callable[[], str], start_date: int,
+                              end_date: int) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Iterate refunded transactions in App Store Server Notifications history page by page.
+
+    :param history_url: URL of `Get Notification History` API. e.g., `.../inApps/v1/notifications/history`
+    :param get_token: Function to get new App Store Server API JWT. JWT is made for each page since it expires quickly.
+    :param start_date: Epoch milliseconds. Apple keeps notifications of last 180 days only.
+    :param end_date: Epoch milliseconds
+    :return: Pages of decoded transaction info. Each has `transactionId`, `revocationDate` and `revocationReason`.
+    """
+    import jwt
+
+    pagination_token = None
+    while True:
+        resp = requests.post(
+            history_url,
+            params={"paginationToken": pagination_token} if pagination_token else None,
+            headers={"Authorization": f"Bearer {get_token()}"},
+            json={"startDate": start_date, "endDate": end_date, "notificationType": "REFUND"},
+            timeout=30,
+        )
+        resp.raise_for_status()
+        data = resp.json()
+
+        page = []
+        for notification in data.get("notificationHistory", []):
+            # Payload is taken from Apple API directly, not from client. Same as transaction validation.
+            payload = jwt.decode(notification["signedPayload"], options={"verify_signature": False})
+            signed_transaction = payload.get("data", {}).get("signedTransactionInfo")
+            if signed_transaction:
+                page.append(jwt.decode(signed_transaction, options={"verify_signature": False}))
+        yield page
+
+        if not data.get("hasMore"):
+            return
+        pagination_token = data["paginationToken"]
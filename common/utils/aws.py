@@ -1,13 +1,35 @@
 import json
-from typing import Dict, Optional
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import boto3
 
 from common import logger
 
+# `get_parameters` accepts at most 10 names in one call.
+PARAMETER_BATCH_SIZE = 10
+
+_client_dict = {}
+_client_lock = threading.Lock()
+
+
+def get_client(service: str, region: str):
+    """
+    Get boto3 client shared in the process. Creating client is slow, so reuse it rather than creating for each call.
+    """
+    key = (service, region)
+    if key not in _client_dict:
+        # Client creation on default session is not thread safe
+        with _client_lock:
+            if key not in _client_dict:
+                _client_dict[key] = boto3.client(service, region_name=region)
+    return _client_dict[key]
+
 
 def fetch_parameter(region: str, parameter_name: str, secure: bool):
-    ssm = boto3.client("ssm", region_name=region)
+    ssm = get_client("ssm", region)
     resp = ssm.get_parameter(
         Name=parameter_name,
         WithDecryption=secure,
@@ -15,16 +37,92 @@ def fetch_parameter(region: str, parameter_name: str, secure: bool):
     return resp["Parameter"]
 
 
+def fetch_parameters(region: str, name_list: Iterable[str], secure: bool) -> Dict[str, str]:
+    """
+    Fetch multiple parameters in batch with `get_parameters`.
+
+    :return: Dict of parameter name and value. Parameters not found are logged and omitted.
+    """
+    name_list = list(dict.fromkeys(name_list))
+    ssm = get_client("ssm", region)
+    result = {}
+    for i in range(0, len(name_list), PARAMETER_BATCH_SIZE):
+        resp = ssm.get_parameters(Names=name_list[i:i + PARAMETER_BATCH_SIZE], WithDecryption=secure)
+        result.update({x["Name"]: x["Value"] for x in resp["Parameters"]})
+        if resp.get("InvalidParameters"):
+            logger.error(f"SSM parameters not found: {resp['InvalidParameters']}")
+    return result
+
+
 def fetch_secrets(region: str, secret_arn: str) -> Dict:
-    sm = boto3.client("secretsmanager", region_name=region)
+    sm = get_client("secretsmanager", region)
     resp = sm.get_secret_value(SecretId=secret_arn)
     return json.loads(resp["SecretString"])
 
 
+class ParameterCache:
+    """
+    SSM parameters cached in memory for the process lifetime (e.g., Lambda container).
+
+    Parameters are fetched in batch, and parameter older than `ttl` seconds is fetched again at next use.
+    Parameters are never expired if `ttl` is `None`.
+    """
+
+    def __init__(self, region: str, *, ttl: Optional[float] = None):
+        self.region = region
+        self.ttl = ttl
+        # Keyed by (name, secure). Decrypted and raw values of a secure string parameter are different.
+        self._value_dict: Dict[Tuple[str, bool], Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _is_valid(self, key: Tuple[str, bool], now: float) -> bool:
+        if key not in self._value_dict:
+            return False
+        return self.ttl is None or now - self._value_dict[key][1] < self.ttl
+
+    def preload(self, name_list: Iterable[str], secure: bool = True):
+        """
+        Fetch parameters not cached or expired in one batch.
+        """
+        now = time.time()
+        missing: List[str] = [x for x in name_list if not self._is_valid((x, secure), now)]
+        if not missing:
+            return
+        value_dict = fetch_parameters(self.region, missing, secure)
+        with self._lock:
+            self._value_dict.update({(k, secure): (v, now) for k, v in value_dict.items()})
+
+    def get(self, name: str, secure: bool = True) -> str:
+        """
+        :return: Value of parameter. Raises `KeyError` if parameter does not exist.
+        """
+        self.preload([name], secure)
+        try:
+            return self._value_dict[(name, secure)][0]
+        except KeyError:
+            raise KeyError(f"SSM parameter {name} not found")
+
+    def clear(self):
+        with self._lock:
+            self._value_dict.clear()
+
+
+_parameter_cache_dict: Dict[str, ParameterCache] = {}
+
+
+def get_parameter_cache(region: str) -> ParameterCache:
+    """
+    Get shared parameter cache of region. TTL can be set in seconds with `PARAMETER_CACHE_TTL`.
+    """
+    if region not in _parameter_cache_dict:
+        ttl = os.environ.get("PARAMETER_CACHE_TTL")
+        _parameter_cache_dict[region] = ParameterCache(region, ttl=float(ttl) if ttl else None)
+    return _parameter_cache_dict[region]
+
+
 def fetch_kms_key_id(stage: str, region: str) -> Optional[str]:
-    client = boto3.client("ssm", region_name=region)
     try:
-        return client.get_parameter(Name=f"{stage}_9c_IAP_KMS_KEY_ID", WithDecryption=True)["Parameter"]["Value"]
+        return get_parameter_cache(region).get(f"{stage}_9c_IAP_KMS_KEY_ID")
     except Exception as e:
         logger.error(e)
         return None
@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+
+from common.utils.trace import build_emf, emit_emf
+
+# Seconds to keep connection. Connections idle longer than this are closed by RDS Proxy and NAT.
+DEFAULT_POOL_RECYCLE = 300
+DEFAULT_CONNECT_TIMEOUT = 5
+
+
+def _is_lambda() -> bool:
+    return "AWS_LAMBDA_FUNCTION_NAME" in os.environ
+
+
+class PoolMetrics:
+    """
+    Connection usage of one engine counted by pool events.
+
+    - `connect`: New DB connections. Many connects in short time is a sign of connection storm.
+    - `checkout` / `checkin`: Connections taken from / returned to pool.
+    - `invalidate`: Connections discarded by error or failed pre-ping.
+    - `in_use` / `max_in_use`: Connections currently checked out and its peak since last emit.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.connect = 0
+        self.checkout = 0
+        self.checkin = 0
+        self.invalidate = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self._lock = threading.Lock()
+        self._emitted_at = time.time()
+
+    def attach(self, engine: Engine):
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, dbapi_conn, conn_record):
+        with self._lock:
+            self.connect += 1
+
+    def _on_checkout(self, dbapi_conn, conn_record, conn_proxy):
+        with self._lock:
+            self.checkout += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+
+    def _on_checkin(self, dbapi_conn, conn_record):
+        with self._lock:
+            self.checkin += 1
+            self.in_use = max(0, self.in_use - 1)
+
+    def _on_invalidate(self, dbapi_conn, conn_record, exception):
+        with self._lock:
+            self.invalidate += 1
+
+    def to_dict(self) -> dict:
+        return {"connect": self.connect, "checkout": self.checkout, "checkin": self.checkin,
+                "invalidate": self.invalidate, "in_use": self.in_use, "max_in_use": self.max_in_use}
+
+    def emit(self, interval: float = 0):
+        """
+        Emit counts since last emit as EMF metrics and reset them.
+
+        :param interval: Do nothing if last emit is within `interval` seconds. Use this on hot path.
+        """
+        now = time.time()
+        if now - self._emitted_at < interval:
+            return
+        with self._lock:
+            data = self.to_dict()
+            self.connect = self.checkout = self.checkin = self.invalidate = 0
+            self.max_in_use = self.in_use
+            self._emitted_at = now
+        emit_emf(build_emf(self.name, {f"db.{k}": v for k, v in data.items()}, "Count"))
+
+
+def create_db_engine(db_uri: str, *, name: str = "db", pool_mode: Optional[str] = None,
+                     pool_size: Optional[int] = None, max_overflow: Optional[int] = None, echo: bool = False,
+                     **kwargs) -> Engine:
+    """
+    Create engine with pooling suitable for where it runs.
+
+    Pool settings can be overridden with environment variables:
+
+    - `DB_POOL_MODE`: `queue` (default) keeps connections in process.
+      `null` opens connection for each session and closes it after use. Use this behind RDS Proxy,
+      which pools connections by itself, so idle Lambda containers do not hold connections.
+    - `DB_POOL_SIZE` / `DB_MAX_OVERFLOW`: Defaults are 1 / 2 in Lambda (one request at a time per container)
+      and 5 / 5 elsewhere. Overflow connections are closed when returned.
+    - `DB_POOL_RECYCLE`: Seconds to keep a connection. Default is 300.
+
+    Connections are pre-pinged on checkout so closed connections of frozen Lambda containers are replaced
+    instead of failing the request. Connection usage is counted to `engine.pool_metrics`.
+
+    :param name: Name of engine used as `Trace` dimension of connection metrics.
+    """
+    pool_mode = (pool_mode or os.environ.get("DB_POOL_MODE", "queue")).lower()
+    if db_uri.startswith("postgresql"):
+        kwargs.setdefault("connect_args", {}).setdefault("connect_timeout", DEFAULT_CONNECT_TIMEOUT)
+
+    if pool_mode == "null":
+        engine = create_engine(db_uri, poolclass=NullPool, echo=echo, **kwargs)
+    elif pool_mode == "queue":
+        lambda_default = _is_lambda()
+        if pool_size is None:
+            pool_size = int(os.environ.get("DB_POOL_SIZE", 1 if lambda_default else 5))
+        if max_overflow is None:
+            max_overflow = int(os.environ.get("DB_MAX_OVERFLOW", 2 if lambda_default else 5))
+        engine = create_engine(
+            db_uri, pool_size=pool_size, max_overflow=max_overflow, pool_pre_ping=True,
+            pool_recycle=int(os.environ.get("DB_POOL_RECYCLE", DEFAULT_POOL_RECYCLE)), echo=echo, **kwargs
+        )
+    else:
+        raise ValueError(f"Unknown DB pool mode {pool_mode}. Use one of `queue` or `null`.")
+
+    engine.pool_metrics = PoolMetrics(name)
+    engine.pool_metrics.attach(engine)
+    return engine
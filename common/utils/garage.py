@@ -1,20 +1,23 @@
 import os
-from typing import List
+from typing import Iterable, List, Optional
 
-from gql.dsl import dsl_gql, DSLQuery
 from sqlalchemy import select, distinct
 
 from common import logger
-from common._crypto import Account
-from common._graphql import GQL
+from common._crypto import get_account
+from common._endpoint import EndpointPool
 from common.models.garage import GarageItemStatus
 from common.models.product import FungibleItemProduct
-from common.utils.aws import fetch_kms_key_id
 
 
-def update_iap_garage(sess, url: str):
-    client = GQL(url)
-    account = Account(fetch_kms_key_id(os.environ.get("STAGE", "development"), os.environ.get("REGION_NAME")))
+def update_iap_garage(sess, url: Optional[str] = None, pool: Optional[EndpointPool] = None):
+    # gql is only needed here, not in API reading garage status from DB
+    from gql.dsl import dsl_gql, DSLQuery
+
+    from common._graphql import GQL
+
+    client = GQL(url, pool=pool) if url else GQL(pool=pool)
+    account = get_account(os.environ.get("STAGE", "development"), os.environ.get("REGION_NAME"))
     fungible_id_list = sess.scalars(select(distinct(FungibleItemProduct.fungible_item_id))).fetchall()
     query = dsl_gql(
         DSLQuery(
@@ -56,16 +59,21 @@ def update_iap_garage(sess, url: str):
     return data
 
 
-def get_iap_garage(sess) -> List[GarageItemStatus]:
+def get_iap_garage(sess, fungible_id_list: Optional[Iterable[str]] = None) -> List[GarageItemStatus]:
     """
     Get NCG balance and fungible item count of IAP address.
+
+    :param fungible_id_list: Fungible IDs to get. All items of products are used if not given.
     :return:
     """
     stage = os.environ.get("STAGE", "development")
     region_name = os.environ.get("REGION_NAME", "us-east-2")
-    account = Account(fetch_kms_key_id(stage, region_name))
+    account = get_account(stage, region_name)
 
-    fungible_id_list = sess.scalars(select(distinct(FungibleItemProduct.fungible_item_id))).fetchall()
+    if fungible_id_list is None:
+        fungible_id_list = sess.scalars(select(distinct(FungibleItemProduct.fungible_item_id))).fetchall()
+    else:
+        fungible_id_list = list(fungible_id_list)
     return sess.scalars(
         select(GarageItemStatus).where(
             GarageItemStatus.address == account.address,
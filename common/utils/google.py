@@ -1,10 +1,8 @@
 import json
 import os
-from typing import List
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-import googleapiclient.discovery
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from sqlalchemy.orm import joinedload
 
 from common import logger
@@ -78,13 +76,53 @@ def update_google_price(sess, credential_data: str, package_name: str):
 
 
 def get_google_client(credential_data: str):
+    # Google API client is heavy to import. Import on first use not to slow down cold start of API.
+    import googleapiclient.discovery
+    from google.auth.credentials import AnonymousCredentials
+    from google.oauth2 import service_account
+
+    # Local simulator (see `simulator` package) does not need credential.
+    api_endpoint = os.environ.get("GOOGLE_API_ENDPOINT")
+    if api_endpoint:
+        return googleapiclient.discovery.build("androidpublisher", "v3", credentials=AnonymousCredentials(),
+                                               client_options={"api_endpoint": api_endpoint})
+
     scopes = ["https://www.googleapis.com/auth/androidpublisher"]
     credential = service_account.Credentials.from_service_account_info(json.loads(credential_data), scopes=scopes)
     return googleapiclient.discovery.build("androidpublisher", "v3", credentials=credential)
 
 
+def iter_voided_purchases(client, package_name: str, start_time: int, end_time: Optional[int] = None,
+                          page_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Iterate voided (refunded, charged back or revoked) in-app purchases page by page.
+
+    :param client: Client from `get_google_client`
+    :param start_time: Epoch milliseconds. Google keeps voided purchases of last 30 days only.
+    :param end_time: Epoch milliseconds. Now if not given.
+    :param page_size: Number of voided purchases in one page. At most 1000.
+    :return: Pages of voided purchases. Each has `orderId`, `purchaseToken`, `voidedTimeMillis` and `voidedReason`.
+    """
+    token = None
+    while True:
+        params = {"packageName": package_name, "startTime": start_time, "maxResults": page_size}
+        if end_time is not None:
+            params["endTime"] = end_time
+        if token:
+            params["token"] = token
+        resp = client.purchases().voidedpurchases().list(**params).execute()
+        yield resp.get("voidedPurchases", [])
+
+        token = resp.get("tokenPagination", {}).get("nextPageToken")
+        if not token:
+            return
+
+
 class Spreadsheet:
     def __init__(self, credential_data: str, sheet_id: str):
+        from google.oauth2 import service_account
+        from googleapiclient.discovery import build
+
         SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
         self.sheet_id = sheet_id
         self._token_file = "credential.pickle"
@@ -100,6 +138,14 @@ class Spreadsheet:
         return result
 
     def set_values(self, range_, value_):
+        return self.set_batch_values([(range_, value_)])
+
+    def set_batch_values(self, data: List[Tuple[str, List[List[Any]]]]):
+        """
+        Update multiple ranges with one `batchUpdate` call.
+
+        :param data: List of (range, values of rows)
+        """
         body = {
             "value_input_option": "USER_ENTERED",
             "data": [
@@ -108,7 +154,73 @@ class Spreadsheet:
                     "majorDimension": "ROWS",
                     "values": value_
                 }
+                for range_, value_ in data
             ]
         }
         result = self.service.spreadsheets().values().batchUpdate(spreadsheetId=self.sheet_id, body=body).execute()
         return result
+
+    def buffered_writer(self, max_size: int = 200, max_interval: Optional[float] = 30) -> "BufferedSheetWriter":
+        return BufferedSheetWriter(self, max_size=max_size, max_interval=max_interval)
+
+
+class BufferedSheetWriter:
+    """
+    Accumulate range updates of spreadsheet and write them with one `batchUpdate` call.
+
+    Buffer is flushed when `max_size` ranges are buffered, `max_interval` seconds passed since the first
+    buffered range (by background timer, even without new writes), `flush()` is called,
+    or `with` block ends (even by exception).
+    Buffered ranges are kept when `batchUpdate` fails, and written again at next flush.
+    Call `flush()` before any action which cannot be undone (e.g., staging Tx.)
+    to keep sheet and chain in sync as much as possible.
+    """
+
+    def __init__(self, sheet: Spreadsheet, max_size: int = 200, max_interval: Optional[float] = 30):
+        self.sheet = sheet
+        self.max_size = max_size
+        self.max_interval = max_interval
+        self._buffer: List[Tuple[str, List[List[Any]]]] = []
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self.flush_count = 0
+
+    def __enter__(self) -> "BufferedSheetWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.flush()
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def write(self, range_: str, value_: List[List[Any]]):
+        with self._lock:
+            self._buffer.append((range_, value_))
+            full = len(self._buffer) >= self.max_size
+            if not full and self.max_interval is not None and self._timer is None:
+                self._timer = threading.Timer(self.max_interval, self._flush_by_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def _flush_by_timer(self):
+        try:
+            self.flush()
+        except Exception as e:
+            # Buffer is kept and flushed again by next write or flush
+            logger.error(f"Failed to flush {len(self._buffer)} buffered ranges: {e}")
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._buffer:
+                return None
+            data = list(self._buffer)
+            result = self.sheet.set_batch_values(data)
+            self._buffer.clear()
+            self.flush_count += 1
+            return result
@@ -0,0 +1,291 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, union
+from sqlalchemy.dialects.postgresql import insert
+
+from common import logger
+from common.enums import GarageActionType
+from common.models.garage import (
+    GarageActionHistory, GarageFavHistory, GarageItemHistory, GarageSyncCursor, GarageSyncRange,
+)
+from common.utils.receipt import PlanetID
+
+GARAGE_ACTION_TYPES = {
+    "load_into_my_garages": GarageActionType.LOAD,
+    "deliver_to_others_garages": GarageActionType.DELIVER,
+    "unload_from_my_garages": GarageActionType.UNLOAD,
+}
+# Class ID of advisory lock to serialize sync range commits of a planet
+GARAGE_SYNC_LOCK_ID = 27
+
+
+def process_load(data: dict):
+    pass
+
+
+def process_deliver(data: dict):
+    pass
+
+
+def process_unload(data: dict):
+    pass
+
+
+def sync_block(block_data: Dict[str, Any], planet_id: PlanetID = PlanetID.ODIN) -> List[Dict[str, Any]]:
+    """
+    Parse garage actions in given block.
+
+    :param block_data: Block data from explorer GQL. Must have `index`, `hash` and `transactions` with actions.
+    :param planet_id: Planet ID of this block
+    :return: List of `GarageActionHistory` column values. Caller is responsible to save them.
+    """
+    GARAGE_ACTION_PROCESSOR = {
+        GarageActionType.LOAD: process_load,
+        GarageActionType.DELIVER: process_deliver,
+        GarageActionType.UNLOAD: process_unload,
+    }
+    logger.debug(f"Process Block {block_data['index']} :: {block_data['hash']}")
+    logger.debug(f"{len(block_data['transactions'])} Transactions")
+    action_list = []
+    # TODO: Need transaction result
+    for tx in block_data["transactions"]:
+        action_index = 0
+        for action in tx["actions"]:
+            json_action = json.loads(action["json"].replace("\\uFEFF", ""))
+            action_type = GARAGE_ACTION_TYPES.get(json_action["type_id"])
+            if action_type is None:
+                continue
+
+            logger.debug(json_action["values"])
+            GARAGE_ACTION_PROCESSOR[action_type](json_action["values"])
+            action_list.append({
+                "planet_id": planet_id.value,
+                "block_index": block_data["index"],
+                "block_hash": block_data["hash"],
+                "tx_hash": tx["id"],
+                "action_index": action_index,
+                "action_type": action_type,
+                "signer": tx["signer"],
+            })
+            action_index += 1
+
+    logger.debug(f"{len(action_list)} actions are processed")
+    return action_list
+
+
+def insert_actions(sess, action_list: List[Dict[str, Any]]):
+    """
+    Insert garage actions from `sync_block`. Actions already synced are skipped, so same blocks can be synced again.
+    """
+    if action_list:
+        sess.execute(
+            insert(GarageActionHistory).on_conflict_do_nothing(index_elements=["planet_id", "tx_hash", "action_index"]),
+            action_list
+        )
+
+
+def check_block_range(block_list: List[Dict[str, Any]], start: int, end: int) -> List[Dict[str, Any]]:
+    """
+    Check fetched blocks are exactly the blocks between `start` and `end`, so the range can be committed as synced.
+
+    :param block_list: Blocks from explorer GQL in any order.
+    :param start: First block index of range (inclusive)
+    :param end: Last block index of range (inclusive)
+    :return: Blocks in ascending order of index.
+    :raise ValueError: When any block is missing, duplicated or out of range.
+    """
+    block_list = sorted(block_list, key=lambda x: x["index"])
+    if [x["index"] for x in block_list] != list(range(start, end + 1)):
+        raise ValueError(f"Fetched blocks are not contiguous from {start} to {end}: "
+                         f"{len(block_list)} blocks from {block_list[0]['index'] if block_list else None} "
+                         f"to {block_list[-1]['index'] if block_list else None}")
+    return block_list
+
+
+def lock_sync(sess, planet_id: PlanetID):
+    """
+    Serialize sync range commits of a planet until end of current transaction.
+    """
+    sess.execute(select(func.pg_advisory_xact_lock(GARAGE_SYNC_LOCK_ID, func.hashtext(planet_id.value.decode()))))
+
+
+def get_sync_cursor(sess, planet_id: PlanetID) -> Optional[GarageSyncCursor]:
+    return sess.scalar(select(GarageSyncCursor).where(GarageSyncCursor.planet_id == planet_id.value))
+
+
+def commit_sync_range(sess, planet_id: PlanetID,
+                      start_index: int, start_hash: str, end_index: int, end_hash: str) -> GarageSyncRange:
+    """
+    Record fully synced block range and advance sync cursor.
+
+    Committed range is merged with adjacent/overlapping ranges to keep gap report simple.
+    Commits of a planet are serialized with advisory lock, so ranges committed at the same time are merged too.
+    Sync cursor is advanced only when merged range is connected to current cursor,
+    so blocks between cursor and new range are never skipped.
+    This function does not commit session. Commit it together with synced history to keep them atomic.
+
+    :param sess: DB Session
+    :param planet_id: Target planet ID
+    :param start_index: First block index of synced range (inclusive)
+    :param start_hash: Hash of first block
+    :param end_index: Last block index of synced range (inclusive)
+    :param end_hash: Hash of last block
+    :return: Merged range contains given range.
+    """
+    if start_index > end_index:
+        raise ValueError(f"Invalid block range: {start_index} ~ {end_index}")
+
+    lock_sync(sess, planet_id)
+    neighbor_list = sess.scalars(
+        select(GarageSyncRange)
+        .where(GarageSyncRange.planet_id == planet_id.value,
+               GarageSyncRange.start_index <= end_index + 1,
+               GarageSyncRange.end_index >= start_index - 1)
+        .order_by(GarageSyncRange.start_index)
+    ).fetchall()
+
+    merged = GarageSyncRange(planet_id=planet_id.value,
+                             start_index=start_index, start_hash=start_hash,
+                             end_index=end_index, end_hash=end_hash)
+    for neighbor in neighbor_list:
+        if neighbor.start_index < merged.start_index:
+            merged.start_index, merged.start_hash = neighbor.start_index, neighbor.start_hash
+        if neighbor.end_index > merged.end_index:
+            merged.end_index, merged.end_hash = neighbor.end_index, neighbor.end_hash
+        sess.delete(neighbor)
+    sess.flush()
+    sess.add(merged)
+
+    cursor = get_sync_cursor(sess, planet_id)
+    if cursor is None:
+        sess.execute(
+            insert(GarageSyncCursor)
+            .values(planet_id=planet_id.value, block_index=merged.end_index, block_hash=merged.end_hash)
+            .on_conflict_do_nothing(index_elements=[GarageSyncCursor.planet_id])
+        )
+    elif merged.start_index <= cursor.block_index + 1 and merged.end_index > cursor.block_index:
+        cursor.block_index, cursor.block_hash = merged.end_index, merged.end_hash
+        sess.add(cursor)
+    sess.flush()
+    return merged
+
+
+def get_stored_block_hashes(sess, planet_id: PlanetID, before: int, limit: int = 100) -> List[Tuple[int, str]]:
+    """
+    Get block hashes stored by synced history, which are compared with the chain to find where reorg started.
+
+    Blocks with garage actions and both ends of synced ranges are the only blocks whose hash is stored.
+
+    :param sess: DB Session
+    :param planet_id: Target planet ID
+    :param before: Only blocks lower than this index are returned.
+    :param limit: Max. number of blocks to return.
+    :return: List of (block index, block hash) in descending order of block index.
+    """
+    # Each part is limited first not to read whole history below `before`
+    stored = union(
+        select(GarageActionHistory.block_index, GarageActionHistory.block_hash).distinct()
+        .where(GarageActionHistory.planet_id == planet_id.value, GarageActionHistory.block_index < before)
+        .order_by(GarageActionHistory.block_index.desc()).limit(limit),
+        select(GarageSyncRange.start_index, GarageSyncRange.start_hash)
+        .where(GarageSyncRange.planet_id == planet_id.value, GarageSyncRange.start_index < before)
+        .order_by(GarageSyncRange.start_index.desc()).limit(limit),
+        select(GarageSyncRange.end_index, GarageSyncRange.end_hash)
+        .where(GarageSyncRange.planet_id == planet_id.value, GarageSyncRange.end_index < before)
+        .order_by(GarageSyncRange.end_index.desc()).limit(limit),
+    ).subquery()
+    return [(index, block_hash) for index, block_hash in sess.execute(
+        select(stored.c.block_index, stored.c.block_hash).order_by(stored.c.block_index.desc()).limit(limit)
+    ).all()]
+
+
+def rollback_sync(sess, planet_id: PlanetID, block_index: int, block_hash: str) -> int:
+    """
+    Rollback synced garage history after given block. This is used when reorg is detected.
+
+    All garage action histories after `block_index` are deleted, synced ranges are cut to `block_index`,
+    and sync cursor is moved back to given block.
+    This function does not commit session.
+
+    :param sess: DB Session
+    :param planet_id: Target planet ID
+    :param block_index: Last valid block index to keep
+    :param block_hash: Hash of `block_index` block in current chain
+    :return: Deleted garage action count
+    """
+    lock_sync(sess, planet_id)
+    action_ids = select(GarageActionHistory.id).where(
+        GarageActionHistory.planet_id == planet_id.value,
+        GarageActionHistory.block_index > block_index,
+    )
+    sess.execute(delete(GarageFavHistory).where(GarageFavHistory.action_id.in_(action_ids)))
+    sess.execute(delete(GarageItemHistory).where(GarageItemHistory.action_id.in_(action_ids)))
+    deleted = sess.execute(
+        delete(GarageActionHistory).where(
+            GarageActionHistory.planet_id == planet_id.value,
+            GarageActionHistory.block_index > block_index,
+        )
+    ).rowcount
+
+    sess.execute(
+        delete(GarageSyncRange).where(GarageSyncRange.planet_id == planet_id.value,
+                                      GarageSyncRange.start_index > block_index)
+    )
+    for sync_range in sess.scalars(
+            select(GarageSyncRange).where(GarageSyncRange.planet_id == planet_id.value,
+                                          GarageSyncRange.end_index > block_index)
+    ).fetchall():
+        sync_range.end_index, sync_range.end_hash = block_index, block_hash
+        sess.add(sync_range)
+
+    cursor = get_sync_cursor(sess, planet_id)
+    if cursor is not None:
+        cursor.block_index, cursor.block_hash = block_index, block_hash
+        sess.add(cursor)
+    sess.flush()
+    logger.warning(f"Garage history of {planet_id.name} rolled back to block {block_index}. "
+                   f"{deleted} actions are deleted.")
+    return deleted
+
+
+def find_sync_gaps(sess, planet_id: PlanetID,
+                   start: Optional[int] = None, end: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Find block ranges not synced yet.
+
+    :param sess: DB Session
+    :param planet_id: Target planet ID
+    :param start: Report gaps from this block. If not provided, report starts from first synced block.
+    :param end: Report gaps until this block. If not provided, report ends at last synced block.
+    :return: List of (start, end) block index pairs. Both ends are inclusive.
+    """
+    prev_end = func.lag(GarageSyncRange.end_index).over(order_by=GarageSyncRange.start_index)
+    subq = (
+        select(GarageSyncRange.start_index, GarageSyncRange.end_index, prev_end.label("prev_end"))
+        .where(GarageSyncRange.planet_id == planet_id.value)
+        .subquery()
+    )
+    gap_list = [
+        (prev, nxt) for prev, nxt in sess.execute(
+            select(subq.c.prev_end + 1, subq.c.start_index - 1)
+            .where(subq.c.start_index > subq.c.prev_end + 1)
+            .order_by(subq.c.start_index)
+        ).all()
+    ]
+
+    first, last = sess.execute(
+        select(func.min(GarageSyncRange.start_index), func.max(GarageSyncRange.end_index))
+        .where(GarageSyncRange.planet_id == planet_id.value)
+    ).one()
+    if first is None:
+        return [(start, end)] if start is not None and end is not None and start <= end else []
+
+    if start is not None and start < first:
+        gap_list.insert(0, (start, first - 1))
+    if end is not None and end > last:
+        gap_list.append((last + 1, end))
+
+    return [(max(s, start) if start is not None else s, min(e, end) if end is not None else e)
+            for s, e in gap_list
+            if (start is None or e >= start) and (end is None or s <= end)]
@@ -0,0 +1,207 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import requests
+
+from common import logger
+from common._endpoint import EndpointPool, get_pool
+from common.utils.receipt import PlanetID
+
+DEFAULT_CACHE_PATH = os.path.join(tempfile.gettempdir(), "9c_planet_registry.json")
+
+
+@dataclass
+class Bridge:
+    agent: str
+    avatar: str
+
+
+@dataclass
+class Planet:
+    id: PlanetID
+    name: str = ""
+    rpc_endpoints: Dict[str, List[str]] = field(default_factory=dict)
+    bridges: Dict[PlanetID, Bridge] = field(default_factory=dict)
+
+    @classmethod
+    def from_registry(cls, data: dict) -> "Planet":
+        return cls(
+            id=PlanetID(bytes(data["id"], "utf-8")),
+            name=data.get("name", ""),
+            rpc_endpoints=data.get("rpcEndpoints", {}),
+            bridges={PlanetID(bytes(k, "utf-8")): Bridge(agent=v["agent"], avatar=v["avatar"])
+                     for k, v in data.get("bridges", {}).items()},
+        )
+
+
+class PlanetRegistry:
+    """
+    Planet registry loaded from `PLANET_URL`.
+
+    Registry is loaded at first lookup, not at import, and kept in memory and on local disk for `ttl` seconds.
+    Expired registry is still served while it is refreshed in background thread,
+    so only the very first load of a container waits for network (with `timeout`).
+    If registry cannot be loaded at all, bridges in `BRIDGE_DATA` are used as fail over.
+    """
+
+    def __init__(self, url: Optional[str], *, ttl: float = 3600, timeout: float = 3,
+                 cache_path: Optional[str] = DEFAULT_CACHE_PATH, fallback_bridge_data: Optional[str] = None):
+        self.url = url
+        self.ttl = ttl
+        self.timeout = timeout
+        self.cache_path = cache_path
+        self.fallback_bridge_data = fallback_bridge_data
+        self._planet_dict: Optional[Dict[PlanetID, Planet]] = None
+        self._loaded_at: float = 0
+        # Reentrant, because first load holds it while `refresh` takes it again
+        self._lock = threading.RLock()
+        self._refreshing = False
+
+    @staticmethod
+    def _parse(data: List[dict]) -> Dict[PlanetID, Planet]:
+        planet_dict = {}
+        for d in data:
+            try:
+                planet = Planet.from_registry(d)
+            except ValueError:
+                # Unknown planet
+                continue
+            planet_dict[planet.id] = planet
+        return planet_dict
+
+    def _fetch(self) -> List[dict]:
+        resp = requests.get(self.url, timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json()
+
+    def _read_cache(self) -> Optional[List[dict]]:
+        if not (self.cache_path and os.path.exists(self.cache_path)):
+            return None
+        try:
+            with open(self.cache_path, "r") as f:
+                cache = json.load(f)
+            if cache.get("url") != self.url:
+                return None
+            self._loaded_at = cache["loaded_at"]
+            return cache["data"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Failed to read planet registry cache {self.cache_path}: {e}")
+            return None
+
+    def _write_cache(self, data: List[dict], loaded_at: float):
+        if not self.cache_path:
+            return
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"url": self.url, "loaded_at": loaded_at, "data": data}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Failed to write planet registry cache {self.cache_path}: {e}")
+
+    def _fallback(self) -> Dict[PlanetID, Planet]:
+        # `BRIDGE_DATA` only has bridges of current planet: {planet_id: {"agent": ..., "avatar": ...}}
+        bridge_data = json.loads(self.fallback_bridge_data or "{}")
+        bridges = {PlanetID(bytes(k, "utf-8")): Bridge(agent=v["agent"], avatar=v["avatar"])
+                   for k, v in bridge_data.items()}
+        return {planet_id: Planet(id=planet_id, bridges=bridges) for planet_id in PlanetID}
+
+    def refresh(self) -> bool:
+        """
+        Fetch registry from `PLANET_URL` and update memory/disk cache.
+
+        :return: `True` if registry is successfully refreshed.
+        """
+        try:
+            data = self._fetch()
+            planet_dict = self._parse(data)
+        except Exception as e:
+            logger.error(f"Failed to fetch planet registry from {self.url}: {e}")
+            return False
+        loaded_at = time.time()
+        with self._lock:
+            self._planet_dict, self._loaded_at = planet_dict, loaded_at
+        self._write_cache(data, loaded_at)
+        return True
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def _refresh():
+            try:
+                self.refresh()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=_refresh, daemon=True).start()
+
+    def _load(self):
+        cached = self._read_cache()
+        if cached is not None:
+            self._planet_dict = self._parse(cached)
+        elif not (self.url and self.refresh()):
+            logger.warning("Planet registry not available. Use BRIDGE_DATA as fail over.")
+            self._planet_dict = self._fallback()
+            # Try registry again on next lookup after TTL
+            self._loaded_at = time.time()
+
+    @property
+    def planets(self) -> Dict[PlanetID, Planet]:
+        if self._planet_dict is None:
+            with self._lock:
+                # Other thread may have loaded registry while waiting lock
+                if self._planet_dict is None:
+                    self._load()
+
+        if self.url and time.time() - self._loaded_at > self.ttl:
+            self._refresh_in_background()
+        return self._planet_dict
+
+    def get_planet(self, planet_id: PlanetID) -> Optional[Planet]:
+        return self.planets.get(planet_id)
+
+    def get_gql_endpoints(self, planet_id: PlanetID) -> List[str]:
+        """
+        :return: Headless GQL endpoint list of given planet. Empty list if planet is unknown.
+        """
+        planet = self.get_planet(planet_id)
+        return planet.rpc_endpoints.get("headless.gql", []) if planet else []
+
+    def get_gql_pool(self, planet_id: PlanetID, default: Optional[List[str]] = None) -> EndpointPool:
+        """
+        :return: Shared endpoint pool of headless GQL endpoints of given planet.
+                 `default` endpoints are used when planet has no endpoint in registry.
+        """
+        return get_pool(self.get_gql_endpoints(planet_id) or default or [])
+
+    def get_bridge(self, from_planet: PlanetID, to_planet: PlanetID) -> Bridge:
+        """
+        :return: Bridge agent/avatar address in `from_planet` to send assets to `to_planet`.
+        """
+        planet = self.get_planet(from_planet)
+        if planet is None or to_planet not in planet.bridges:
+            raise ValueError(f"No bridge from {from_planet.name} to {to_planet.name} in planet registry")
+        return planet.bridges[to_planet]
+
+
+_registry: Optional[PlanetRegistry] = None
+
+
+def get_planet_registry() -> PlanetRegistry:
+    """
+    Get shared planet registry of `PLANET_URL`. Registry is kept for the process lifetime (e.g., Lambda container).
+    """
+    global _registry
+    if _registry is None:
+        _registry = PlanetRegistry(os.environ.get("PLANET_URL"),
+                                   ttl=float(os.environ.get("PLANET_REGISTRY_TTL", 3600)),
+                                   fallback_bridge_data=os.environ.get("BRIDGE_DATA"))
+    return _registry
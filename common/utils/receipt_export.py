@@ -0,0 +1,125 @@
+import csv
+import io
+import json
+from enum import Enum
+from typing import Callable, Dict, Iterable, Iterator, Tuple
+
+from sqlalchemy import Select, select
+
+from common.enums import Store
+from common.models.product import Price, Product
+from common.models.receipt import Receipt
+from common.utils.receipt_query import filter_receipts
+
+# Rows fetched from server-side cursor at once. Also used as number of rows written at once.
+EXPORT_CHUNK_SIZE = 5000
+EXPORT_FIELD_LIST = (
+    "uuid", "order_id", "store", "status", "tx_id", "tx_status", "planet_id", "agent_addr", "avatar_addr",
+    "purchased_at", "updated_at", "product_id", "product_name", "google_sku", "apple_sku", "currency", "price",
+)
+
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+def export_query(**filters) -> Select:
+    """
+    Query receipts with product in purchase order. Only required columns are selected without ORM objects.
+
+    :param filters: Filters of `filter_receipts`
+    """
+    stmt = (
+        select(Receipt.id, Receipt.uuid, Receipt.order_id, Receipt.store, Receipt.status, Receipt.tx_id,
+               Receipt.tx_status, Receipt.planet_id, Receipt.agent_addr, Receipt.avatar_addr, Receipt.purchased_at,
+               Receipt.updated_at, Receipt.product_id, Product.name.label("product_name"), Product.google_sku,
+               Product.apple_sku)
+        .outerjoin(Product, Receipt.product_id == Product.id)
+    )
+    return filter_receipts(stmt, **filters).order_by(Receipt.purchased_at, Receipt.id)
+
+
+def get_price_dict(sess, currency: str) -> Dict[Tuple[int, Store], str]:
+    """
+    :return: Dict of (product ID, store) and active price in given currency.
+    """
+    price_dict = {}
+    for product_id, store, price in sess.execute(
+            select(Price.product_id, Price.store, Price.price)
+            .where(Price.currency == currency, Price.active.is_(True))
+            .order_by(Price.id)
+    ):
+        # Several countries can have same currency. Use first one as `update_google_price` adds default price first.
+        price_dict.setdefault((product_id, store), str(price))
+    return price_dict
+
+
+def iter_receipts(sess, *, currency: str = "USD", chunk_size: int = EXPORT_CHUNK_SIZE, **filters) -> Iterator[dict]:
+    """
+    Iterate receipts to export with constant memory.
+
+    Receipts are read from server-side cursor by `chunk_size` rows, instead of loading all receipts or paging them.
+    Price of product is taken from the store of receipt in given currency.
+
+    :param currency: Currency of price
+    :param filters: Filters of `filter_receipts`
+    """
+    price_dict = get_price_dict(sess, currency)
+    for row in sess.execute(export_query(**filters).execution_options(yield_per=chunk_size)):
+        yield {
+            "uuid": str(row.uuid),
+            "order_id": row.order_id,
+            "store": row.store.name,
+            "status": row.status.name,
+            "tx_id": row.tx_id,
+            "tx_status": row.tx_status.name if row.tx_status else None,
+            "planet_id": row.planet_id.decode(),
+            "agent_addr": row.agent_addr,
+            "avatar_addr": row.avatar_addr,
+            "purchased_at": row.purchased_at.isoformat() if row.purchased_at else None,
+            "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+            "product_id": row.product_id,
+            "product_name": row.product_name,
+            "google_sku": row.google_sku,
+            "apple_sku": row.apple_sku,
+            "currency": currency,
+            "price": price_dict.get((row.product_id, row.store)),
+        }
+
+
+def _chunked(rows: Iterable[dict], chunk_size: int, write: Callable[[io.StringIO, dict], None],
+             buffer: io.StringIO) -> Iterator[str]:
+    count = 0
+    for row in rows:
+        write(buffer, row)
+        count += 1
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_csv(rows: Iterable[dict], chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Write rows as CSV with header. Written text is yielded by `chunk_size` rows.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELD_LIST)
+    writer.writeheader()
+    yield from _chunked(rows, chunk_size, lambda _, row: writer.writerow(row), buffer)
+
+
+def iter_ndjson(rows: Iterable[dict], chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Write rows as newline delimited JSON. Written text is yielded by `chunk_size` rows.
+    """
+    yield from _chunked(rows, chunk_size, lambda buffer, row: buffer.write(json.dumps(row) + "\n"), io.StringIO())
+
+
+EXPORT_WRITER_DICT = {
+    ExportFormat.CSV: (iter_csv, "text/csv"),
+    ExportFormat.NDJSON: (iter_ndjson, "application/x-ndjson"),
+}
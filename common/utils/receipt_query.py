@@ -0,0 +1,93 @@
+import base64
+import json
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import Select, desc, func, tuple_, update
+
+from common.enums import ReceiptStatus, Store
+from common.models.receipt import Receipt
+from common.utils.receipt import PlanetID
+
+
+def encode_cursor(purchased_at: datetime, receipt_id: int) -> str:
+    """
+    Encode position of receipt in `purchased_at` and `id` order as opaque cursor string.
+    """
+    return base64.urlsafe_b64encode(json.dumps([purchased_at.isoformat(), receipt_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    :return: `purchased_at` and `id` of last receipt of previous page. Raises `ValueError` for malformed cursor.
+    """
+    try:
+        purchased_at, receipt_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(purchased_at), int(receipt_id)
+    except Exception:
+        raise ValueError(f"Malformed cursor: {cursor}")
+
+
+def filter_receipts(stmt: Select, *, store: Optional[Store] = None, status: Optional[ReceiptStatus] = None,
+                    planet_id: Optional[PlanetID] = None, agent_addr: Optional[str] = None,
+                    start: Optional[datetime] = None, end: Optional[datetime] = None) -> Select:
+    """
+    Filter receipts by given conditions. Conditions of `None` are not applied.
+
+    :param start: Receipts purchased at or after this time.
+    :param end: Receipts purchased before this time.
+    """
+    if store is not None:
+        stmt = stmt.where(Receipt.store == store)
+    if status is not None:
+        stmt = stmt.where(Receipt.status == status)
+    if planet_id is not None:
+        stmt = stmt.where(Receipt.planet_id == planet_id)
+    if agent_addr:
+        stmt = stmt.where(Receipt.agent_addr == agent_addr)
+    if start is not None:
+        stmt = stmt.where(Receipt.purchased_at >= start)
+    if end is not None:
+        stmt = stmt.where(Receipt.purchased_at < end)
+    return stmt
+
+
+def paginate_receipts(stmt: Select, cursor: Optional[str], limit: int) -> Select:
+    """
+    Get one page of receipts in the latest first order using keyset pagination on (`purchased_at`, `id`).
+
+    Unlike offset, page after cursor is read directly from `ix_receipt_purchased_at_id` index,
+    so deep pages are as fast as the first page. Receipts without `purchased_at` are not listed.
+
+    :param cursor: Cursor of last receipt of previous page. `None` for the first page.
+    """
+    stmt = stmt.where(Receipt.purchased_at.is_not(None))
+    if cursor:
+        stmt = stmt.where(tuple_(Receipt.purchased_at, Receipt.id) < tuple_(*decode_cursor(cursor)))
+    return stmt.order_by(desc(Receipt.purchased_at), desc(Receipt.id)).limit(limit)
+
+
+def mark_refunded(sess, store_list: Iterable[Store], order_id_list: Iterable[str],
+                  msg: str = "Refunded by buyer") -> int:
+    """
+    Mark receipts of given store order IDs as `REFUNDED_BY_BUYER` with one bulk UPDATE.
+    Receipts already refunded are not updated, so the same order IDs can be given again.
+
+    :param msg: Message appended to `msg` of receipts
+    :return: Number of updated receipts. Order IDs not in DB are ignored.
+    """
+    order_id_list = list(set(order_id_list))
+    if not order_id_list:
+        return 0
+
+    result = sess.execute(
+        update(Receipt)
+        .where(
+            Receipt.store.in_(store_list),
+            Receipt.order_id.in_(order_id_list),
+            Receipt.status.not_in((ReceiptStatus.REFUNDED_BY_BUYER, ReceiptStatus.REFUNDED_BY_ADMIN)),
+        )
+        .values(status=ReceiptStatus.REFUNDED_BY_BUYER, msg=func.concat_ws("\n", Receipt.msg, msg))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
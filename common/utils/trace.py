@@ -0,0 +1,167 @@
+import functools
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+DEFAULT_NAMESPACE = "NineChronicles/IAP"
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """
+    Durations of stages in one unit of work (e.g., one API call).
+
+    Duration of a stage is accumulated when the stage is recorded several times (e.g., limit count queries),
+    and number of calls is kept as well.
+    Trace is emitted as one CloudWatch embedded metric format (EMF) log line,
+    which is a structured log line and metrics of each stage at the same time.
+    """
+
+    def __init__(self, name: str, *, namespace: Optional[str] = None, **properties):
+        self.name = name
+        self.namespace = namespace or os.environ.get("METRIC_NAMESPACE", DEFAULT_NAMESPACE)
+        self.properties = properties
+        self.duration_dict: Dict[str, float] = defaultdict(float)
+        self.count_dict: Dict[str, int] = defaultdict(int)
+        self.started_at = time.time()
+
+    def record(self, name: str, elapsed: float):
+        self.duration_dict[name] += elapsed
+        self.count_dict[name] += 1
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def set(self, **properties):
+        self.properties.update(properties)
+
+    def to_emf(self) -> dict:
+        """
+        :return: EMF formatted dict. Durations are in milliseconds and dimensioned by `Stage` and `Trace`.
+        """
+        return build_emf(self.name, {k: round(v * 1000, 3) for k, v in self.duration_dict.items()}, "Milliseconds",
+                         namespace=self.namespace, timestamp=self.started_at,
+                         count=dict(self.count_dict), **{k: str(v) for k, v in self.properties.items()})
+
+    def emit(self):
+        emit_emf(self.to_emf())
+
+
+def build_emf(name: str, metric_dict: Dict[str, float], unit: str, *, namespace: Optional[str] = None,
+              timestamp: Optional[float] = None, **properties) -> dict:
+    """
+    Build CloudWatch embedded metric format (EMF) dict of metrics dimensioned by `Stage` and `Trace`.
+
+    :param name: Value of `Trace` dimension
+    :param metric_dict: Dict of metric name and value
+    :param unit: CloudWatch unit of all metrics. e.g., `Milliseconds`, `Count`
+    :param properties: Properties to be logged with metrics, which are not dimensions.
+    :return:
+    """
+    data = {
+        "_aws": {
+            "Timestamp": int((timestamp or time.time()) * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": namespace or os.environ.get("METRIC_NAMESPACE", DEFAULT_NAMESPACE),
+                "Dimensions": [["Stage", "Trace"]],
+                "Metrics": [{"Name": k, "Unit": unit} for k in metric_dict],
+            }],
+        },
+        "Stage": os.environ.get("STAGE", "local"),
+        "Trace": name,
+    }
+    data.update(properties)
+    data.update(metric_dict)
+    return data
+
+
+def emit_emf(data: dict):
+    # EMF must be printed as single line to stdout to be extracted by CloudWatch
+    print(json.dumps(data), flush=True)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(name: str, **properties):
+    """
+    Start new trace as current trace and emit it on exit with total duration.
+    Name of exception is set to `error` property if raised.
+    """
+    trace = Trace(name, **properties)
+    token = _current_trace.set(trace)
+    try:
+        with trace.span("total"):
+            yield trace
+    except Exception as e:
+        trace.set(error=type(e).__name__)
+        raise
+    finally:
+        _current_trace.reset(token)
+        trace.emit()
+
+
+@contextmanager
+def span(name: str):
+    """
+    Record duration of the block to current trace. Does nothing if there is no current trace.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(name):
+        yield
+
+
+def set_property(**properties):
+    """
+    Set properties of current trace. Does nothing if there is no current trace.
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.set(**properties)
+
+
+def timed(name: Optional[str] = None) -> Callable:
+    """
+    Decorator to record duration of function call to current trace as `name`. Function name is used by default.
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name or fn.__name__):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """
+    Decorator to run function in new trace named as `name`. Function name is used by default.
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with start_trace(name or fn.__name__):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -1,14 +1,20 @@
 from datetime import datetime, timedelta
 from typing import Optional, List, Annotated
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy import select, Date, desc
 from sqlalchemy.orm import joinedload
 
+from common._endpoint import get_headless_pool
 from common.enums import Store, ReceiptStatus
 from common.models.receipt import Receipt
+from common.utils.address import format_addr
 from common.utils.garage import update_iap_garage
 from common.utils.google import update_google_price
+from common.utils.receipt import PlanetID
+from common.utils.receipt_export import EXPORT_WRITER_DICT, ExportFormat, iter_receipts
+from common.utils.receipt_query import encode_cursor, filter_receipts, paginate_receipts
 from iap import settings
 from iap.dependencies import session
 from iap.schemas.receipt import RefundedReceiptSchema, FullReceiptSchema
@@ -42,6 +48,25 @@ def update_garage(sess=Depends(session)):
     return update_iap_garage(sess)
 
 
+@router.get("/endpoint")
+def endpoint_stats(health_check: bool = False):
+    """
+    # Headless endpoint stats
+    ---
+
+    Get latency, success/failure count and circuit state of headless/explorer endpoints used by this service.
+    If `health_check` is `True`, all endpoints are checked before returning stats.
+    """
+    pool_dict = {
+        "headless": get_headless_pool(),
+        "explorer": get_headless_pool(path="/graphql/explorer"),
+    }
+    if health_check:
+        for pool in pool_dict.values():
+            pool.health_check()
+    return {name: pool.stats() for name, pool in pool_dict.items()}
+
+
 @router.get("/refunded", response_model=List[RefundedReceiptSchema])
 def fetch_refunded(
         start: Annotated[
@@ -69,9 +94,58 @@ def fetch_refunded(
 
 
 @router.get("/receipt", response_model=List[FullReceiptSchema])
-def receipt_list(page: int = 0, pp: int = 50, sess=Depends(session)):
-    return sess.scalars(
-        select(Receipt).options(joinedload(Receipt.product))
-        .order_by(desc(Receipt.purchased_at))
-        .offset(pp * page).limit(pp)
-    ).fetchall()
+def receipt_list(
+        response: Response,
+        cursor: Annotated[Optional[str], Query(description="`X-Next-Cursor` header of previous page. "
+                                                           "If not provided, returns the latest receipts.")] = None,
+        pp: Annotated[int, Query(description="Number of receipts in one page.", ge=1, le=1000)] = 50,
+        store: Optional[Store] = None,
+        status: Optional[ReceiptStatus] = None,
+        planet_id: Optional[str] = None,
+        agent_addr: Optional[str] = None,
+        sess=Depends(session)):
+    """
+    # List receipts
+    ---
+
+    Get receipts in the latest purchase first order.
+    To get next page, send `X-Next-Cursor` response header as `cursor`. The header is not set for the last page.
+    """
+    receipt_list = sess.scalars(paginate_receipts(
+        filter_receipts(
+            select(Receipt).options(joinedload(Receipt.product)),
+            store=store, status=status, planet_id=PlanetID(bytes(planet_id, "utf-8")) if planet_id else None,
+            agent_addr=format_addr(agent_addr).lower() if agent_addr else None,
+        ),
+        cursor, pp
+    )).fetchall()
+    if len(receipt_list) == pp:
+        response.headers["X-Next-Cursor"] = encode_cursor(receipt_list[-1].purchased_at, receipt_list[-1].id)
+    return receipt_list
+
+
+@router.get("/receipt/export")
+def export_receipt(
+        format: ExportFormat = ExportFormat.CSV,
+        start: Annotated[Optional[datetime], Query(description="Receipts purchased at or after this time.")] = None,
+        end: Annotated[Optional[datetime], Query(description="Receipts purchased before this time.")] = None,
+        status: Optional[ReceiptStatus] = None,
+        store: Optional[Store] = None,
+        planet_id: Optional[str] = None,
+        currency: Annotated[str, Query(description="Currency of exported product price.")] = "USD",
+        sess=Depends(session)):
+    """
+    # Export receipts
+    ---
+
+    Stream receipts with product SKU, price and status as CSV or NDJSON in purchase order.
+    Receipts are read by server-side cursor and written as they are read.
+
+    **NOTE**
+    Lambda response cannot be larger than 6MB. Use `python -m script.export_receipt` for large range.
+    """
+    writer, media_type = EXPORT_WRITER_DICT[format]
+    rows = iter_receipts(sess, currency=currency, start=start, end=end, status=status, store=store,
+                         planet_id=PlanetID(bytes(planet_id, "utf-8")) if planet_id else None)
+    return StreamingResponse(writer(rows), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="receipt.{format.value}"'})
@@ -1,19 +1,20 @@
-import json
-import os
-import random
+from collections import defaultdict
 from dataclasses import dataclass
-from typing import Dict
+from typing import Dict, List, Optional
 
-import requests
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import desc, select
-from sqlalchemy.exc import NoResultFound
 from sqlalchemy.orm import Session
-from starlette.status import HTTP_500_INTERNAL_SERVER_ERROR
+from starlette.status import HTTP_400_BAD_REQUEST, HTTP_500_INTERNAL_SERVER_ERROR
 
 from common import logger
-from common.consts import HOST_LIST
-from common.models.garage import GarageActionHistory
+from common._endpoint import EndpointPool, get_headless_pool, get_pool
+from common.utils.history import (
+    check_block_range, commit_sync_range, find_sync_gaps, get_stored_block_hashes, get_sync_cursor, insert_actions,
+    rollback_sync, sync_block,
+)
+from common.utils.planet import get_planet_registry
+from common.utils.receipt import PlanetID
+from iap import settings
 from iap.dependencies import session
 
 router = APIRouter(
@@ -21,8 +22,10 @@ router = APIRouter(
     tags=["Garage"],
 )
 
-STAGE = os.environ.get("STAGE", "development")
-EXPLORER_URL = f"{random.choice(HOST_LIST[STAGE])}/graphql/explorer"
+# Explorer of `HOST_LIST` nodes. Only used for default planet of stage when planet registry has no endpoint.
+EXPLORER_POOL = get_headless_pool(path="/graphql/explorer")
+# Stored block hashes to read at once while walking back to find where reorg started.
+REORG_CHECK_SIZE = 100
 
 
 @dataclass
@@ -40,109 +43,197 @@ class UnloadSchema:
     pass
 
 
-def request(url: str, data: Dict) -> Dict:
-    resp = requests.post(url, json=data)
+def request(pool: EndpointPool, data: Dict) -> Dict:
+    resp = pool.post(json=data)
     if resp.status_code != 200:
-        err = f"Block tip query to {EXPLORER_URL} failed with status code {resp.status_code}"
+        err = f"Block query to {resp.url} failed with status code {resp.status_code}"
         logger.error(err)
         raise HTTPException(status_code=HTTP_500_INTERNAL_SERVER_ERROR, detail=err)
     r = resp.json()
     if "errors" in r:
-        err = f"Block tip query failed with error : {r['errors']}"
+        err = f"Block query failed with error : {r['errors']}"
         logger.error(err)
         raise HTTPException(status_code=HTTP_500_INTERNAL_SERVER_ERROR, detail=err)
     return r
 
 
-def process_load(data: dict):
-    pass
-
+def get_default_planet_id() -> PlanetID:
+    return PlanetID.ODIN if settings.stage == "mainnet" else PlanetID.ODIN_INTERNAL
 
-def process_deliver(data: dict):
-    pass
 
+def get_planet_id(planet_id: str = "") -> PlanetID:
+    if not planet_id:
+        return get_default_planet_id()
+    try:
+        return PlanetID(bytes(planet_id, "utf-8"))
+    except ValueError:
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=f"Unknown planet ID {planet_id}")
 
-def process_unload(data: dict):
-    pass
 
+def get_explorer_pool(planet_id: PlanetID) -> EndpointPool:
+    """
+    Get explorer endpoint pool serving given planet.
 
-def sync_block(block_data):
-    # TODO
-    GARAGE_ACTION_TYPES = {
-        # Load
-        "load_into_my_garages": process_load,
-        # Deliver
-        "deliver_to_others_garages": process_deliver,
-        # Unload
-        "unload_from_my_garages": process_unload,
-    }
-    logger.info(f"Process Block {block_data['index']} :: {block_data['hash']}")
-    logger.info(f"{len(block_data['transactions'])} Transactions")
-    cnt = 0
-    # print(block_data)
-    # TODO: Need transaction result
-    for tx in block_data["transactions"]:
-        for action in tx["actions"]:
-            json_action = json.loads(action["json"].replace("\\uFEFF", ""))
-            if json_action["type_id"].startswith("transfer_asset"):
-                logger.info(json_action["values"])
-                continue
-            if json_action["type_id"] in GARAGE_ACTION_TYPES:
-                cnt += 1
-                logger.debug(json_action["values"])
-                if action["type_id"].startswith("load_into_my_garages"):
-                    process_load(json_action["values"])
-                elif action["type_id"].startswith("deliver_to_others_garages"):
-                    process_deliver(json_action["values"])
-                elif action["type_id"].startswith("unload_from_my_garages"):
-                    process_unload(json_action["values"])
-                else:
-                    logger.error(f"{json_action['type_id']} is not valid action type")
-
-        logger.info("=" * 32)
-    logger.info(f"{cnt} actions are processed")
+    Explorer is served under headless GQL endpoints of the planet in planet registry.
+    `HOST_LIST` nodes only serve default planet of stage, so other planets without registry endpoint are rejected
+    instead of syncing blocks of another planet.
+    """
+    endpoint_list = get_planet_registry().get_gql_endpoints(planet_id)
+    if endpoint_list:
+        return get_pool(f"{url.rstrip('/')}/explorer" for url in endpoint_list)
+    if planet_id == get_default_planet_id():
+        return EXPLORER_POOL
+    raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=f"No explorer endpoint for {planet_id.name}")
 
 
-@router.get("/sync")
-def sync_block_history(start: int = None, end: int = None, limit: int = 100, sess: Session = Depends(session)):
+def fetch_tip(pool: EndpointPool) -> int:
     tip_query = """query { blockQuery { blocks(desc: true limit: 1) { index } } }"""
-    resp = request(EXPLORER_URL, {"query": tip_query})
-    tip = resp["data"]["blockQuery"]["blocks"][0]["index"]
-
-    if end is None:
-        end = tip
+    resp = request(pool, {"query": tip_query})
+    return resp["data"]["blockQuery"]["blocks"][0]["index"]
 
-    if start is None:
-        # Start from last block on DB
-        try:
-            last_block = sess.execute(
-                select(GarageActionHistory).order_by(desc(GarageActionHistory.block_index))
-            ).scalars().one()
-        except NoResultFound:
-            last_block = None
 
-        if not last_block:
-            start = end - limit
+def fetch_block_hash(pool: EndpointPool, index: int) -> str:
+    query = f"""query {{ blockQuery {{ blocks(desc: false offset: {index} limit: 1) {{ index hash }} }} }}"""
+    resp = request(pool, {"query": query})
+    return resp["data"]["blockQuery"]["blocks"][0]["hash"]
 
-    logger.info(f"{start} ~ {end}, limit {limit}")
 
+def fetch_blocks(pool: EndpointPool, tip: int, start: int, end: int) -> List[Dict]:
+    """
+    Fetch blocks between `start` and `end` (both inclusive) in descending order.
+    """
     query = f"""
-    query {{ blockQuery {{ blocks(desc: true offset: {tip - start} limit: {limit}) {{ 
+    query {{ blockQuery {{ blocks(desc: true offset: {tip - end} limit: {end - start + 1}) {{ 
     hash index timestamp transactions {{ id signer timestamp actions {{ json }} }} 
     }} }} }}
     """
-    resp = request(EXPLORER_URL, {"query": query})
+    resp = request(pool, {"query": query})
+    return resp["data"]["blockQuery"]["blocks"]
+
+
+def find_fork_block(sess: Session, planet_id: PlanetID, pool: EndpointPool, before: int) -> int:
+    """
+    Walk back stored block hashes from `before` and find the highest block still matched with the chain.
+
+    A block is matched only when every hash stored for it is the same as the chain.
+    If no stored block is matched, the block right before the first synced block is returned,
+    so all synced history is rolled back.
+
+    :return: Index of last valid block to keep.
+    """
+    lowest = before
+    while True:
+        stored_list = get_stored_block_hashes(sess, planet_id, before, limit=REORG_CHECK_SIZE)
+        if not stored_list:
+            return max(lowest - 1, 0)
+
+        hash_dict = defaultdict(set)
+        for index, block_hash in stored_list:
+            hash_dict[index].add(block_hash)
+        index_list = sorted(hash_dict, reverse=True)
+        if len(stored_list) == REORG_CHECK_SIZE and len(index_list) > 1:
+            # Hashes of the lowest block can be cut by limit. Read it again with the next page.
+            index_list.pop()
+        for index in index_list:
+            if hash_dict[index] == {fetch_block_hash(pool, index)}:
+                return index
+        lowest = index_list[-1]
+        before = lowest
+
+
+def check_reorg(sess: Session, planet_id: PlanetID, pool: EndpointPool) -> bool:
+    """
+    Compare hash of sync cursor block with chain and rollback history to the fork block if they are different.
+
+    :return: `True` if reorg is detected and history is rolled back.
+    """
+    cursor = get_sync_cursor(sess, planet_id)
+    if cursor is None:
+        return False
 
-    block_list = resp["data"]["blockQuery"]["blocks"]
+    if fetch_block_hash(pool, cursor.block_index) == cursor.block_hash:
+        return False
+
+    logger.warning(f"Block hash of {cursor.block_index} is changed. Reorg detected on {planet_id.name}.")
+    rollback_index = find_fork_block(sess, planet_id, pool, cursor.block_index)
+    logger.warning(f"Block {rollback_index} is the last block matched with chain on {planet_id.name}.")
+    rollback_sync(sess, planet_id, rollback_index, fetch_block_hash(pool, rollback_index))
+    sess.commit()
+    return True
+
+
+@router.get("/sync")
+def sync_block_history(start: int = None, end: int = None, limit: int = 100, planet_id: str = "",
+                       sess: Session = Depends(session)):
+    """
+    # Sync garage history
+    ---
+
+    Sync garage action history of blocks between `start` and `end`, at most `limit` blocks at once.
+
+    If `start` is not provided, sync resumes from the block right after the last fully committed block of the planet.
+    Synced range is committed with history, so next call continues from where this call finished.
+    """
+    planet_id = get_planet_id(planet_id)
+    pool = get_explorer_pool(planet_id)
+    tip = fetch_tip(pool)
+
+    if end is None:
+        end = tip
+
+    if start is None:
+        check_reorg(sess, planet_id, pool)
+        cursor = get_sync_cursor(sess, planet_id)
+        # Start from last committed block on DB
+        start = cursor.block_index + 1 if cursor else end - limit + 1
+
+    end = min(end, start + limit - 1, tip)
+    logger.info(f"{start} ~ {end}, limit {limit}")
+    if start > end:
+        msg = f"Garage history of {planet_id.name} is already synced to {start - 1}"
+        logger.info(msg)
+        return msg
+
+    block_list = fetch_blocks(pool, tip, start, end)
     logger.info(f"{len(block_list)} blocks are fetched")
     if len(block_list) == 0:
-        msg = f"No block containing transactions found between {start} and {end}"
+        msg = f"No block found between {start} and {end}"
         logger.warning(msg)
         return msg
 
+    try:
+        # Tip can be moved after `fetch_tip`, which shifts the offset of fetched blocks
+        block_list = check_block_range(block_list, start, end)
+    except ValueError as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+    action_list = []
     for block in block_list:
-        sync_block(block)
+        action_list.extend(sync_block(block, planet_id))
+    insert_actions(sess, action_list)
 
-    result = f"{len(block_list)} blocks synced: from {block_list[-1]['index']} to {block_list[0]['index']}"
+    commit_sync_range(sess, planet_id,
+                      block_list[0]["index"], block_list[0]["hash"],
+                      block_list[-1]["index"], block_list[-1]["hash"])
+    sess.commit()
+
+    result = (f"{len(block_list)} blocks synced: from {block_list[0]['index']} to {block_list[-1]['index']}. "
+              f"{len(action_list)} garage actions found.")
     logger.info(result)
     return result
+
+
+@router.get("/gap", response_model=List[List[int]])
+def sync_gap_report(start: Optional[int] = None, end: Optional[int] = None, planet_id: str = "",
+                    sess: Session = Depends(session)):
+    """
+    # Sync gap report
+    ---
+
+    Returns list of `[start, end]` block ranges which are not synced yet. Both ends are inclusive.
+    """
+    planet_id = get_planet_id(planet_id)
+    # Planet which cannot be synced is rejected, rather than reporting its whole range as gap
+    get_explorer_pool(planet_id)
+    return [list(gap) for gap in find_sync_gaps(sess, planet_id, start, end)]
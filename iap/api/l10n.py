@@ -1,7 +1,9 @@
 import os
+from functools import lru_cache
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 
+from iap.response import dump_json, etag_response
 from iap.schemas.l10n import L10NSchema
 
 router = APIRouter(
@@ -9,11 +11,20 @@ router = APIRouter(
     tags=["L10N"],
 )
 
+# Seconds for clients to reuse l10n response before checking its ETag
+L10N_MAX_AGE = int(os.environ.get("L10N_MAX_AGE", 300))
 
-@router.get("", response_model=L10NSchema)
-def l10n_list():
-    return L10NSchema(
+
+@lru_cache(maxsize=1)
+def get_l10n_content() -> bytes:
+    # Only depends on environment, so serialize once per process
+    return dump_json(L10NSchema, L10NSchema(
         host=os.environ.get("CDN_HOST", "http://localhost"),
         category="shop/l10n/category.csv",
         product="shop/l10n/product.csv"
-    )
+    ))
+
+
+@router.get("", response_model=L10NSchema)
+def l10n_list(request: Request):
+    return etag_response(request, get_l10n_content(), cache_control=f"public, max-age={L10N_MAX_AGE}")
@@ -1,95 +1,78 @@
-from datetime import datetime
-from typing import List
+import os
+import time
+from typing import Dict, List
 
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import joinedload
+from fastapi import APIRouter, Depends, Request
 
-from common.models.product import Product, Category
 from common.utils.address import format_addr
-from common.utils.garage import get_iap_garage
 from common.utils.receipt import PlanetID
 from iap import settings
+from iap.catalog import get_catalog, get_overlay
 from iap.dependencies import session
-from iap.schemas.product import CategorySchema, ProductSchema
-from iap.utils import get_purchase_count
+from iap.response import RawJSONResponse, dump_json, etag_response
+from iap.schemas.product import CategorySchema, ProductOverlaySchema
 
 router = APIRouter(
     prefix="/product",
     tags=["Product"],
 )
 
+# Seconds for CDN and clients to reuse catalog response
+CATALOG_MAX_AGE = int(os.environ.get("CATALOG_MAX_AGE", 60))
+
+
+def get_planet_id(planet_id: str) -> PlanetID:
+    if not planet_id:
+        return PlanetID.ODIN if settings.stage == "mainnet" else PlanetID.ODIN_INTERNAL
+    return PlanetID(bytes(planet_id, "utf-8"))
+
 
 @router.get("", response_model=List[CategorySchema])
-def product_list(agent_addr: str,
+def product_list(request: Request,
+                 agent_addr: str,
                  planet_id: str = "",
                  sess=Depends(session)):
-    if not planet_id:
-        planet_id = PlanetID.ODIN if settings.stage == "mainnet" else PlanetID.ODIN_INTERNAL
-    else:
-        planet_id = PlanetID(bytes(planet_id, "utf-8"))
-
+    planet_id = get_planet_id(planet_id)
     agent_addr = format_addr(agent_addr).lower()
-    # FIXME: Optimize query
-    all_category_list = (
-        sess.query(Category).options(joinedload(Category.product_list))
-        .join(Product.fav_list)
-        .join(Product.fungible_item_list)
-        .filter(Category.active.is_(True)).filter(Product.active.is_(True))
-        .order_by(Category.order, Product.order)
-    ).all()
-
-    iap_garage = {x.fungible_id: x.amount for x in get_iap_garage(sess)}
-    garage = {}
-    for category in all_category_list:
-        if ((category.open_timestamp and category.open_timestamp > datetime.now()) or
-                (category.close_timestamp and category.close_timestamp <= datetime.now())):
-            continue
+    catalog = get_catalog(sess)
+    # Catalog is already serialized. Only buyable and purchase count are rendered for this agent.
+    # Response differs by agent and purchase, so it is not shared and revalidated every time.
+    return etag_response(request, catalog.render(get_overlay(sess, catalog, planet_id, agent_addr)),
+                         cache_control="private, no-cache")
 
-        for product in category.product_list:
-            for fungible_item in product.fungible_item_list:
-                garage[fungible_item.fungible_item_id] = iap_garage.get(fungible_item.fungible_item_id, 0)
 
-    category_schema_list = []
-    for category in all_category_list:
-        cat_schema = CategorySchema.model_validate(category)
-        schema_dict = {}
-        for product in category.product_list:
-            # Skip non-active products
-            if ((product.open_timestamp and product.open_timestamp > datetime.now()) or
-                    (product.close_timestamp and product.close_timestamp <= datetime.now())):
-                continue
+@router.get("/catalog", response_model=List[CategorySchema])
+def product_catalog(request: Request, planet_id: str = "", sess=Depends(session)):
+    """
+    Get product list, which is same for all planets and agents and cacheable by CDN.
 
-            schema_dict[product.id] = ProductSchema.model_validate(product)
-            # FIXME: Pinpoint get product buyability
-            product_buyable = True
-            # Check fungible item stock in garage
-            for item in product.fungible_item_list:
-                if garage.get(item.fungible_item_id, 0) < item.amount:
-                    schema_dict[product.id].buyable = False
-                    product_buyable = False
-                    break
+    **NOTE**
+    `buyable` and `purchase_count` in this response are default values.
+    Take them from `/product/overlay` for the agent.
+    Send ETag of previous response as `If-None-Match` to get empty 304 response when catalog is not changed.
+    """
+    # Catalog is same for all planets. `planet_id` is only kept for compatibility of clients.
+    catalog = get_catalog(sess)
+    max_age = CATALOG_MAX_AGE
+    if catalog.expires_at:
+        # Do not let catalog be cached over next open or close of product
+        max_age = max(0, min(max_age, int(catalog.expires_at - time.time())))
+    # Payload and ETag are kept in cached catalog, so 304 only costs the version query
+    return etag_response(request, catalog.payload, etag=catalog.etag, cache_control=f"public, max-age={max_age}")
 
-            if not product_buyable:
-                continue
 
-            # Check purchase history
-            schema = schema_dict[product.id]
-            if product.daily_limit:
-                schema.purchase_count = get_purchase_count(
-                    sess, product.id, planet_id=planet_id, agent_addr=agent_addr, hour_limit=24
-                )
-                schema.buyable = schema.purchase_count < product.daily_limit
-            elif product.weekly_limit:
-                schema.purchase_count = get_purchase_count(
-                    sess, product.id, planet_id=planet_id, agent_addr=agent_addr, hour_limit=24 * 7
-                )
-                schema.buyable = schema.purchase_count < product.weekly_limit
-            elif product.account_limit:
-                schema.purchase_count = get_purchase_count(
-                    sess, product.id, planet_id=planet_id, agent_addr=agent_addr
-                )
-                schema.buyable = schema.purchase_count < product.account_limit
-        cat_schema.product_list = list(schema_dict.values())
-        category_schema_list.append(cat_schema)
-
-    return category_schema_list
+@router.get("/overlay", response_model=Dict[int, ProductOverlaySchema])
+def product_overlay(agent_addr: str, planet_id: str = "", sess=Depends(session)):
+    """
+    Get buyability and purchase count of each product in `/product/catalog` for the agent, keyed by product ID.
+    """
+    planet_id = get_planet_id(planet_id)
+    agent_addr = format_addr(agent_addr).lower()
+    catalog = get_catalog(sess)
+    overlay = get_overlay(sess, catalog, planet_id, agent_addr)
+    return RawJSONResponse(
+        dump_json(Dict[int, ProductOverlaySchema],
+                  {k: ProductOverlaySchema(buyable=buyable, purchase_count=purchase_count)
+                   for k, (buyable, purchase_count) in overlay.items()}),
+        headers={"Cache-Control": "private, no-store"},
+    )
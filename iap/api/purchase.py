@@ -5,11 +5,8 @@ from datetime import datetime
 from typing import Tuple, List, Dict, Optional, Annotated
 from uuid import UUID
 
-import boto3
-import jwt
 import requests
 from fastapi import APIRouter, Depends, Query
-from googleapiclient.errors import HttpError
 from sqlalchemy import select
 from sqlalchemy.orm import joinedload
 
@@ -17,12 +14,14 @@ from common.enums import ReceiptStatus, Store, GooglePurchaseState
 from common.models.product import Product
 from common.models.receipt import Receipt
 from common.utils.apple import get_jwt
-from common.utils.aws import fetch_parameter
+from common.utils.aws import get_client, get_parameter_cache
 from common.utils.google import get_google_client
 from common.utils.receipt import PlanetID
+from common.utils.trace import set_property, span, timed, traced
 from iap import settings
 from iap.dependencies import session
 from iap.main import logger
+from iap.response import RawJSONResponse, dump_json
 from iap.schemas.receipt import ReceiptSchema, ReceiptDetailSchema, GooglePurchaseSchema, ApplePurchaseSchema
 from iap.utils import create_season_pass_jwt, get_purchase_count
 from iap.validator.common import get_order_data
@@ -32,11 +31,13 @@ router = APIRouter(
     tags=["Purchase"],
 )
 
-sqs = boto3.client("sqs", region_name=settings.REGION_NAME)
 SQS_URL = os.environ.get("SQS_URL")
 
 
+@timed("apple.validate")
 def validate_apple(tx_id: str) -> Tuple[bool, str, Optional[ApplePurchaseSchema]]:
+    import jwt
+
     headers = {
         "Authorization": f"Bearer {get_jwt(settings.APPLE_CREDENTIAL, settings.APPLE_BUNDLE_ID, settings.APPLE_KEY_ID, settings.APPLE_ISSUER_ID)}"
     }
@@ -53,6 +54,7 @@ def validate_apple(tx_id: str) -> Tuple[bool, str, Optional[ApplePurchaseSchema]
         return True, "", schema
 
 
+@timed("google.validate")
 def validate_google(sku: str, token: str) -> Tuple[bool, str, GooglePurchaseSchema]:
     client = get_google_client(settings.GOOGLE_CREDENTIAL)
     resp = GooglePurchaseSchema(
@@ -66,7 +68,10 @@ def validate_google(sku: str, token: str) -> Tuple[bool, str, GooglePurchaseSche
     return True, msg, resp
 
 
+@timed("google.consume")
 def consume_google(sku: str, token: str):
+    from googleapiclient.errors import HttpError
+
     client = get_google_client(settings.GOOGLE_CREDENTIAL)
     try:
         resp = client.purchases().products().consume(
@@ -79,6 +84,7 @@ def consume_google(sku: str, token: str):
 
 
 def raise_error(sess, receipt: Receipt, e: Exception):
+    set_property(status=receipt.status.name)
     sess.add(receipt)
     sess.commit()
     logger.error(f"[{receipt.uuid}] :: {e}")
@@ -86,6 +92,7 @@ def raise_error(sess, receipt: Receipt, e: Exception):
 
 
 @router.post("/request", response_model=ReceiptDetailSchema)
+@traced("request_product")
 def request_product(receipt_data: ReceiptSchema, sess=Depends(session)):
     """
     # Purchase Request
@@ -112,22 +119,26 @@ def request_product(receipt_data: ReceiptSchema, sess=Depends(session)):
     if not receipt_data.planetId:
         receipt_data.planetId = PlanetID.ODIN if settings.stage == "mainnet" else PlanetID.ODIN_INTERNAL
 
+    set_property(store=receipt_data.store.name)
     order_id, product_id, purchased_at = get_order_data(receipt_data)
-    prev_receipt = sess.scalar(
-        select(Receipt).where(Receipt.store == receipt_data.store, Receipt.order_id == order_id)
-    )
+    with span("db.prev_receipt"):
+        prev_receipt = sess.scalar(
+            select(Receipt).where(Receipt.store == receipt_data.store, Receipt.order_id == order_id)
+        )
     if prev_receipt:
         logger.debug(f"prev. receipt exists: {prev_receipt.uuid}")
+        set_property(uuid=prev_receipt.uuid, status=prev_receipt.status.name, duplicated=True)
         return prev_receipt
 
     product = None
     # If prev. receipt exists, check current status and returns result
     if receipt_data.store in (Store.GOOGLE, Store.GOOGLE_TEST):
-        product = sess.scalar(
-            select(Product)
-            .options(joinedload(Product.fav_list)).options(joinedload(Product.fungible_item_list))
-            .where(Product.active.is_(True), Product.google_sku == product_id)
-        )
+        with span("db.product"):
+            product = sess.scalar(
+                select(Product)
+                .options(joinedload(Product.fav_list)).options(joinedload(Product.fungible_item_list))
+                .where(Product.active.is_(True), Product.google_sku == product_id)
+            )
     elif receipt_data.store in (Store.APPLE, Store.APPLE_TEST):
         # NOTE: We can get productId after validation in apple.
         #  So validate this later in apple.
@@ -138,11 +149,12 @@ def request_product(receipt_data: ReceiptSchema, sess=Depends(session)):
         # )
         pass
     elif receipt_data.store == Store.TEST:
-        product = sess.scalar(
-            select(Product)
-            .options(joinedload(Product.fav_list)).options(joinedload(Product.fungible_item_list))
-            .where(Product.active.is_(True), Product.id == product_id)
-        )
+        with span("db.product"):
+            product = sess.scalar(
+                select(Product)
+                .options(joinedload(Product.fav_list)).options(joinedload(Product.fungible_item_list))
+                .where(Product.active.is_(True), Product.id == product_id)
+            )
 
     # Save incoming data first
     receipt = Receipt(
@@ -155,9 +167,11 @@ def request_product(receipt_data: ReceiptSchema, sess=Depends(session)):
         product_id=product.id if product is not None else None,
         planet_id=receipt_data.planetId.value,
     )
-    sess.add(receipt)
-    sess.flush()
-    sess.refresh(receipt)
+    with span("db.save_receipt"):
+        sess.add(receipt)
+        sess.flush()
+        sess.refresh(receipt)
+    set_property(uuid=receipt.uuid)
 
     if receipt_data.store not in (Store.APPLE, Store.APPLE_TEST) and not product:
         receipt.status = ReceiptStatus.INVALID
@@ -193,11 +207,12 @@ def request_product(receipt_data: ReceiptSchema, sess=Depends(session)):
             receipt.data = data
             receipt.purchased_at = purchase.originalPurchaseDate
             # Get product from validation result and check product existence.
-            product = sess.scalar(
-                select(Product)
-                .options(joinedload(Product.fav_list)).options(joinedload(Product.fungible_item_list))
-                .where(Product.active.is_(True), Product.apple_sku == purchase.productId)
-            )
+            with span("db.product"):
+                product = sess.scalar(
+                    select(Product)
+                    .options(joinedload(Product.fav_list)).options(joinedload(Product.fungible_item_list))
+                    .where(Product.active.is_(True), Product.apple_sku == purchase.productId)
+                )
         if not product:
             receipt.status = ReceiptStatus.INVALID
             raise_error(sess, receipt,
@@ -239,27 +254,28 @@ def request_product(receipt_data: ReceiptSchema, sess=Depends(session)):
             season = int(body[-1])
         except:
             season = 0
-        season_pass_host = fetch_parameter(
-            settings.REGION_NAME,
-            f"{os.environ.get('STAGE')}_9c_SEASON_PASS_HOST", False
-        )["Value"]
+        with span("ssm.season_pass_host"):
+            season_pass_host = get_parameter_cache(settings.REGION_NAME).get(
+                f"{os.environ.get('STAGE')}_9c_SEASON_PASS_HOST", False
+            )
         claim_list = [{"ticker": x.fungible_item_id, "amount": x.amount, "decimal_places": 0}
                       for x in product.fungible_item_list]
         claim_list.extend([{"ticker": x.ticker, "amount": x.amount, "decimal_places": x.decimal_places}
                            for x in product.fav_list])
-        resp = requests.post(f"{season_pass_host}/api/user/upgrade",
-                             json={
-                                 "planet_id": receipt_data.planetId.value.decode("utf-8"),
-                                 "agent_addr": receipt.agent_addr.lower(),
-                                 "avatar_addr": receipt.avatar_addr.lower(),
-                                 "season_id": int(season),
-                                 "is_premium": True if (not body[:-1] or "all" in body) else False,
-                                 "is_premium_plus": "plus" in body or "all" in body,
-                                 "g_sku": product.google_sku, "a_sku": product.apple_sku,
-                                 # SeasonPass only uses claims
-                                 "reward_list": claim_list,
-                             },
-                             headers={"Authorization": f"Bearer {create_season_pass_jwt()}"})
+        with span("season_pass.upgrade"):
+            resp = requests.post(f"{season_pass_host}/api/user/upgrade",
+                                 json={
+                                     "planet_id": receipt_data.planetId.value.decode("utf-8"),
+                                     "agent_addr": receipt.agent_addr.lower(),
+                                     "avatar_addr": receipt.avatar_addr.lower(),
+                                     "season_id": int(season),
+                                     "is_premium": True if (not body[:-1] or "all" in body) else False,
+                                     "is_premium_plus": "plus" in body or "all" in body,
+                                     "g_sku": product.google_sku, "a_sku": product.apple_sku,
+                                     # SeasonPass only uses claims
+                                     "reward_list": claim_list,
+                                 },
+                                 headers={"Authorization": f"Bearer {create_season_pass_jwt()}"})
         if resp.status_code != 200:
             receipt.msg = f"{resp.status_code} :: {resp.text}"
             msg = f"SeasonPass Upgrade Failed: {resp.text}"
@@ -290,12 +306,15 @@ def request_product(receipt_data: ReceiptSchema, sess=Depends(session)):
         "planet_id": receipt_data.planetId.decode('utf-8'),
     }
 
-    resp = sqs.send_message(QueueUrl=SQS_URL, MessageBody=json.dumps(msg))
+    with span("sqs.send"):
+        resp = get_client("sqs", settings.REGION_NAME).send_message(QueueUrl=SQS_URL, MessageBody=json.dumps(msg))
     logger.debug(f"message [{resp['MessageId']}] sent to SQS.")
 
-    sess.add(receipt)
-    sess.commit()
-    sess.refresh(receipt)
+    set_property(status=receipt.status.name)
+    with span("db.commit"):
+        sess.add(receipt)
+        sess.commit()
+        sess.refresh(receipt)
 
     return receipt
 
@@ -310,4 +329,6 @@ def purchase_status(uuid: Annotated[List[UUID], Query()] = ..., sess=Depends(ses
     For the non-existing UUID, response body of that UUID would be `null`. Please be aware client must handle `null`.
     """
     receipt_dict = {x.uuid: x for x in sess.scalars(select(Receipt).where(Receipt.uuid.in_(uuid))).fetchall()}
-    return {x: receipt_dict.get(x, None) for x in uuid}
+    # Validate receipts once and serialize directly instead of `response_model` validating and encoding again
+    return RawJSONResponse(dump_json(Dict[UUID, Optional[ReceiptDetailSchema]],
+                                     {x: receipt_dict.get(x, None) for x in uuid}, from_attributes=True))
@@ -0,0 +1,257 @@
+import hashlib
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from functools import cached_property
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import Date, cast, func, select
+from sqlalchemy.orm import joinedload
+
+from common.enums import ReceiptStatus
+from common.models.product import Category, FungibleAssetProduct, FungibleItemProduct, Product, category_product_table
+from common.models.receipt import Receipt
+from common.utils.garage import get_iap_garage
+from common.utils.receipt import PlanetID
+from common.utils.trace import timed
+from iap.response import SerializedCache
+from iap.schemas.product import CategorySchema, ProductSchema
+
+# Fields of `ProductSchema` which differ by agent. Everything else in catalog is same for all agents.
+OVERLAY_FIELD_SET = {"buyable", "purchase_count"}
+CATALOG_MODEL_LIST = (Category, Product, FungibleAssetProduct, FungibleItemProduct)
+# Catalog is rebuilt after this seconds even if version is not changed, in case of rows updated without `updated_at`
+CATALOG_CACHE_TTL = float(os.environ.get("CATALOG_CACHE_TTL", 60))
+
+_catalog_cache = SerializedCache(max_size=8)
+
+
+@dataclass
+class CatalogProduct:
+    id: int
+    daily_limit: Optional[int]
+    weekly_limit: Optional[int]
+    account_limit: Optional[int]
+    # (fungible_item_id, amount) to check stock in garage
+    item_list: List[Tuple[str, int]]
+    # Serialized `ProductSchema` without overlay fields and closing brace
+    body: bytes
+
+    def render(self, buyable: bool = True, purchase_count: int = 0) -> bytes:
+        return b"".join((
+            self.body, b',"buyable":', b"true" if buyable else b"false",
+            b',"purchase_count":', str(purchase_count).encode(), b"}",
+        ))
+
+
+@dataclass
+class CatalogCategory:
+    # Serialized `CategorySchema` until opening bracket of `product_list`
+    head: bytes
+    product_list: List[CatalogProduct] = field(default_factory=list)
+
+
+@dataclass
+class Catalog:
+    """
+    Serialized product list shared by all planets and agents.
+
+    Only `buyable` and `purchase_count` of each product are rendered per request,
+    so the catalog is not validated and serialized again for each agent.
+    """
+    version: str
+    category_list: List[CatalogCategory]
+    # Items of opened categories. Stock of other items is treated as empty.
+    fungible_id_set: Set[str]
+    # Epoch seconds when any category or product is opened or closed next
+    expires_at: Optional[float] = None
+
+    def iter_products(self) -> Iterator[CatalogProduct]:
+        for category in self.category_list:
+            yield from category.product_list
+
+    @cached_property
+    def payload(self) -> bytes:
+        """
+        Catalog without overlay. `buyable` and `purchase_count` are defaults and must be taken from overlay.
+        """
+        return self.render({})
+
+    @cached_property
+    def etag(self) -> str:
+        # Hash of content, not `version`, because content is also changed by open and close timestamps
+        return f'"{hashlib.sha1(self.payload).hexdigest()}"'
+
+    def render(self, overlay: Dict[int, Tuple[bool, int]]) -> bytes:
+        """
+        :param overlay: Dict of product ID and (buyable, purchase_count). Default is (True, 0).
+        :return: JSON bytes of `List[CategorySchema]`
+        """
+        return b"".join((
+            b"[",
+            b",".join(
+                b"".join((
+                    category.head,
+                    b",".join(x.render(*overlay.get(x.id, (True, 0))) for x in category.product_list),
+                    b"]}",
+                ))
+                for category in self.category_list
+            ),
+            b"]",
+        ))
+
+
+def get_catalog_version(sess) -> str:
+    """
+    Get version of catalog tables from row counts and last update time in one query.
+    Version is changed when any catalog row is added, deleted or updated.
+    """
+    column_list = []
+    for model in CATALOG_MODEL_LIST:
+        column_list.append(select(func.count(model.id)).scalar_subquery())
+        column_list.append(select(func.max(model.updated_at)).scalar_subquery())
+    # Association has no timestamp. Use checksum of pairs to detect re-linked products.
+    column_list.append(select(func.count()).select_from(category_product_table).scalar_subquery())
+    column_list.append(
+        select(func.sum(category_product_table.c.category_id * category_product_table.c.product_id)).scalar_subquery()
+    )
+    row = sess.execute(select(*column_list)).one()
+    return hashlib.sha1(repr(tuple(row)).encode()).hexdigest()[:16]
+
+
+def _is_opened(target, now: datetime) -> bool:
+    return not ((target.open_timestamp and target.open_timestamp > now) or
+                (target.close_timestamp and target.close_timestamp <= now))
+
+
+def build_catalog(sess, version: str) -> Catalog:
+    now = datetime.now()
+    all_category_list = (
+        sess.query(Category).options(joinedload(Category.product_list))
+        .join(Product.fav_list)
+        .join(Product.fungible_item_list)
+        .filter(Category.active.is_(True)).filter(Product.active.is_(True))
+        .order_by(Category.order, Product.order)
+    ).all()
+
+    fungible_id_set = set()
+    boundary_list = []
+    category_list = []
+    for category in all_category_list:
+        boundary_list.extend([category.open_timestamp, category.close_timestamp])
+        if _is_opened(category, now):
+            for product in category.product_list:
+                fungible_id_set.update(x.fungible_item_id for x in product.fungible_item_list)
+
+        head = CategorySchema.model_validate(category).model_dump_json(exclude={"product_list"}).encode()
+        catalog_category = CatalogCategory(head=head[:-1] + b',"product_list":[')
+        product_dict = {}
+        for product in category.product_list:
+            boundary_list.extend([product.open_timestamp, product.close_timestamp])
+            # Skip non-active products
+            if not _is_opened(product, now) or product.id in product_dict:
+                continue
+
+            body = ProductSchema.model_validate(product).model_dump_json(exclude=OVERLAY_FIELD_SET).encode()
+            product_dict[product.id] = CatalogProduct(
+                id=product.id, daily_limit=product.daily_limit, weekly_limit=product.weekly_limit,
+                account_limit=product.account_limit,
+                item_list=[(x.fungible_item_id, x.amount) for x in product.fungible_item_list],
+                body=body[:-1],
+            )
+        catalog_category.product_list = list(product_dict.values())
+        category_list.append(catalog_category)
+
+    expires_at = time.time() + CATALOG_CACHE_TTL
+    future_list = [x.timestamp() for x in boundary_list if x and x > now]
+    if future_list:
+        expires_at = min(expires_at, min(future_list))
+    return Catalog(version=version, category_list=category_list, fungible_id_set=fungible_id_set,
+                   expires_at=expires_at)
+
+
+def get_catalog(sess) -> Catalog:
+    """
+    Get catalog cached per catalog version. Catalog is built again when version is changed
+    or any category or product is opened or closed by time.
+    Catalog tables have no planet, so one catalog is shared by all planets.
+    """
+    version = get_catalog_version(sess)
+    catalog = _catalog_cache.get(version)
+    if catalog is None:
+        catalog = build_catalog(sess, version)
+        _catalog_cache.set(version, catalog, expires_at=catalog.expires_at)
+    return catalog
+
+
+@timed("db.purchase_count_dict")
+def get_purchase_count_dict(sess, product_id_list: Iterable[int], *, planet_id: PlanetID,
+                            agent_addr: str) -> Dict[int, Tuple[int, int, int]]:
+    """
+    Get purchase counts of all given products in one query, instead of calling `iap.utils.get_purchase_count` for each.
+
+    :param sess: DB Session
+    :param product_id_list: Target product IDs to scan.
+    :param planet_id: Planet ID of purchase
+    :param agent_addr: 9c Agent address
+    :return: Dict of product ID and (daily, weekly, lifetime) purchase count, same as `get_purchase_count`
+        with `hour_limit` 24, 168 and 0. Products never purchased are omitted.
+    """
+    product_id_list = list(product_id_list)
+    if not product_id_list:
+        return {}
+
+    # Same date boundaries as `get_purchase_count`
+    now = datetime.utcnow()
+    purchased_date = cast(Receipt.purchased_at, Date)
+    stmt = (
+        select(
+            Receipt.product_id,
+            func.count(Receipt.id).filter(purchased_date >= now.date()),
+            func.count(Receipt.id).filter(purchased_date >= (now - timedelta(hours=24 * 6)).date()),
+            func.count(Receipt.id),
+        )
+        .where(
+            Receipt.product_id.in_(product_id_list),
+            Receipt.planet_id == planet_id,
+            Receipt.agent_addr == agent_addr,
+            Receipt.status.in_((ReceiptStatus.INIT, ReceiptStatus.VALIDATION_REQUEST, ReceiptStatus.VALID)),
+        )
+        .group_by(Receipt.product_id)
+    )
+    return {product_id: (daily, weekly, total) for product_id, daily, weekly, total in sess.execute(stmt)}
+
+
+def get_overlay(sess, catalog: Catalog, planet_id: PlanetID, agent_addr: str) -> Dict[int, Tuple[bool, int]]:
+    """
+    Get buyability and purchase count of all catalog products for the agent.
+    Purchase counts of all limited products are taken in one query.
+
+    :return: Dict of product ID and (buyable, purchase_count)
+    """
+    iap_garage = {x.fungible_id: x.amount for x in get_iap_garage(sess, catalog.fungible_id_set)}
+    product_list = list(catalog.iter_products())
+    count_dict = get_purchase_count_dict(
+        sess, [x.id for x in product_list if x.daily_limit or x.weekly_limit or x.account_limit],
+        planet_id=planet_id, agent_addr=agent_addr
+    )
+
+    overlay = {}
+    for product in product_list:
+        # Check fungible item stock in garage
+        if any(iap_garage.get(fungible_id, 0) < amount for fungible_id, amount in product.item_list):
+            overlay[product.id] = (False, 0)
+            continue
+
+        # Check purchase history
+        daily, weekly, total = count_dict.get(product.id, (0, 0, 0))
+        if product.daily_limit:
+            overlay[product.id] = (daily < product.daily_limit, daily)
+        elif product.weekly_limit:
+            overlay[product.id] = (weekly < product.weekly_limit, weekly)
+        elif product.account_limit:
+            overlay[product.id] = (total < product.account_limit, total)
+        else:
+            overlay[product.id] = (True, 0)
+    return overlay
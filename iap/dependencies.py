@@ -1,14 +1,19 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.orm import sessionmaker
 
+from common.utils.database import create_db_engine
 from iap import settings
 
-engine = create_engine(settings.DB_URI, echo=settings.DB_ECHO)
+# Seconds between connection usage metrics
+POOL_METRIC_INTERVAL = 60
+
+engine = create_db_engine(settings.DB_URI, name="iap", echo=settings.DB_ECHO)
+SessionLocal = sessionmaker(engine)
 
 
 def session():
-    sess = scoped_session(sessionmaker(engine))
+    sess = SessionLocal()
     try:
         yield sess
     finally:
         sess.close()
+        engine.pool_metrics.emit(interval=POOL_METRIC_INTERVAL)
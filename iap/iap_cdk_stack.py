@@ -44,7 +44,7 @@ class APIStack(Stack):
         )
         role.add_to_policy(
             _iam.PolicyStatement(
-                actions=["ssm:GetParameter"],
+                actions=["ssm:GetParameter", "ssm:GetParameters"],
                 resources=[
                     shared_stack.google_credential_arn,
                     shared_stack.apple_credential_arn,
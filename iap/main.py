@@ -1,17 +1,17 @@
 import os.path
 
-import uvicorn
 from fastapi import FastAPI, HTTPException
 from fastapi.exceptions import RequestValidationError
 from mangum import Mangum
 from pydantic.v1.error_wrappers import _display_error_type_and_ctx
 from starlette.requests import Request
 from starlette.responses import FileResponse, JSONResponse
-from starlette.staticfiles import StaticFiles
 from starlette.status import HTTP_400_BAD_REQUEST, HTTP_500_INTERNAL_SERVER_ERROR
 
 from common import logger
 from iap.exceptions import ReceiptNotFoundException
+from iap.middleware import AccessLogMiddleware, access_log_options
+from iap.response import CachedStaticFiles, conditional_file_response
 from . import api, settings
 
 __VERSION__ = "0.1.0"
@@ -26,10 +26,7 @@ app = FastAPI(
 )
 
 
-@app.middleware("http")
-def log_incoming_url(request: Request, call_next):
-    logger.info(f"[{request.method}] {request.url}")
-    return call_next(request)
+app.add_middleware(AccessLogMiddleware, **access_log_options())
 
 
 # Error handler
@@ -111,17 +108,20 @@ Available page list:
 - box
 """
 )
-def view_page(page: str = "index"):
+def view_page(request: Request, page: str = "index"):
     # NOTICE: Set html name matches to path.
     if os.path.isfile(f"iap/frontend/build/{page}.html"):
-        return f"iap/frontend/build/{page}.html"
+        # Page refers hashed assets of current build, so it must be revalidated
+        return conditional_file_response(f"iap/frontend/build/{page}.html", request.scope)
     raise HTTPException(status_code=404, detail=f"Page Not Found: /{page}")
 
 
 app.include_router(api.router)
-app.mount("/_app", StaticFiles(directory="iap/frontend/build/_app"), name="static")
+app.mount("/_app", CachedStaticFiles(directory="iap/frontend/build/_app"), name="static")
 
 handler = Mangum(app)
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run("main:app", reload=settings.DEBUG)
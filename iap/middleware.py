@@ -0,0 +1,89 @@
+import json
+import os
+import random
+import time
+import uuid
+from typing import Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from common import logger
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+
+class AccessLogMiddleware:
+    """
+    ASGI middleware to write one JSON access log line per request.
+
+    Each line has request ID, method, route template (e.g., `/api/purchase/status`), path, status,
+    duration in milliseconds and response size, so latency of each endpoint can be aggregated from logs.
+    Request ID is taken from `X-Request-ID` header or Lambda request ID, and returned as `X-Request-ID` header.
+
+    Only `sample_rate` of successful requests are logged. Failed requests (status >= 500) and requests slower than
+    `slow_threshold` seconds are always logged.
+    """
+
+    def __init__(self, app: ASGIApp, *, sample_rate: float = 1.0, slow_threshold: Optional[float] = None):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+
+    @staticmethod
+    def _request_id(scope: Scope) -> str:
+        for key, value in scope.get("headers", []):
+            if key == REQUEST_ID_HEADER:
+                return value.decode("latin-1")
+        context = scope.get("aws.context")
+        if context is not None and getattr(context, "aws_request_id", None):
+            return context.aws_request_id
+        return uuid.uuid4().hex
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        request_id = self._request_id(scope)
+        status = 500
+        size = 0
+
+        async def send_with_log(message: Message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (REQUEST_ID_HEADER, request_id.encode("latin-1"))]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_log)
+        finally:
+            duration = time.perf_counter() - start
+            if (status >= 500 or (self.slow_threshold is not None and duration >= self.slow_threshold)
+                    or random.random() < self.sample_rate):
+                # Router sets matched route to scope while handling request
+                route = scope.get("route")
+                logger.info(json.dumps({
+                    "type": "access",
+                    "request_id": request_id,
+                    "method": scope["method"],
+                    "route": getattr(route, "path", None),
+                    "path": scope["path"],
+                    "status": status,
+                    "duration_ms": round(duration * 1000, 3),
+                    "size": size,
+                }))
+
+
+def access_log_options() -> dict:
+    """
+    Options of `AccessLogMiddleware` from `ACCESS_LOG_SAMPLE_RATE` and `ACCESS_LOG_SLOW_THRESHOLD` (seconds).
+    """
+    slow_threshold = os.environ.get("ACCESS_LOG_SLOW_THRESHOLD")
+    return {
+        "sample_rate": float(os.environ.get("ACCESS_LOG_SAMPLE_RATE", 1)),
+        "slow_threshold": float(slow_threshold) if slow_threshold else None,
+    }
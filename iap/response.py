@@ -0,0 +1,162 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Hashable, Mapping, Optional
+
+from pydantic import TypeAdapter
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+# Clients must check ETag before reusing response
+CACHE_REVALIDATE = "public, no-cache"
+# Files with content hash in its name are never changed
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+# Bytes read at once to hash static file
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+class RawJSONResponse(Response):
+    """
+    Response of already serialized JSON bytes.
+
+    FastAPI validates and encodes returned value again with `response_model`, which costs more than the handler itself
+    for large nested schemas. Returning this response skips both, so `response_model` is only used for API docs.
+    """
+    media_type = "application/json"
+
+
+@lru_cache(maxsize=None)
+def get_type_adapter(type_: Any) -> TypeAdapter:
+    # Building adapter compiles its validator and serializer, so build once per type
+    return TypeAdapter(type_)
+
+
+def dump_json(type_: Any, content: Any, *, from_attributes: bool = False) -> bytes:
+    """
+    Serialize content as `type_` to JSON bytes with pydantic-core serializer.
+
+    :param type_: Type of content. e.g., `List[CategorySchema]`
+    :param content: Already validated schemas, or ORM objects if `from_attributes` is `True`.
+    :param from_attributes: Validate content from attributes (ORM objects) once before serialization.
+    :return: JSON bytes, same as `response_model` would return.
+    """
+    adapter = get_type_adapter(type_)
+    if from_attributes:
+        content = adapter.validate_python(content, from_attributes=True)
+    return adapter.dump_json(content)
+
+
+class SerializedCache:
+    """
+    In-process LRU cache of serialized values (e.g., response payloads).
+
+    Key must contain version of source data so updated data gets new key instead of invalidating old one.
+    Entries are also dropped after `expires_at` (epoch seconds) given on `set`, for data changes by time.
+    """
+
+    def __init__(self, max_size: int = 16):
+        self.max_size = max_size
+        self._value_dict: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key not in self._value_dict:
+                return None
+            value, expires_at = self._value_dict[key]
+            if expires_at is not None and expires_at <= time.time():
+                del self._value_dict[key]
+                return None
+            self._value_dict.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, *, expires_at: Optional[float] = None):
+        with self._lock:
+            self._value_dict[key] = (value, expires_at)
+            self._value_dict.move_to_end(key)
+            while len(self._value_dict) > self.max_size:
+                self._value_dict.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._value_dict.clear()
+
+
+def content_etag(content: bytes) -> str:
+    return f'"{hashlib.sha1(content).hexdigest()}"'
+
+
+@lru_cache(maxsize=1024)
+def file_etag(path: str, mtime: float, size: int) -> str:
+    # File is read once for each modification. `mtime` and `size` are only used as cache key.
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        while chunk := f.read(FILE_CHUNK_SIZE):
+            digest.update(chunk)
+    return f'"{digest.hexdigest()}"'
+
+
+def is_not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check `If-None-Match` request header against ETag of current response.
+    Weak comparison is used as RFC 9110 requires for `If-None-Match`.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    etag = etag.removeprefix("W/")
+    return any(x.strip().removeprefix("W/") == etag for x in if_none_match.split(","))
+
+
+def not_modified_response(headers: Mapping[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
+
+
+def etag_response(request: Request, content: bytes, *, cache_control: str, etag: Optional[str] = None) -> Response:
+    """
+    JSON response with ETag, or empty 304 response if client already has the same content.
+
+    :param content: Serialized JSON bytes
+    :param cache_control: Value of `Cache-Control` header
+    :param etag: ETag of content. Hash of content is used if not given.
+    """
+    headers = {"ETag": etag or content_etag(content), "Cache-Control": cache_control}
+    if is_not_modified(request.headers.get("if-none-match"), headers["ETag"]):
+        return not_modified_response(headers)
+    return RawJSONResponse(content, headers=headers)
+
+
+def conditional_file_response(path: str, scope: Scope, *, cache_control: str = CACHE_REVALIDATE,
+                              stat_result: Optional[os.stat_result] = None, status_code: int = 200) -> Response:
+    """
+    File response with content hash ETag, or empty 304 response if client already has the same file.
+    """
+    stat_result = stat_result or os.stat(path)
+    headers = {"ETag": file_etag(path, stat_result.st_mtime, stat_result.st_size), "Cache-Control": cache_control}
+    if status_code == 200 and is_not_modified(Headers(scope=scope).get("if-none-match"), headers["ETag"]):
+        return not_modified_response(headers)
+    # Given ETag is kept. `FileResponse` only sets its own ETag from mtime when not set.
+    return FileResponse(path, status_code=status_code, headers=headers, stat_result=stat_result,
+                        method=scope["method"])
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    `StaticFiles` with content hash ETag and `Cache-Control`.
+
+    SvelteKit puts files with content hash in its name under `immutable` directory,
+    so those are cached forever and others must be revalidated with ETag.
+    """
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        full_path = str(full_path)
+        immutable = f"{os.sep}immutable{os.sep}" in full_path
+        return conditional_file_response(full_path, scope, stat_result=stat_result, status_code=status_code,
+                                         cache_control=CACHE_IMMUTABLE if immutable else CACHE_REVALIDATE)
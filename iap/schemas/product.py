@@ -52,6 +52,7 @@ class FungibleItemSchema(BaseSchema):
 
 
 class ProductSchema(SimpleProductSchema):
+    id: int
     purchase_count: int = 0
     rarity: ProductRarity
     size: ProductAssetUISize
@@ -87,3 +88,8 @@ class CategorySchema(BaseSchema):
 
     class Config:
         from_attributes = True
+
+
+class ProductOverlaySchema(BaseSchema):
+    buyable: bool = True
+    purchase_count: int = 0
@@ -3,13 +3,11 @@ import os
 
 from starlette.config import Config
 
-from common.utils.aws import fetch_secrets, fetch_parameter
+from common.utils.aws import fetch_secrets, get_parameter_cache
 
 stage = os.environ.get("STAGE", "local")
 db_password = None
-google_credential = None
-apple_credential = None
-season_pass_jwt_secret = None
+parameter_cache = None
 
 if not stage:
     logging.error("Config file not found")
@@ -21,22 +19,10 @@ if os.path.exists(os.path.join("iap", "settings", f"{stage}.py")):
     config = Config(environ=envs)
 else:
     config = Config(environ=os.environ)
-    db_password = fetch_secrets(os.environ.get("REGION_NAME"), os.environ.get("SECRET_ARN"))["password"]
-    google_credential = fetch_parameter(
-        os.environ.get("REGION_NAME"),
-        f"{stage}_9c_IAP_GOOGLE_CREDENTIAL",
-        True
-    )["Value"]
-    apple_credential = fetch_parameter(
-        os.environ.get("REGION_NAME"),
-        f"{stage}_9c_IAP_APPLE_CREDENTIAL",
-        True
-    )["Value"]
-    season_pass_jwt_secret = fetch_parameter(
-        os.environ.get("REGION_NAME"),
-        f"{stage}_9c_IAP_SEASON_PASS_JWT_SECRET",
-        True
-    )["Value"]
+    if os.environ.get("SECRET_ARN"):
+        db_password = fetch_secrets(os.environ.get("REGION_NAME"), os.environ.get("SECRET_ARN"))["password"]
+    # Credentials are not needed at cold start. These are fetched in one batch at first use. See `__getattr__`.
+    parameter_cache = get_parameter_cache(os.environ.get("REGION_NAME"))
 
 # Prepare settings
 DEBUG = config("DEBUG", cast=bool, default=False)
@@ -47,14 +33,28 @@ if db_password is not None:
 DB_ECHO = config("DB_ECHO", cast=bool, default=False)
 
 GOOGLE_PACKAGE_NAME = config("GOOGLE_PACKAGE_NAME")
-GOOGLE_CREDENTIAL = google_credential or config("GOOGLE_CREDENTIAL")
 
 APPLE_BUNDLE_ID = config("APPLE_BUNDLE_ID")
 APPLE_ISSUER_ID = config("APPLE_ISSUER_ID")
 APPLE_KEY_ID = config("APPLE_KEY_ID")
-APPLE_CREDENTIAL = apple_credential or config("APPLE_CREDENTIAL")
 APPLE_VALIDATION_URL = config("APPLE_VALIDATION_URL")
 
 REGION_NAME = config("REGION_NAME")
 
-SEASON_PASS_JWT_SECRET = season_pass_jwt_secret or config("SEASON_PASS_JWT_SECRET")
+# Settings fetched from SSM at first use: {setting name: parameter name}
+LAZY_PARAMETER_DICT = {
+    "GOOGLE_CREDENTIAL": f"{stage}_9c_IAP_GOOGLE_CREDENTIAL",
+    "APPLE_CREDENTIAL": f"{stage}_9c_IAP_APPLE_CREDENTIAL",
+    "SEASON_PASS_JWT_SECRET": f"{stage}_9c_IAP_SEASON_PASS_JWT_SECRET",
+}
+if parameter_cache is None:
+    GOOGLE_CREDENTIAL = config("GOOGLE_CREDENTIAL")
+    APPLE_CREDENTIAL = config("APPLE_CREDENTIAL")
+    SEASON_PASS_JWT_SECRET = config("SEASON_PASS_JWT_SECRET")
+
+
+def __getattr__(name: str):
+    if parameter_cache is not None and name in LAZY_PARAMETER_DICT:
+        parameter_cache.preload(LAZY_PARAMETER_DICT.values(), secure=True)
+        return parameter_cache.get(LAZY_PARAMETER_DICT[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
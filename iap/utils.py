@@ -1,6 +1,5 @@
 import datetime
 
-import jwt
 from sqlalchemy import func, Date, cast
 
 from common import logger
@@ -8,8 +7,10 @@ from common.enums import ReceiptStatus
 from common.models.receipt import Receipt
 from iap import settings
 from common.utils.receipt import PlanetID
+from common.utils.trace import timed
 
 
+@timed("db.purchase_count")
 def get_purchase_count(sess, product_id: int, *, planet_id: PlanetID, agent_addr: str = None, avatar_addr: str = None,
                        hour_limit: int = 0) -> int:
     """
@@ -48,6 +49,8 @@ def get_purchase_count(sess, product_id: int, *, planet_id: PlanetID, agent_addr
 
 
 def create_season_pass_jwt() -> str:
+    import jwt
+
     now = datetime.datetime.now(tz=datetime.timezone.utc)
     return jwt.encode({
         "iat": now,
@@ -0,0 +1,180 @@
+"""
+Backfill garage action history over large block range.
+
+Unsynced ranges between `start` and `end` are split into chunks and processed by process pool.
+Each worker process has its own explorer HTTP session and DB connection, loads garage actions using `COPY`,
+and commits the chunk as synced range in the same transaction. Synced ranges are merged on commit,
+so interrupted backfill can be resumed by running the same command again.
+Actions already synced by forward sync are skipped.
+
+Usage: python -m script.backfill_garage_history [DB URI] [Explorer URL] [start] [end] --workers 8
+"""
+import argparse
+import concurrent.futures
+import csv
+import io
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from common.utils.history import check_block_range, commit_sync_range, find_sync_gaps, sync_block
+from common.utils.receipt import PlanetID
+
+# Explorer returns at most this number of blocks in one query.
+FETCH_SIZE = 100
+COPY_COLUMNS = ("planet_id", "block_index", "block_hash", "tx_hash", "action_index", "action_type", "signer",
+                "created_at", "updated_at")
+
+_engine = None
+_http: Optional[requests.Session] = None
+_explorer_url: str = ""
+
+
+def init_worker(db_uri: str, explorer_url: str):
+    global _engine, _http, _explorer_url
+    _engine = create_engine(db_uri, pool_size=1, max_overflow=0)
+    _http = requests.Session()
+    _explorer_url = explorer_url
+
+
+def fetch_blocks(start: int, limit: int) -> List[Dict]:
+    query = f"""
+    query {{ blockQuery {{ blocks(desc: false offset: {start} limit: {limit}) {{
+    hash index transactions {{ id signer actions {{ json }} }}
+    }} }} }}
+    """
+    resp = _http.post(_explorer_url, json={"query": query}, timeout=60)
+    resp.raise_for_status()
+    data = resp.json()
+    if "errors" in data:
+        raise Exception(f"Block query from {start} failed with error : {data['errors']}")
+    return data["data"]["blockQuery"]["blocks"]
+
+
+def copy_actions(sess: Session, action_list: List[Dict]):
+    """
+    Bulk load garage actions into `garage_action_history` using `COPY` in current transaction of session.
+    Actions are copied into temporary table first, and actions already in `garage_action_history` are skipped.
+    """
+    now = datetime.now(tz=timezone.utc).isoformat()
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for action in action_list:
+        writer.writerow([
+            f"\\x{action['planet_id'].hex()}", action["block_index"], action["block_hash"], action["tx_hash"],
+            action["action_index"], action["action_type"].name, action["signer"], now, now,
+        ])
+    buf.seek(0)
+
+    dbapi_conn = sess.connection().connection.dbapi_connection
+    columns = ", ".join(COPY_COLUMNS)
+    with dbapi_conn.cursor() as cursor:
+        cursor.execute(f"CREATE TEMP TABLE garage_action_copy ON COMMIT DROP AS "
+                       f"SELECT {columns} FROM garage_action_history WITH NO DATA")
+        cursor.copy_expert(f"COPY garage_action_copy ({columns}) FROM STDIN WITH (FORMAT csv)", buf)
+        cursor.execute(f"INSERT INTO garage_action_history ({columns}) SELECT {columns} FROM garage_action_copy "
+                       f"ON CONFLICT (planet_id, tx_hash, action_index) DO NOTHING")
+
+
+def backfill_chunk(planet_id: PlanetID, start: int, end: int) -> Tuple[int, int, int]:
+    """
+    Sync blocks between `start` and `end` (both inclusive) and commit as one synced range.
+
+    :return: (start, synced block count, garage action count)
+    """
+    block_list = []
+    for offset in range(start, end + 1, FETCH_SIZE):
+        block_list.extend(fetch_blocks(offset, min(FETCH_SIZE, end - offset + 1)))
+    if not block_list:
+        return start, 0, 0
+    # Raise to fail this chunk when explorer misses any block, so the range is left as gap and retried
+    block_list = check_block_range(block_list, start, end)
+
+    action_list = []
+    for block in block_list:
+        action_list.extend(sync_block(block, planet_id))
+
+    sess = Session(_engine)
+    try:
+        if action_list:
+            copy_actions(sess, action_list)
+        commit_sync_range(sess, planet_id,
+                          block_list[0]["index"], block_list[0]["hash"],
+                          block_list[-1]["index"], block_list[-1]["hash"])
+        sess.commit()
+    except Exception:
+        sess.rollback()
+        raise
+    finally:
+        sess.close()
+    return start, len(block_list), len(action_list)
+
+
+def split_chunks(gap_list: List[Tuple[int, int]], chunk_size: int) -> List[Tuple[int, int]]:
+    return [(s, min(s + chunk_size - 1, gap_end))
+            for gap_start, gap_end in gap_list
+            for s in range(gap_start, gap_end + 1, chunk_size)]
+
+
+def backfill(db_uri: str, explorer_url: str, planet_id: PlanetID, start: int, end: int,
+             workers: int = 4, chunk_size: int = 1000) -> Dict[str, float]:
+    engine = create_engine(db_uri)
+    with Session(engine) as sess:
+        gap_list = find_sync_gaps(sess, planet_id, start, end)
+    engine.dispose()
+
+    chunk_list = split_chunks(gap_list, chunk_size)
+    print(f"{sum(e - s + 1 for s, e in gap_list)} blocks in {len(gap_list)} gaps to backfill "
+          f"with {len(chunk_list)} chunks of {chunk_size} blocks.")
+
+    block_count, action_count, failed = 0, 0, []
+    begin = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                                initargs=(db_uri, explorer_url)) as executor:
+        futures = {executor.submit(backfill_chunk, planet_id, s, e): (s, e) for s, e in chunk_list}
+        for i, future in enumerate(concurrent.futures.as_completed(futures)):
+            s, e = futures[future]
+            try:
+                _, blocks, actions = future.result()
+            except Exception as ex:
+                failed.append((s, e))
+                print(f"{i + 1} / {len(chunk_list)} : {s} ~ {e} failed: {ex}")
+                continue
+            block_count += blocks
+            action_count += actions
+            elapsed = time.perf_counter() - begin
+            print(f"{i + 1} / {len(chunk_list)} : {s} ~ {e} synced. "
+                  f"{block_count / elapsed:.1f} blocks/s, {action_count / elapsed:.1f} actions/s")
+
+    elapsed = time.perf_counter() - begin
+    report = {
+        "blocks": block_count,
+        "actions": action_count,
+        "failed_chunks": len(failed),
+        "elapsed": elapsed,
+        "blocks_per_sec": block_count / elapsed if elapsed else 0,
+        "actions_per_sec": action_count / elapsed if elapsed else 0,
+    }
+    print(f"{block_count} blocks, {action_count} actions backfilled in {elapsed:.1f}s :: "
+          f"{report['blocks_per_sec']:.1f} blocks/s, {report['actions_per_sec']:.1f} actions/s")
+    if failed:
+        print(f"{len(failed)} chunks failed. Run again to retry: {failed}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill garage action history")
+    parser.add_argument("db_uri")
+    parser.add_argument("explorer_url", help="Explorer GQL endpoint. e.g., https://[HOST]/graphql/explorer")
+    parser.add_argument("start", type=int)
+    parser.add_argument("end", type=int)
+    parser.add_argument("--planet-id", default=PlanetID.ODIN.value.decode("utf-8"))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+    backfill(args.db_uri, args.explorer_url, PlanetID(bytes(args.planet_id, "utf-8")), args.start, args.end,
+             workers=args.workers, chunk_size=args.chunk_size)
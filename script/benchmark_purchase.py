@@ -0,0 +1,352 @@
+"""
+End-to-end purchase throughput benchmark.
+
+Seeds catalog and receipt history into DB, then runs following stages in order and reports
+count, errors, throughput and p50/p95/p99 latency of each stage:
+
+- `product`: `GET /product` of agents in seeded history
+- `purchase_request`: `POST /purchase/request` with Google receipts of new agents
+- `worker_handle`: worker `handle` with messages received from queue
+- `tracker_track_tx`: tracker `track_tx` until all benchmark Tx. are confirmed
+- `purchase_status`: `GET /purchase/status` of all benchmark receipts
+
+Stores, headless, SQS, SSM, Secrets Manager and KMS are served by simulator (`python -m simulator`).
+IAP server runs separately against the same DB and simulator. Worker and tracker are imported in this process,
+so their environment variables (`DB_URI`, `SECRET_ARN`, `REGION_NAME`, `HEADLESS`, `STAGE`, `AWS_ENDPOINT_URL`)
+must be set to the same DB and simulator.
+
+Result is saved as JSON with commit hash, so runs can be diffed across commits with `compare`.
+
+Usage:
+    python -m script.benchmark_purchase run [DB URI] --iap-url http://localhost:8000 --sim-url http://localhost:9000 \
+        --queue-url [SQS URL] --receipts 1000000 --requests 1000 --concurrency 32
+    python -m script.benchmark_purchase compare base.json head.json
+"""
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import requests
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from common._crypto import get_account
+from common.enums import ProductAssetUISize, ReceiptStatus, Store, TxStatus
+from common.models.garage import GarageItemStatus
+from common.models.product import Category, FungibleItemProduct, Product
+from common.models.receipt import Receipt
+from common.utils.receipt import PlanetID
+
+CATEGORY_NAME = "Benchmark"
+SEED_CHUNK_SIZE = 10_000
+PERCENTILE_LIST = (50, 95, 99)
+
+_local = threading.local()
+
+
+@dataclass
+class StageResult:
+    name: str
+    latency_list: List[float] = field(default_factory=list)
+    error: int = 0
+    elapsed: float = 0
+
+    def summary(self) -> dict:
+        latency_list = sorted(self.latency_list)
+        result = {
+            "count": len(latency_list),
+            "error": self.error,
+            "elapsed": round(self.elapsed, 4),
+            "throughput": round(len(latency_list) / self.elapsed, 2) if self.elapsed else 0,
+        }
+        for p in PERCENTILE_LIST:
+            result[f"p{p}"] = round(percentile(latency_list, p) * 1000, 2)
+        result["max"] = round(latency_list[-1] * 1000, 2) if latency_list else 0
+        return result
+
+
+def percentile(sorted_list: List[float], p: float) -> float:
+    """
+    Nearest-rank percentile of sorted list. Returns 0 for empty list.
+    """
+    if not sorted_list:
+        return 0
+    return sorted_list[min(len(sorted_list) - 1, max(0, math.ceil(p / 100 * len(sorted_list)) - 1))]
+
+
+def _http() -> requests.Session:
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def drive(name: str, fn: Callable, arg_list: Iterable, concurrency: int) -> StageResult:
+    """
+    Call `fn` with each argument in `arg_list` using `concurrency` threads and measure latency of each call.
+    Call is counted as error when `fn` raises or returns falsy value.
+    """
+    result = StageResult(name)
+    lock = threading.Lock()
+
+    def _call(arg):
+        start = time.perf_counter()
+        try:
+            ok = fn(arg)
+        except Exception as e:
+            print(f"[{name}] {e}")
+            ok = False
+        latency = time.perf_counter() - start
+        with lock:
+            result.latency_list.append(latency)
+            if not ok:
+                result.error += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(_call, arg_list))
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def _random_addr(rng: random.Random) -> str:
+    return f"0x{rng.getrandbits(160):040x}"
+
+
+def seed(sess: Session, rng: random.Random, *, product_count: int, receipt_count: int, agent_count: int,
+         planet_id: PlanetID) -> Tuple[List[Product], List[str]]:
+    """
+    Create benchmark catalog if not exists and insert `receipt_count` receipts of `agent_count` agents.
+
+    :return: Benchmark product list and agent address list of seeded receipts.
+    """
+    category = sess.scalar(select(Category).where(Category.name == CATEGORY_NAME))
+    if category is None:
+        category = Category(name=CATEGORY_NAME, order=0, active=True, l10n_key="CATEGORY_Benchmark")
+        for i in range(product_count):
+            product = Product(
+                name=f"Benchmark {i}", order=i, google_sku=f"benchmark_sku_{i}", apple_sku=f"benchmark.sku.{i}",
+                daily_limit=rng.choice((None, 3, 5)), weekly_limit=rng.choice((None, 10)), active=True,
+                size=ProductAssetUISize.ONE_BY_ONE, path=f"benchmark/{i}.png", l10n_key=f"PRODUCT_Benchmark_{i}",
+            )
+            product.fungible_item_list.append(FungibleItemProduct(
+                sheet_item_id=600000 + i, name=f"Benchmark Item {i}", fungible_item_id=f"{rng.getrandbits(256):064x}",
+                amount=rng.randint(1, 10),
+            ))
+            category.product_list.append(product)
+        sess.add(category)
+        sess.flush()
+
+        iap_addr = get_account(os.environ.get("STAGE", "development"),
+                               os.environ.get("REGION_NAME", "us-east-2")).address
+        sess.add_all([
+            GarageItemStatus(address=iap_addr, item_id=item.sheet_item_id, fungible_id=item.fungible_item_id,
+                             amount=10 ** 9)
+            for product in category.product_list for item in product.fungible_item_list
+        ])
+        sess.commit()
+
+    product_list = list(category.product_list)
+    agent_list = [_random_addr(rng) for _ in range(agent_count)]
+    now = datetime.now(tz=timezone.utc)
+    inserted = 0
+    while inserted < receipt_count:
+        chunk = []
+        for _ in range(min(SEED_CHUNK_SIZE, receipt_count - inserted)):
+            product = rng.choice(product_list)
+            agent_addr = rng.choice(agent_list)
+            chunk.append({
+                "store": Store.GOOGLE, "order_id": f"benchmark-seed-{uuid.uuid4()}", "uuid": uuid.uuid4(),
+                "data": {}, "status": ReceiptStatus.VALID,
+                "purchased_at": now - timedelta(seconds=rng.randint(0, 60 * 60 * 24 * 30)),
+                "product_id": product.id, "agent_addr": agent_addr, "avatar_addr": agent_addr,
+                "tx_id": f"{rng.getrandbits(256):064x}", "tx_status": TxStatus.SUCCESS, "planet_id": planet_id.value,
+            })
+        sess.execute(insert(Receipt), chunk)
+        sess.commit()
+        inserted += len(chunk)
+        print(f"Seeded {inserted}/{receipt_count} receipts")
+    return product_list, agent_list
+
+
+def google_receipt(product: Product, rng: random.Random, planet_id: PlanetID) -> dict:
+    addr = _random_addr(rng)
+    order = {
+        "orderId": f"GPA.benchmark-{uuid.uuid4()}", "productId": product.google_sku,
+        "purchaseTime": int(time.time() * 1000), "purchaseToken": f"benchmark-{uuid.uuid4().hex}",
+    }
+    return {
+        "store": Store.GOOGLE.value, "agentAddress": addr, "avatarAddress": addr,
+        "planetId": planet_id.value.decode(), "data": json.dumps({"Payload": json.dumps({"json": json.dumps(order)})}),
+    }
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    planet_id = PlanetID(bytes(args.planet_id, "utf-8"))
+    engine = create_engine(args.db_uri)
+    stage_list: List[StageResult] = []
+
+    with Session(engine) as sess:
+        start = time.perf_counter()
+        product_list, agent_list = seed(sess, rng, product_count=args.products, receipt_count=args.receipts,
+                                        agent_count=args.agents, planet_id=planet_id)
+        print(f"Seed finished in {time.perf_counter() - start:.2f}s")
+
+    # /product
+    def get_product(agent_addr: str) -> bool:
+        resp = _http().get(f"{args.iap_url}/product",
+                           params={"agent_addr": agent_addr, "planet_id": args.planet_id}, timeout=30)
+        return resp.status_code == 200
+
+    stage_list.append(drive("product", get_product, [rng.choice(agent_list) for _ in range(args.product_requests)],
+                            args.concurrency))
+
+    # /purchase/request
+    uuid_list = []
+
+    def request_purchase(body: dict) -> bool:
+        resp = _http().post(f"{args.iap_url}/purchase/request", json=body, timeout=30)
+        if resp.status_code != 200:
+            return False
+        uuid_list.append(resp.json()["uuid"])
+        return True
+
+    stage_list.append(drive(
+        "purchase_request", request_purchase,
+        [google_receipt(rng.choice(product_list), rng, planet_id) for _ in range(args.requests)], args.concurrency
+    ))
+
+    # Worker
+    from worker.worker.handler import handle
+    from worker.worker.tracker import track_tx
+
+    def receive() -> List[dict]:
+        resp = requests.post(f"{args.sim_url}/_sim/sqs/receive",
+                             json={"QueueUrl": args.queue_url, "max": args.batch_size}, timeout=30)
+        resp.raise_for_status()
+        return [{**x, "attributes": {}, "messageAttributes": {}, "md5OfBody": "", "eventSource": "aws:sqs",
+                 "eventSourceARN": "", "awsRegion": os.environ.get("REGION_NAME", "")} for x in resp.json()]
+
+    def handle_batch(record_list: List[dict]) -> bool:
+        handle({"Records": record_list}, None)
+        return True
+
+    batch_list = []
+    while record_list := receive():
+        batch_list.append(record_list)
+    # Worker handles queue sequentially like SQS-triggered lambda with reserved concurrency 1 (shared nonce)
+    stage_list.append(drive("worker_handle", handle_batch, batch_list, 1))
+
+    # Tracker
+    def staged_count() -> int:
+        with Session(engine) as sess:
+            return len(sess.scalars(select(Receipt.id).where(
+                Receipt.uuid.in_(uuid_list), Receipt.tx_status.in_((TxStatus.STAGED, TxStatus.INVALID))
+            )).fetchall())
+
+    def track(_) -> bool:
+        track_tx(None, None)
+        return True
+
+    tracker = StageResult("tracker_track_tx")
+    start = time.perf_counter()
+    for _ in range(args.track_rounds):
+        round_result = drive(tracker.name, track, [None], 1)
+        tracker.latency_list.extend(round_result.latency_list)
+        tracker.error += round_result.error
+        if not staged_count():
+            break
+        time.sleep(args.track_interval)
+    tracker.elapsed = time.perf_counter() - start
+    tracker.error += staged_count()
+    stage_list.append(tracker)
+
+    # /purchase/status
+    def get_status(chunk: List[str]) -> bool:
+        resp = _http().get(f"{args.iap_url}/purchase/status", params={"uuid": chunk}, timeout=30)
+        return resp.status_code == 200
+
+    stage_list.append(drive(
+        "purchase_status", get_status,
+        [uuid_list[i:i + args.status_batch] for i in range(0, len(uuid_list), args.status_batch)], args.concurrency
+    ))
+
+    commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+    result = {
+        "commit": commit,
+        "created_at": datetime.now(tz=timezone.utc).isoformat(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("db_uri", "func")},
+        "stages": {x.name: x.summary() for x in stage_list},
+    }
+    output = args.output or f"benchmark-{commit[:8] or 'unknown'}.json"
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print_result(result)
+    print(f"Result saved to {output}")
+
+
+def print_result(result: dict, base: Optional[dict] = None):
+    metric_list = ("count", "error", "throughput", *(f"p{p}" for p in PERCENTILE_LIST))
+    print(f"{'stage':<20}" + "".join(f"{x:>22}" for x in metric_list))
+    for name, summary in result["stages"].items():
+        line = f"{name:<20}"
+        for metric in metric_list:
+            value = summary.get(metric, 0)
+            base_value = (base or {}).get("stages", {}).get(name, {}).get(metric)
+            if base_value:
+                line += f"{value:>12} ({(value - base_value) / base_value:+7.1%})"
+            else:
+                line += f"{value:>22}"
+        print(line)
+
+
+def compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+    print(f"{base['commit'][:8]} -> {head['commit'][:8]}")
+    print_result(head, base)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end purchase throughput benchmark")
+    subparsers = parser.add_subparsers(required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run benchmark and save result as JSON")
+    run_parser.add_argument("db_uri")
+    run_parser.add_argument("--iap-url", default="http://localhost:8000")
+    run_parser.add_argument("--sim-url", default="http://localhost:9000")
+    run_parser.add_argument("--queue-url", default=os.environ.get("SQS_URL"))
+    run_parser.add_argument("--planet-id", default=PlanetID.ODIN_INTERNAL.value.decode())
+    run_parser.add_argument("--products", type=int, default=50, help="Product count of benchmark catalog")
+    run_parser.add_argument("--receipts", type=int, default=100_000, help="Receipt count to seed")
+    run_parser.add_argument("--agents", type=int, default=10_000, help="Agent count of seeded receipts")
+    run_parser.add_argument("--product-requests", type=int, default=1000)
+    run_parser.add_argument("--requests", type=int, default=1000, help="Purchase request count")
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--batch-size", type=int, default=10, help="SQS batch size of worker")
+    run_parser.add_argument("--status-batch", type=int, default=20, help="UUID count in one status request")
+    run_parser.add_argument("--track-rounds", type=int, default=30)
+    run_parser.add_argument("--track-interval", type=float, default=2)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output", default=None)
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two benchmark results")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,74 @@
+"""
+Export receipts with product SKU, price and status for finance reconciliation.
+
+Receipts are read by server-side cursor and written as they are read, so memory usage is constant
+regardless of date range.
+
+Usage:
+    python -m script.export_receipt [DB URI] --start 2023-11-01 --end 2023-12-01 --status VALID \
+        --format csv --output receipt_202311.csv
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from common.enums import ReceiptStatus, Store
+from common.utils.receipt import PlanetID
+from common.utils.receipt_export import EXPORT_CHUNK_SIZE, EXPORT_WRITER_DICT, ExportFormat, iter_receipts
+
+
+def export(db_uri: str, output: str, *, export_format: ExportFormat, chunk_size: int = EXPORT_CHUNK_SIZE,
+           **kwargs) -> int:
+    """
+    :param output: Path of output file. `-` for stdout.
+    :param kwargs: Arguments of `iter_receipts`
+    :return: Number of exported receipts
+    """
+    writer, _ = EXPORT_WRITER_DICT[export_format]
+    engine = create_engine(db_uri)
+    count = 0
+
+    def counted(rows):
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    with Session(engine) as sess:
+        f = sys.stdout if output == "-" else open(output, "w", newline="")
+        try:
+            for text in writer(counted(iter_receipts(sess, chunk_size=chunk_size, **kwargs)), chunk_size):
+                f.write(text)
+        finally:
+            if f is not sys.stdout:
+                f.close()
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export receipts as CSV or NDJSON")
+    parser.add_argument("db_uri")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="Receipts purchased at or after this time")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="Receipts purchased before this time")
+    parser.add_argument("--status", choices=[x.name for x in ReceiptStatus])
+    parser.add_argument("--store", choices=[x.name for x in Store])
+    parser.add_argument("--planet", choices=[x.name for x in PlanetID])
+    parser.add_argument("--currency", default="USD", help="Currency of product price")
+    parser.add_argument("--format", choices=[x.value for x in ExportFormat], default=ExportFormat.CSV.value)
+    parser.add_argument("--output", default="-", help="Output file path. Default is stdout.")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    started_at = time.time()
+    exported = export(
+        args.db_uri, args.output, export_format=ExportFormat(args.format), chunk_size=args.chunk_size,
+        currency=args.currency, start=args.start, end=args.end,
+        status=ReceiptStatus[args.status] if args.status else None,
+        store=Store[args.store] if args.store else None,
+        planet_id=PlanetID[args.planet] if args.planet else None,
+    )
+    print(f"Exported {exported} receipts in {time.time() - started_at:.1f}s", file=sys.stderr)
@@ -0,0 +1,307 @@
+"""
+Generate synthetic catalog and receipts for load testing of purchase limit check and admin queries.
+
+Catalog (categories, products with daily/weekly/account limits, items, FAVs and prices) and receipts
+across every `ReceiptStatus`/`TxStatus` and planets are bulk loaded using `COPY`.
+Receipts are generated in chunks by process pool. Each chunk has its own random generator seeded by
+`seed` and chunk index, so same arguments always generate same data regardless of worker count.
+
+Agent distribution is skewed by `skew`: agent index is `int(agents * random() ** skew)`.
+`skew` 1 means uniform and larger value concentrates receipts on fewer agents.
+
+Usage:
+    python -m script.generate_data [DB URI] --products 5000 --receipts 20000000 --agents 1000000 --workers 8 \
+        --planet ODIN=0.6 --planet HEIMDALL=0.4 --receipt-status VALID=0.9 --seed 42
+"""
+import argparse
+import concurrent.futures
+import csv
+import hashlib
+import io
+import itertools
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Table, create_engine, func, select, text
+from sqlalchemy.orm import Session
+
+from common.enums import Currency, ProductAssetUISize, ProductRarity, ReceiptStatus, Store, TxStatus
+from common.models.product import Category, FungibleAssetProduct, FungibleItemProduct, Price, Product, \
+    category_product_table
+from common.models.receipt import Receipt
+from common.utils.receipt import PlanetID
+
+DEFAULT_PLANET_WEIGHT = {PlanetID.ODIN: 0.6, PlanetID.HEIMDALL: 0.3, PlanetID.IDUN: 0.1}
+DEFAULT_RECEIPT_STATUS_WEIGHT = {
+    ReceiptStatus.VALID: 0.85, ReceiptStatus.INVALID: 0.04, ReceiptStatus.PURCHASE_LIMIT_EXCEED: 0.03,
+    ReceiptStatus.REFUNDED_BY_BUYER: 0.02, ReceiptStatus.REFUNDED_BY_ADMIN: 0.01, ReceiptStatus.TIME_LIMIT: 0.01,
+    ReceiptStatus.INIT: 0.01, ReceiptStatus.VALIDATION_REQUEST: 0.01, ReceiptStatus.UNKNOWN: 0.02,
+}
+# Only VALID receipts have Tx.
+DEFAULT_TX_STATUS_WEIGHT = {
+    TxStatus.SUCCESS: 0.95, TxStatus.STAGED: 0.02, TxStatus.FAILURE: 0.01, TxStatus.INVALID: 0.005,
+    TxStatus.NOT_FOUND: 0.005, TxStatus.CREATED: 0.005, TxStatus.FAIL_TO_CREATE: 0.003, TxStatus.UNKNOWN: 0.002,
+}
+STORE_WEIGHT = {Store.GOOGLE: 0.6, Store.APPLE: 0.35, Store.GOOGLE_TEST: 0.03, Store.APPLE_TEST: 0.02}
+RECEIPT_COLUMNS = ("store", "order_id", "uuid", "data", "status", "purchased_at", "product_id", "agent_addr",
+                   "avatar_addr", "tx_id", "tx_status", "planet_id", "msg", "created_at", "updated_at")
+
+_engine = None
+
+
+def init_worker(db_uri: str):
+    global _engine
+    _engine = create_engine(db_uri, pool_size=1, max_overflow=0)
+
+
+def to_csv_value(value):
+    """
+    Format python value as `COPY ... WITH (FORMAT csv)` field. `None` is written as empty field, which is NULL.
+    Enums are stored by name as SQLAlchemy does.
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, bytes):
+        return f"\\x{value.hex()}"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value)
+
+
+def copy_rows(sess: Session, table: Table, column_list: Sequence[str], row_list: Iterable[Sequence]):
+    """
+    Bulk load rows into `table` using `COPY` in current transaction of session.
+    """
+    unknown = set(column_list) - set(table.c.keys())
+    if unknown:
+        raise ValueError(f"{unknown} are not columns of {table.name}")
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in row_list:
+        writer.writerow([to_csv_value(x) for x in row])
+    buf.seek(0)
+
+    # Quote column names since some of them are reserved words (e.g., `order`)
+    columns = ", ".join('"' + x + '"' for x in column_list)
+    dbapi_conn = sess.connection().connection.dbapi_connection
+    with dbapi_conn.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table.name} ({columns}) FROM STDIN WITH (FORMAT csv)", buf)
+
+
+def _next_id(sess: Session, table: Table) -> int:
+    return (sess.scalar(select(func.max(table.c.id))) or 0) + 1
+
+
+def _set_sequence(sess: Session, table: Table):
+    sess.execute(text(f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                      f"(SELECT coalesce(max(id), 1) FROM {table.name}))"))
+
+
+def agent_address(seed: int, index: int) -> str:
+    return f"0x{hashlib.sha256(f'{seed}:agent:{index}'.encode()).hexdigest()[:40]}"
+
+
+def generate_catalog(sess: Session, rng: random.Random, *, category_count: int, product_count: int
+                     ) -> List[Tuple[int, str]]:
+    """
+    Bulk load categories and products with items, FAVs and prices.
+
+    Product limits are distributed as 40% daily, 20% weekly, 20% account limit and 20% unlimited.
+    Every 50th product is season pass, which is checked by account limit of avatar.
+
+    :return: List of (product ID, product name).
+    """
+    now = datetime.now(tz=timezone.utc)
+    category_id = _next_id(sess, Category.__table__)
+    product_id = _next_id(sess, Product.__table__)
+    category_row_list = [
+        (category_id + i, f"Synthetic Category {i}", i, True, f"CATEGORY_Synthetic_{i}", now, now)
+        for i in range(category_count)
+    ]
+    product_row_list, item_row_list, fav_row_list, price_row_list, category_product_row_list = [], [], [], [], []
+    product_list = []
+    for i in range(product_count):
+        pid = product_id + i
+        name = f"Synthetic SeasonPass {i}" if i % 50 == 0 else f"Synthetic Product {i}"
+        daily_limit = weekly_limit = account_limit = None
+        limit_type = rng.random()
+        if "SeasonPass" in name:
+            account_limit = 1
+        elif limit_type < 0.4:
+            daily_limit = rng.choice((1, 3, 5, 10))
+        elif limit_type < 0.6:
+            weekly_limit = rng.choice((3, 5, 10, 20))
+        elif limit_type < 0.8:
+            account_limit = rng.choice((1, 2, 5))
+        google_sku = f"synthetic_seasonpass{i % 10}" if "SeasonPass" in name else f"synthetic_sku_{i}"
+        product_row_list.append((
+            pid, name, i, google_sku, f"synthetic.sku.{i}", daily_limit, weekly_limit, account_limit, True, 0,
+            rng.choice(list(ProductRarity)), rng.choice(list(ProductAssetUISize)), f"synthetic/{i}.png",
+            f"PRODUCT_Synthetic_{i}", now, now,
+        ))
+        category_product_row_list.append((category_id + rng.randrange(category_count), pid))
+        for j in range(rng.randint(1, 3)):
+            item_row_list.append((pid, 500000 + rng.randrange(10000), f"Synthetic Item {i}-{j}",
+                                  hashlib.sha256(f"{i}:{j}".encode()).hexdigest(), rng.randint(1, 100), now, now))
+        for ticker in rng.sample([x for x in Currency if x != Currency.GARAGE], rng.randint(0, 2)):
+            fav_row_list.append((pid, ticker.name, 18 if ticker == Currency.CRYSTAL else 2, rng.randint(1, 10000),
+                                 now, now))
+        for store in (Store.GOOGLE, Store.APPLE):
+            price = rng.choice((0.99, 4.99, 9.99, 19.99, 49.99, 99.99))
+            price_row_list.append((pid, store, "USD", price, 0, price, True, now, now))
+        product_list.append((pid, name))
+
+    copy_rows(sess, Category.__table__,
+              ("id", "name", "order", "active", "l10n_key", "created_at", "updated_at"), category_row_list)
+    copy_rows(sess, Product.__table__,
+              ("id", "name", "order", "google_sku", "apple_sku", "daily_limit", "weekly_limit", "account_limit",
+               "active", "discount", "rarity", "size", "path", "l10n_key", "created_at", "updated_at"),
+              product_row_list)
+    copy_rows(sess, category_product_table, ("category_id", "product_id"), category_product_row_list)
+    copy_rows(sess, FungibleItemProduct.__table__,
+              ("product_id", "sheet_item_id", "name", "fungible_item_id", "amount", "created_at", "updated_at"),
+              item_row_list)
+    copy_rows(sess, FungibleAssetProduct.__table__,
+              ("product_id", "ticker", "decimal_places", "amount", "created_at", "updated_at"), fav_row_list)
+    copy_rows(sess, Price.__table__,
+              ("product_id", "store", "currency", "price", "discount", "regular_price", "active", "created_at",
+               "updated_at"), price_row_list)
+    for table in (Category.__table__, Product.__table__):
+        _set_sequence(sess, table)
+    return product_list
+
+
+def _weighted(rng: random.Random, weight: Dict) -> Enum:
+    return rng.choices(list(weight.keys()), weights=list(weight.values()))[0]
+
+
+def generate_receipts(seed: int, chunk_index: int, count: int, *, product_list: List[Tuple[int, str]],
+                      agent_count: int, skew: float, days: int, planet_weight: Dict[PlanetID, float],
+                      receipt_status_weight: Dict[ReceiptStatus, float]) -> List[tuple]:
+    """
+    Generate receipt rows of one chunk in order of `RECEIPT_COLUMNS`.
+    Result only depends on arguments and the day of generation (timestamps are relative to today),
+    not on worker or generation order.
+    """
+    rng = random.Random(f"{seed}:receipt:{chunk_index}")
+    now = datetime.now(tz=timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    # Popular products are picked more: weight of n-th product is 1 / (n + 1)
+    product_cum_weight = list(itertools.accumulate(1 / (i + 1) for i in range(len(product_list))))
+    row_list = []
+    for i in range(count):
+        agent_index = min(agent_count - 1, int(agent_count * rng.random() ** skew))
+        agent_addr = agent_address(seed, agent_index)
+        avatar_addr = agent_address(seed, agent_index * 3 + rng.randrange(3) + agent_count)
+        product_id, _ = rng.choices(product_list, cum_weights=product_cum_weight)[0]
+        status = _weighted(rng, receipt_status_weight)
+        tx_status, tx_id = None, None
+        if status == ReceiptStatus.VALID:
+            tx_status = _weighted(rng, DEFAULT_TX_STATUS_WEIGHT)
+            if tx_status != TxStatus.CREATED:
+                tx_id = f"{rng.getrandbits(256):064x}"
+        purchased_at = now - timedelta(seconds=rng.randrange(days * 24 * 60 * 60))
+        row_list.append((
+            _weighted(rng, STORE_WEIGHT), f"synthetic-{seed}-{chunk_index}-{i}",
+            uuid.UUID(int=rng.getrandbits(128), version=4), {"synthetic": True}, status, purchased_at,
+            None if status == ReceiptStatus.UNKNOWN else product_id, agent_addr, avatar_addr, tx_id, tx_status,
+            _weighted(rng, planet_weight).value,
+            "Synthetic error" if status in (ReceiptStatus.INVALID, ReceiptStatus.UNKNOWN) else None,
+            purchased_at, purchased_at + timedelta(seconds=rng.randint(1, 60)),
+        ))
+    return row_list
+
+
+def load_receipt_chunk(seed: int, chunk_index: int, count: int, kwargs: dict) -> int:
+    row_list = generate_receipts(seed, chunk_index, count, **kwargs)
+    sess = Session(_engine)
+    try:
+        copy_rows(sess, Receipt.__table__, RECEIPT_COLUMNS, row_list)
+        sess.commit()
+    except Exception:
+        sess.rollback()
+        raise
+    finally:
+        sess.close()
+    return len(row_list)
+
+
+def parse_weight(value_list: Optional[List[str]], enum_cls, default: Dict) -> Dict:
+    """
+    Parse `NAME=WEIGHT` list to weight dict of `enum_cls`. Returns `default` if nothing is given.
+    """
+    if not value_list:
+        return default
+    return {enum_cls[name]: float(weight) for name, weight in (x.split("=", 1) for x in value_list)}
+
+
+def generate(db_uri: str, *, seed: int, category_count: int, product_count: int, receipt_count: int,
+             agent_count: int, skew: float, days: int, planet_weight: Dict[PlanetID, float],
+             receipt_status_weight: Dict[ReceiptStatus, float], workers: int, chunk_size: int):
+    engine = create_engine(db_uri)
+    begin = time.perf_counter()
+    with Session(engine) as sess:
+        product_list = generate_catalog(sess, random.Random(f"{seed}:catalog"),
+                                        category_count=category_count, product_count=product_count)
+        sess.commit()
+    engine.dispose()
+    print(f"{category_count} categories and {product_count} products loaded in {time.perf_counter() - begin:.2f}s")
+
+    kwargs = {"product_list": product_list, "agent_count": agent_count, "skew": skew, "days": days,
+              "planet_weight": planet_weight, "receipt_status_weight": receipt_status_weight}
+    chunk_list = [(i, min(chunk_size, receipt_count - offset))
+                  for i, offset in enumerate(range(0, receipt_count, chunk_size))]
+    loaded, failed = 0, []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                                initargs=(db_uri,)) as executor:
+        futures = {executor.submit(load_receipt_chunk, seed, i, count, kwargs): i for i, count in chunk_list}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                loaded += future.result()
+            except Exception as e:
+                failed.append(futures[future])
+                print(f"Chunk {futures[future]} failed: {e}")
+                continue
+            elapsed = time.perf_counter() - begin
+            print(f"{loaded} / {receipt_count} receipts loaded ({loaded / elapsed:,.0f} rows/s)")
+
+    print(f"{loaded} receipts loaded in {time.perf_counter() - begin:.2f}s")
+    if failed:
+        print(f"Failed chunks: {sorted(failed)}. Use new seed or clean up before run again.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load synthetic catalog and receipts")
+    parser.add_argument("db_uri")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--receipts", type=int, default=1_000_000)
+    parser.add_argument("--agents", type=int, default=100_000)
+    parser.add_argument("--skew", type=float, default=3, help="1 for uniform. Larger value makes more skewed.")
+    parser.add_argument("--days", type=int, default=90, help="Receipts are spread over last N days")
+    parser.add_argument("--planet", action="append", help="Planet weight: NAME=WEIGHT. Can be repeated.")
+    parser.add_argument("--receipt-status", action="append",
+                        help="Receipt status weight: NAME=WEIGHT. Can be repeated.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    generate(
+        args.db_uri, seed=args.seed, category_count=args.categories, product_count=args.products,
+        receipt_count=args.receipts, agent_count=args.agents, skew=args.skew, days=args.days,
+        planet_weight=parse_weight(args.planet, PlanetID, DEFAULT_PLANET_WEIGHT),
+        receipt_status_weight=parse_weight(args.receipt_status, ReceiptStatus, DEFAULT_RECEIPT_STATUS_WEIGHT),
+        workers=args.workers, chunk_size=args.chunk_size,
+    )
@@ -0,0 +1,13 @@
+"""
+Offline stand-in services for local load tests.
+
+Simulator serves subset of headless GQL, Google Play `purchases.products`, App Store Server API,
+SeasonPass upgrade API and AWS SQS/SSM/KMS/Secrets Manager in one host, with configurable latency and error.
+Run `python -m simulator --help` and point IAP/worker to it:
+
+- `HEADLESS=http://localhost:9000`
+- `GOOGLE_API_ENDPOINT=http://localhost:9000/`
+- `APPLE_VALIDATION_URL=http://localhost:9000/inApps/v1/transactions/{transactionId}`
+- `AWS_ENDPOINT_URL=http://localhost:9000` with any `AWS_ACCESS_KEY_ID`/`AWS_SECRET_ACCESS_KEY`
+"""
+from simulator.app import create_app
@@ -0,0 +1,58 @@
+"""
+Usage: python -m simulator --port 9000 --stage local --latency 0.01 --fault google=0.2:0.1:0.01
+"""
+import argparse
+import json
+
+import uvicorn
+
+from simulator.app import create_app
+from simulator.aws import AWSSimulator
+from simulator.fault import Fault, FaultInjector, parse_fault_list
+from simulator.headless import HeadlessSimulator
+from simulator.store import StoreSimulator
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stand-in services for NineChronicles.IAP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--stage", default="local", help="Stage name used in SSM parameter names")
+    parser.add_argument("--latency", type=float, default=0, help="Default latency of all services in seconds")
+    parser.add_argument("--jitter", type=float, default=0, help="Default random latency of all services in seconds")
+    parser.add_argument("--error-rate", type=float, default=0, help="Default error rate of all services")
+    parser.add_argument("--fault", action="append",
+                        help="Fault of one service: service=latency[:jitter[:error_rate]]. Can be repeated.")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--confirm-delay", type=float, default=2, help="Seconds until staged Tx. is confirmed")
+    parser.add_argument("--block-interval", type=float, default=8)
+    parser.add_argument("--tx-failure-rate", type=float, default=0)
+    parser.add_argument("--garage-count", type=int, default=1_000_000)
+    parser.add_argument("--apple-product-id", default=None,
+                        help="Product ID of unregistered App Store transactions")
+    parser.add_argument("--parameter", action="append", help="SSM parameter: NAME=VALUE. Can be repeated.")
+    parser.add_argument("--secret", action="append", help="Secrets Manager secret: ARN=JSON. Can be repeated.")
+    args = parser.parse_args()
+
+    base_url = f"http://{args.host}:{args.port}"
+    parameter_dict = {
+        f"{args.stage}_9c_IAP_KMS_KEY_ID": "simulator",
+        f"{args.stage}_9c_SEASON_PASS_HOST": base_url,
+    }
+    parameter_dict.update(x.split("=", 1) for x in args.parameter or [])
+    secret_dict = {k: json.loads(v) for k, v in (x.split("=", 1) for x in args.secret or [])}
+
+    app = create_app(
+        fault=FaultInjector(Fault(args.latency, args.jitter, args.error_rate), parse_fault_list(args.fault),
+                            seed=args.seed),
+        headless=HeadlessSimulator(confirm_delay=args.confirm_delay, block_interval=args.block_interval,
+                                   tx_failure_rate=args.tx_failure_rate, garage_count=args.garage_count,
+                                   seed=args.seed),
+        store=StoreSimulator(default_apple_product_id=args.apple_product_id),
+        aws=AWSSimulator(parameter_dict, secret_dict),
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import json
+from dataclasses import asdict
+from typing import Optional
+from urllib.parse import parse_qs
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+from simulator.aws import AWSError, AWSSimulator
+from simulator.fault import Fault, FaultInjector
+from simulator.headless import HeadlessSimulator
+from simulator.store import StoreSimulator
+
+SQS_QUERY_RESPONSE = """<?xml version="1.0"?>
+<SendMessageResponse xmlns="http://queue.amazonaws.com/doc/2012-11-05/">
+  <SendMessageResult><MessageId>{message_id}</MessageId><MD5OfMessageBody>{md5}</MD5OfMessageBody></SendMessageResult>
+  <ResponseMetadata><RequestId>{message_id}</RequestId></ResponseMetadata>
+</SendMessageResponse>"""
+
+
+def _service_of(request: Request, aws: AWSSimulator) -> Optional[str]:
+    path = request.url.path
+    if path.startswith("/_sim"):
+        return None
+    if path.startswith("/graphql"):
+        return "headless"
+    if path.startswith("/androidpublisher"):
+        return "google"
+    if path.startswith("/inApps"):
+        return "apple"
+    if path.startswith("/api/user"):
+        return "season_pass"
+    return aws.service_of(request.headers.get("x-amz-target", ""))
+
+
+def _error_response(service: str) -> Response:
+    if service in ("sqs", "ssm", "kms", "secretsmanager"):
+        return JSONResponse({"__type": "InternalFailure", "message": "Injected error"}, status_code=500)
+    if service == "google":
+        return JSONResponse({"error": {"code": 503, "message": "Injected error", "status": "UNAVAILABLE"}},
+                            status_code=503)
+    return JSONResponse({"errors": [{"message": "Injected error"}]}, status_code=503)
+
+
+def create_app(*, fault: Optional[FaultInjector] = None, headless: Optional[HeadlessSimulator] = None,
+               store: Optional[StoreSimulator] = None, aws: Optional[AWSSimulator] = None) -> FastAPI:
+    """
+    Create simulator app serving all stand-in services in one host.
+
+    - `POST /graphql`: headless GQL
+    - `/androidpublisher/v3/...`: Google Play `purchases.products`
+    - `GET /inApps/v1/transactions/{transactionId}`: App Store transaction info
+    - `POST /api/user/upgrade`: SeasonPass upgrade
+    - `POST /`: AWS SQS/SSM/KMS/Secrets Manager by `X-Amz-Target` header
+    - `/_sim/...`: Simulator control and stats
+    """
+    fault = fault or FaultInjector()
+    headless = headless or HeadlessSimulator()
+    store = store or StoreSimulator()
+    aws = aws or AWSSimulator()
+    app = FastAPI(title="NineChronicles.IAP Simulator", docs_url="/_sim/docs", openapi_url="/_sim/openapi.json")
+    app.state.fault, app.state.headless, app.state.store, app.state.aws = fault, headless, store, aws
+
+    @app.middleware("http")
+    async def inject_fault(request: Request, call_next):
+        service = _service_of(request, aws)
+        if service is not None and await fault.inject(service):
+            return _error_response(service)
+        return await call_next(request)
+
+    # Headless
+    @app.post("/graphql")
+    async def graphql_endpoint(request: Request):
+        body = await request.json()
+        return await headless.execute(body["query"], body.get("variables"), body.get("operationName"))
+
+    # Google Play
+    @app.get("/androidpublisher/v3/applications/{package_name}/purchases/products/{product_id}/tokens/{token}")
+    async def google_purchase(package_name: str, product_id: str, token: str):
+        return store.google_purchase(package_name, product_id, token)
+
+    @app.post("/androidpublisher/v3/applications/{package_name}/purchases/products/{product_id}/tokens/{token}:consume")
+    async def google_consume(package_name: str, product_id: str, token: str):
+        store.consume_google(token)
+        return {}
+
+    # App Store
+    @app.get("/inApps/v1/transactions/{transaction_id}")
+    async def apple_transaction(transaction_id: str):
+        resp = store.apple_transaction(transaction_id)
+        if resp is None:
+            return JSONResponse({"errorCode": 4040010, "errorMessage": "Transaction id not found."}, status_code=404)
+        return resp
+
+    # SeasonPass
+    @app.post("/api/user/upgrade")
+    async def season_pass_upgrade():
+        store.season_pass_request_count += 1
+        return {}
+
+    # AWS
+    @app.post("/")
+    async def aws_endpoint(request: Request):
+        target = request.headers.get("x-amz-target")
+        if target is None:
+            # SQS query protocol of old botocore
+            form = {k: v[0] for k, v in parse_qs((await request.body()).decode()).items()}
+            if form.get("Action") != "SendMessage":
+                return Response(status_code=400, content=f"{form.get('Action')} is not simulated")
+            result = aws.handle("AmazonSQS.SendMessage", form)
+            return Response(SQS_QUERY_RESPONSE.format(message_id=result["MessageId"],
+                                                      md5=result["MD5OfMessageBody"]),
+                            media_type="text/xml")
+        try:
+            result = aws.handle(target, json.loads(await request.body() or b"{}"))
+        except AWSError as e:
+            return JSONResponse({"__type": e.code, "message": e.message}, status_code=e.status_code,
+                                media_type="application/x-amz-json-1.1")
+        return JSONResponse(result, media_type="application/x-amz-json-1.1")
+
+    # Simulator control
+    @app.get("/_sim/stats")
+    async def stats():
+        return {"fault": fault.stats(), "headless": headless.stats(), "aws": aws.stats(),
+                "season_pass": store.season_pass_request_count}
+
+    @app.put("/_sim/fault/{service}")
+    async def set_fault(service: str, data: dict):
+        fault.set(service, Fault(**data))
+        return asdict(fault.get(service))
+
+    @app.post("/_sim/apple/transactions/{transaction_id}")
+    async def register_apple_transaction(transaction_id: str, data: dict):
+        store.register_apple_transaction(transaction_id, data["productId"])
+        return {}
+
+    @app.post("/_sim/sqs/receive")
+    async def receive_message(data: dict):
+        return [{"messageId": message_id, "receiptHandle": handle, "body": body}
+                for message_id, handle, body in aws.receive_message(data["QueueUrl"], data.get("max", 10))]
+
+    return app
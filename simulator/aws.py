@@ -0,0 +1,153 @@
+import base64
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric.utils import Prehashed
+
+
+class AWSError(Exception):
+    def __init__(self, code: str, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.status_code = status_code
+
+
+class AWSSimulator:
+    """
+    In-memory SQS, SSM Parameter Store, Secrets Manager and KMS for boto3 JSON protocol.
+
+    Point boto3 to simulator with `AWS_ENDPOINT_URL` env. variable (boto3>=1.28.57).
+    KMS key is secp256k1 key created at start, so `common._crypto.Account` works without real KMS.
+    """
+
+    def __init__(self, parameter_dict: Optional[Dict[str, str]] = None, secret_dict: Optional[Dict[str, dict]] = None):
+        self.parameter_dict: Dict[str, str] = parameter_dict or {}
+        self.secret_dict: Dict[str, dict] = secret_dict or {}
+        self.queue_dict: Dict[str, Deque[Tuple[str, str]]] = {}
+        self._inflight: Dict[str, Tuple[str, str, str]] = {}
+        self._lock = threading.Lock()
+        self._kms_key = ec.generate_private_key(ec.SECP256K1())
+        self.sent_count = 0
+
+    def handle(self, target: str, body: dict) -> dict:
+        """
+        Handle JSON protocol request.
+
+        :param target: Value of `X-Amz-Target` header. e.g., `AmazonSQS.SendMessage`
+        :param body: JSON request body
+        """
+        service, _, operation = target.partition(".")
+        fn = getattr(self, f"_{service}_{operation}", None)
+        if fn is None:
+            raise AWSError("UnknownOperationException", f"{target} is not simulated")
+        return fn(body)
+
+    def service_of(self, target: str) -> str:
+        return {
+            "AmazonSQS": "sqs", "AmazonSSM": "ssm", "TrentService": "kms", "secretsmanager": "secretsmanager",
+        }.get(target.partition(".")[0], "sqs")
+
+    # SQS
+    def _queue(self, queue_url: str) -> Deque[Tuple[str, str]]:
+        return self.queue_dict.setdefault(queue_url, deque())
+
+    def send_message(self, queue_url: str, body: str) -> str:
+        message_id = str(uuid.uuid4())
+        with self._lock:
+            self._queue(queue_url).append((message_id, body))
+            self.sent_count += 1
+        return message_id
+
+    def receive_message(self, queue_url: str, max_count: int = 10) -> List[Tuple[str, str, str]]:
+        """
+        :return: List of (message ID, receipt handle, body). Received messages are removed from queue.
+        """
+        result = []
+        with self._lock:
+            queue = self._queue(queue_url)
+            while queue and len(result) < max_count:
+                message_id, body = queue.popleft()
+                receipt_handle = uuid.uuid4().hex
+                self._inflight[receipt_handle] = (queue_url, message_id, body)
+                result.append((message_id, receipt_handle, body))
+        return result
+
+    def _AmazonSQS_SendMessage(self, body: dict) -> dict:
+        message = body["MessageBody"]
+        return {
+            "MessageId": self.send_message(body["QueueUrl"], message),
+            "MD5OfMessageBody": hashlib.md5(message.encode()).hexdigest(),
+        }
+
+    def _AmazonSQS_ReceiveMessage(self, body: dict) -> dict:
+        return {"Messages": [
+            {"MessageId": message_id, "ReceiptHandle": handle, "Body": message,
+             "MD5OfBody": hashlib.md5(message.encode()).hexdigest()}
+            for message_id, handle, message in self.receive_message(body["QueueUrl"],
+                                                                    body.get("MaxNumberOfMessages", 1))
+        ]}
+
+    def _AmazonSQS_DeleteMessage(self, body: dict) -> dict:
+        with self._lock:
+            self._inflight.pop(body["ReceiptHandle"], None)
+        return {}
+
+    def _AmazonSQS_GetQueueAttributes(self, body: dict) -> dict:
+        return {"Attributes": {"ApproximateNumberOfMessages": str(len(self._queue(body["QueueUrl"])))}}
+
+    # SSM
+    def _parameter(self, name: str) -> dict:
+        if name not in self.parameter_dict:
+            raise AWSError("ParameterNotFound", f"Parameter {name} not found")
+        return {"Name": name, "Type": "String", "Value": self.parameter_dict[name], "Version": 1,
+                "LastModifiedDate": time.time(), "ARN": f"arn:aws:ssm:sim:000000000000:parameter/{name}",
+                "DataType": "text"}
+
+    def _AmazonSSM_GetParameter(self, body: dict) -> dict:
+        return {"Parameter": self._parameter(body["Name"])}
+
+    def _AmazonSSM_GetParameters(self, body: dict) -> dict:
+        name_list = body["Names"]
+        return {
+            "Parameters": [self._parameter(x) for x in name_list if x in self.parameter_dict],
+            "InvalidParameters": [x for x in name_list if x not in self.parameter_dict],
+        }
+
+    # Secrets Manager
+    def _secretsmanager_GetSecretValue(self, body: dict) -> dict:
+        secret_id = body["SecretId"]
+        if secret_id not in self.secret_dict:
+            raise AWSError("ResourceNotFoundException", f"Secret {secret_id} not found")
+        return {"ARN": secret_id, "Name": secret_id, "SecretString": json.dumps(self.secret_dict[secret_id]),
+                "VersionId": "1", "CreatedDate": time.time()}
+
+    # KMS
+    def _TrentService_GetPublicKey(self, body: dict) -> dict:
+        der = self._kms_key.public_key().public_bytes(
+            serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        return {"KeyId": body["KeyId"], "PublicKey": base64.b64encode(der).decode(),
+                "KeySpec": "ECC_SECG_P256K1", "KeyUsage": "SIGN_VERIFY", "SigningAlgorithms": ["ECDSA_SHA_256"]}
+
+    def _TrentService_Sign(self, body: dict) -> dict:
+        message = base64.b64decode(body["Message"])
+        if body.get("MessageType", "RAW") == "DIGEST":
+            signature = self._kms_key.sign(message, ec.ECDSA(Prehashed(hashes.SHA256())))
+        else:
+            signature = self._kms_key.sign(message, ec.ECDSA(hashes.SHA256()))
+        return {"KeyId": body["KeyId"], "Signature": base64.b64encode(signature).decode(),
+                "SigningAlgorithm": body["SigningAlgorithm"]}
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent_count,
+            "queue": {url: len(queue) for url, queue in self.queue_dict.items()},
+        }
@@ -0,0 +1,84 @@
+import asyncio
+import random
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional
+
+SERVICE_LIST = ("headless", "google", "apple", "season_pass", "sqs", "ssm", "kms", "secretsmanager")
+
+
+@dataclass
+class Fault:
+    """
+    Fault injected to a simulated service.
+
+    :param latency: Base latency of every response in seconds
+    :param jitter: Random latency added on top of `latency`, uniformly distributed in [0, jitter)
+    :param error_rate: Ratio of requests responded with server error. 0 ~ 1
+    """
+    latency: float = 0
+    jitter: float = 0
+    error_rate: float = 0
+
+
+class FaultInjector:
+    """
+    Per-service latency and error injection. Faults can be changed while simulator is running.
+    """
+
+    def __init__(self, default: Optional[Fault] = None, fault_dict: Optional[Dict[str, Fault]] = None,
+                 seed: Optional[int] = None):
+        self.default = default or Fault()
+        self.fault_dict: Dict[str, Fault] = fault_dict or {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._request_count = defaultdict(int)
+        self._error_count = defaultdict(int)
+
+    def get(self, service: str) -> Fault:
+        return self.fault_dict.get(service, self.default)
+
+    def set(self, service: str, fault: Fault):
+        if service not in SERVICE_LIST:
+            raise ValueError(f"Unknown service {service}. Use one of {SERVICE_LIST}")
+        self.fault_dict[service] = fault
+
+    async def inject(self, service: str) -> bool:
+        """
+        Wait injected latency of service.
+
+        :return: `True` if this request should fail.
+        """
+        fault = self.get(service)
+        with self._lock:
+            delay = fault.latency + (self._random.uniform(0, fault.jitter) if fault.jitter else 0)
+            failed = self._random.random() < fault.error_rate
+            self._request_count[service] += 1
+            if failed:
+                self._error_count[service] += 1
+        if delay:
+            await asyncio.sleep(delay)
+        return failed
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            service: {
+                **asdict(self.get(service)),
+                "request": self._request_count[service],
+                "error": self._error_count[service],
+            }
+            for service in SERVICE_LIST
+        }
+
+
+def parse_fault_list(value_list: Optional[list]) -> Dict[str, Fault]:
+    """
+    Parse `service=latency[:jitter[:error_rate]]` strings. e.g., `google=0.2:0.1:0.01`
+    """
+    fault_dict = {}
+    for value in value_list or []:
+        service, _, spec = value.partition("=")
+        numbers = [float(x) for x in spec.split(":")] if spec else []
+        fault_dict[service] = Fault(*numbers)
+    return fault_dict
@@ -0,0 +1,262 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from eth_keys import keys
+from graphql import build_schema, graphql
+from pyasn1.codec.der.decoder import decode as der_decode
+
+from common._crypto import ECDSASignatureRecord
+
+# Subset of headless GQL schema used by IAP service and worker
+SCHEMA_SDL = """
+schema {
+  query: StandaloneQuery
+  mutation: StandaloneMutation
+}
+
+scalar Address
+scalar DateTimeOffset
+scalar Decimal
+scalar Long
+scalar TxId
+
+enum TxStatus {
+  INVALID
+  STAGING
+  SUCCESS
+  FAILURE
+  INCLUDED
+}
+
+input FungibleAssetValueInputType {
+  currencyTicker: String!
+  value: Decimal!
+}
+
+input FungibleAssetValueWithAddressInputType {
+  balanceAddr: Address!
+  value: FungibleAssetValueInputType!
+}
+
+input FungibleIdAndCountInputType {
+  fungibleId: String!
+  count: Int!
+}
+
+type TxResultType {
+  txStatus: TxStatus!
+  blockIndex: Long
+  blockHash: String
+  exceptionNames: [String]
+}
+
+type TransactionHeadlessQuery {
+  nextTxNonce(address: Address!): Long!
+  signTransaction(unsignedTransaction: String!, signature: String!): String!
+  transactionResult(txId: TxId!): TxResultType!
+}
+
+type ActionTxQuery {
+  unloadFromMyGarages(
+    recipientAvatarAddr: Address,
+    fungibleAssetValues: [FungibleAssetValueWithAddressInputType!],
+    fungibleIdAndCounts: [FungibleIdAndCountInputType!],
+    memo: String
+  ): String!
+  transferAsset(sender: Address!, recipient: Address!, currency: String!, amount: String!, memo: String): String!
+}
+
+type FungibleItemGarageWithAddressType {
+  fungibleItemId: String
+  count: Int
+}
+
+type GaragesType {
+  agentAddr: Address
+  fungibleItemGarages: [FungibleItemGarageWithAddressType!]!
+}
+
+type StateQuery {
+  garages(agentAddr: Address!, fungibleItemIds: [String!]): GaragesType
+}
+
+type StandaloneQuery {
+  transaction: TransactionHeadlessQuery!
+  actionTxQuery(publicKey: String!, nonce: Long, timestamp: DateTimeOffset): ActionTxQuery!
+  stateQuery: StateQuery!
+}
+
+type StandaloneMutation {
+  stageTransaction(payload: String!): TxId!
+}
+"""
+
+
+@dataclass
+class SimulatedTx:
+    tx_id: str
+    signer: str
+    nonce: int
+    action: dict
+    staged_at: float
+    success: bool
+
+
+class HeadlessSimulator:
+    """
+    In-memory headless node.
+
+    Unsigned Tx. is JSON of action data, and signed Tx. is JSON of unsigned Tx. and signature.
+    Signature is verified against public key in unsigned Tx., so broken signer is found without real chain.
+    Staged Tx. becomes `SUCCESS` (or `FAILURE` by `tx_failure_rate`) after `confirm_delay` seconds.
+    """
+
+    def __init__(self, *, confirm_delay: float = 2, block_interval: float = 8, tx_failure_rate: float = 0,
+                 garage_count: int = 1_000_000, verify_signature: bool = True, seed: Optional[int] = None):
+        self.schema = build_schema(SCHEMA_SDL)
+        self.confirm_delay = confirm_delay
+        self.block_interval = block_interval
+        self.tx_failure_rate = tx_failure_rate
+        self.garage_count = garage_count
+        self.verify_signature = verify_signature
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+        self.nonce_dict: Dict[str, int] = {}
+        self.tx_dict: Dict[str, SimulatedTx] = {}
+
+    def block_index(self, at: Optional[float] = None) -> int:
+        return int(((at or time.time()) - self._started_at) / self.block_interval)
+
+    async def execute(self, query: str, variables: Optional[dict] = None,
+                      operation_name: Optional[str] = None) -> dict:
+        result = await graphql(self.schema, query, root_value=_Root(self), variable_values=variables,
+                               operation_name=operation_name)
+        return result.formatted
+
+    def next_nonce(self, address: str) -> int:
+        return self.nonce_dict.get(address.lower(), 0)
+
+    def sign(self, unsigned_tx: str, signature: str) -> str:
+        if self.verify_signature:
+            tx = json.loads(bytes.fromhex(unsigned_tx))
+            msg_hash = hashlib.sha256(bytes.fromhex(unsigned_tx)).digest()
+            record, _ = der_decode(bytes.fromhex(signature), asn1Spec=ECDSASignatureRecord())
+            r, s = int(record["r"]), int(record["s"])
+            public_key = keys.PublicKey(bytes.fromhex(tx["publicKey"])[1:])
+            if not any(keys.Signature(vrs=(v, r, s)).recover_public_key_from_msg_hash(msg_hash) == public_key
+                       for v in (0, 1)):
+                raise ValueError("Signature is not matched to public key of transaction")
+        return json.dumps({"unsigned": unsigned_tx, "signature": signature}).encode().hex()
+
+    def stage(self, payload: str) -> str:
+        signed = json.loads(bytes.fromhex(payload))
+        tx = json.loads(bytes.fromhex(signed["unsigned"]))
+        tx_id = hashlib.sha256(bytes.fromhex(payload)).hexdigest()
+        signer = keys.PublicKey(bytes.fromhex(tx["publicKey"])[1:]).to_checksum_address().lower()
+        with self._lock:
+            if tx_id not in self.tx_dict:
+                self.tx_dict[tx_id] = SimulatedTx(
+                    tx_id=tx_id, signer=signer, nonce=tx["nonce"], action=tx["action"], staged_at=time.time(),
+                    success=self._random.random() >= self.tx_failure_rate,
+                )
+                self.nonce_dict[signer] = max(self.nonce_dict.get(signer, 0), tx["nonce"] + 1)
+        return tx_id
+
+    def tx_result(self, tx_id: str) -> dict:
+        tx = self.tx_dict.get(tx_id)
+        if tx is None:
+            return {"txStatus": "INVALID", "blockIndex": None, "blockHash": None, "exceptionNames": None}
+        if time.time() - tx.staged_at < self.confirm_delay:
+            return {"txStatus": "STAGING", "blockIndex": None, "blockHash": None, "exceptionNames": None}
+        block_index = self.block_index(tx.staged_at + self.confirm_delay)
+        return {
+            "txStatus": "SUCCESS" if tx.success else "FAILURE",
+            "blockIndex": block_index,
+            "blockHash": hashlib.sha256(str(block_index).encode()).hexdigest(),
+            "exceptionNames": None if tx.success else ["SimulatedFailure"],
+        }
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            "tip": self.block_index(now),
+            "tx": len(self.tx_dict),
+            "staging": len([x for x in self.tx_dict.values() if now - x.staged_at < self.confirm_delay]),
+        }
+
+
+def _build_unsigned_tx(public_key: str, nonce: int, timestamp: Optional[str], action: dict) -> str:
+    return json.dumps(
+        {"publicKey": public_key, "nonce": nonce, "timestamp": timestamp, "action": action}, default=str
+    ).encode().hex()
+
+
+class _ActionTxQuery:
+    def __init__(self, public_key: str, nonce: int, timestamp: Optional[str]):
+        self.public_key = public_key
+        self.nonce = nonce
+        self.timestamp = timestamp
+
+    def unloadFromMyGarages(self, info, recipientAvatarAddr: Optional[str] = None,
+                            fungibleAssetValues: Optional[List[dict]] = None,
+                            fungibleIdAndCounts: Optional[List[dict]] = None, memo: Optional[str] = None) -> str:
+        return _build_unsigned_tx(self.public_key, self.nonce, self.timestamp, {
+            "type_id": "unload_from_my_garages", "recipientAvatarAddr": recipientAvatarAddr,
+            "fungibleAssetValues": fungibleAssetValues, "fungibleIdAndCounts": fungibleIdAndCounts, "memo": memo,
+        })
+
+    def transferAsset(self, info, sender: str, recipient: str, currency: str, amount: str,
+                      memo: Optional[str] = None) -> str:
+        return _build_unsigned_tx(self.public_key, self.nonce, self.timestamp, {
+            "type_id": "transfer_asset5", "sender": sender, "recipient": recipient, "currency": currency,
+            "amount": amount, "memo": memo,
+        })
+
+
+class _TransactionQuery:
+    def __init__(self, sim: HeadlessSimulator):
+        self.sim = sim
+
+    def nextTxNonce(self, info, address: str) -> int:
+        return self.sim.next_nonce(address)
+
+    def signTransaction(self, info, unsignedTransaction: str, signature: str) -> str:
+        return self.sim.sign(unsignedTransaction, signature)
+
+    def transactionResult(self, info, txId: str) -> dict:
+        return self.sim.tx_result(txId)
+
+
+class _StateQuery:
+    def __init__(self, sim: HeadlessSimulator):
+        self.sim = sim
+
+    def garages(self, info, agentAddr: str, fungibleItemIds: Optional[List[str]] = None) -> dict:
+        return {
+            "agentAddr": agentAddr,
+            "fungibleItemGarages": [{"fungibleItemId": x, "count": self.sim.garage_count}
+                                    for x in fungibleItemIds or []],
+        }
+
+
+class _Root:
+    def __init__(self, sim: HeadlessSimulator):
+        self.sim = sim
+        self.transaction = _TransactionQuery(sim)
+        self.stateQuery = _StateQuery(sim)
+
+    def actionTxQuery(self, info, publicKey: str, nonce: Optional[int] = None,
+                      timestamp: Optional[str] = None) -> _ActionTxQuery:
+        if nonce is None:
+            signer = keys.PublicKey(bytes.fromhex(publicKey)[1:]).to_checksum_address()
+            nonce = self.sim.next_nonce(signer)
+        return _ActionTxQuery(publicKey, nonce, timestamp)
+
+    def stageTransaction(self, info, payload: str) -> str:
+        return self.sim.stage(payload)
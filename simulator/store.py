@@ -0,0 +1,81 @@
+import time
+import uuid
+from typing import Dict, Optional
+
+import jwt
+
+from common.enums import GoogleAckState, GoogleConsumptionState, GooglePurchaseState
+
+# IAP service does not verify signature of transaction info
+APPLE_SIGN_KEY = "simulator-does-not-sign-transaction-info"
+
+
+class StoreSimulator:
+    """
+    In-memory Google Play `purchases.products` and App Store Server API.
+
+    Google purchase state follows purchase token prefix: `canceled-...` and `pending-...` tokens are not purchased.
+    Apple transaction returns product registered by `register_apple_transaction` or `default_apple_product_id`.
+    """
+
+    def __init__(self, *, default_apple_product_id: Optional[str] = None, apple_bundle_id: str = "com.example.sim"):
+        self.default_apple_product_id = default_apple_product_id
+        self.apple_bundle_id = apple_bundle_id
+        self.apple_transaction_dict: Dict[str, str] = {}
+        self.consumed_token_set = set()
+        self.season_pass_request_count = 0
+
+    def google_purchase(self, package_name: str, product_id: str, token: str) -> dict:
+        if token.startswith("canceled"):
+            state = GooglePurchaseState.CANCELED
+        elif token.startswith("pending"):
+            state = GooglePurchaseState.PENDING
+        else:
+            state = GooglePurchaseState.PURCHASED
+        consumed = token in self.consumed_token_set
+        return {
+            "kind": "androidpublisher#productPurchase",
+            "purchaseTimeMillis": str(int(time.time() * 1000)),
+            "purchaseState": state.value,
+            "consumptionState": (GoogleConsumptionState.CONSUMED if consumed
+                                 else GoogleConsumptionState.YET_BE_CONSUMED).value,
+            "developerPayload": "",
+            "orderId": f"GPA.{uuid.uuid5(uuid.NAMESPACE_OID, token)}",
+            "regionCode": "KR",
+            "quantity": 1,
+            "acknowledgementState": GoogleAckState.ACKNOWLEDGED.value,
+            "purchaseToken": token,
+            "productId": product_id,
+        }
+
+    def consume_google(self, token: str):
+        self.consumed_token_set.add(token)
+
+    def register_apple_transaction(self, transaction_id: str, product_id: str):
+        self.apple_transaction_dict[transaction_id] = product_id
+
+    def apple_transaction(self, transaction_id: str) -> Optional[dict]:
+        """
+        :return: Response of `Get Transaction Info` API. `None` if transaction is unknown.
+        """
+        product_id = self.apple_transaction_dict.get(transaction_id, self.default_apple_product_id)
+        if product_id is None:
+            return None
+        now = int(time.time() * 1000)
+        info = {
+            "transactionId": transaction_id,
+            "originalTransactionId": transaction_id,
+            "bundleId": self.apple_bundle_id,
+            "productId": product_id,
+            "purchaseDate": now,
+            "originalPurchaseDate": now,
+            "quantity": 1,
+            "type": "Consumable",
+            "inAppOwnershipType": "PURCHASED",
+            "signedDate": now,
+            "environment": "Sandbox",
+            "transactionReason": "PURCHASE",
+            "storefront": "KOR",
+            "storefrontId": "143466",
+        }
+        return {"signedTransactionInfo": jwt.encode(info, APPLE_SIGN_KEY, algorithm="HS256")}
@@ -0,0 +1,67 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from common import logger
+from iap.middleware import AccessLogMiddleware
+
+
+def _run(middleware, scope):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    try:
+        asyncio.run(middleware(scope, receive, send))
+    except RuntimeError:
+        pass
+    return sent
+
+
+def _scope(**kwargs):
+    return {"type": "http", "method": "GET", "path": "/api/purchase/status", "headers": [], **kwargs}
+
+
+def test_access_log(monkeypatch):
+    logged = []
+    monkeypatch.setattr(logger, "info", logged.append)
+
+    async def app(scope, receive, send):
+        scope["route"] = SimpleNamespace(path="/api/purchase/status")
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}", "more_body": True})
+        await send({"type": "http.response.body", "body": b"\n"})
+
+    sent = _run(AccessLogMiddleware(app), _scope(headers=[(b"x-request-id", b"req-1")]))
+    assert (b"x-request-id", b"req-1") in sent[0]["headers"]
+    log = json.loads(logged[0])
+    assert (log["request_id"], log["route"], log["status"], log["size"]) == ("req-1", "/api/purchase/status", 200, 3)
+
+    # Lambda request ID is used when header does not exist
+    _run(AccessLogMiddleware(app), _scope(**{"aws.context": SimpleNamespace(aws_request_id="lambda-1")}))
+    assert json.loads(logged[1])["request_id"] == "lambda-1"
+
+
+def test_sampling(monkeypatch):
+    logged = []
+    monkeypatch.setattr(logger, "info", logged.append)
+
+    async def ok(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def fail(scope, receive, send):
+        raise RuntimeError("Unexpected")
+
+    _run(AccessLogMiddleware(ok, sample_rate=0), _scope())
+    assert logged == []
+
+    _run(AccessLogMiddleware(fail, sample_rate=0), _scope())
+    assert json.loads(logged[0])["status"] == 500
+
+    _run(AccessLogMiddleware(ok, sample_rate=0, slow_threshold=0), _scope())
+    assert json.loads(logged[1])["status"] == 200
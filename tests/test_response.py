@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+from uuid import UUID, uuid4
+
+from common.enums import ProductAssetUISize, ProductRarity, ReceiptStatus, Store
+from common.utils.receipt import PlanetID
+import iap.catalog
+from iap.catalog import OVERLAY_FIELD_SET, Catalog, CatalogCategory, CatalogProduct, get_catalog, get_overlay
+from starlette.requests import Request
+
+import iap.response
+from iap.response import (
+    CachedStaticFiles, SerializedCache, dump_json, etag_response, file_etag, is_not_modified,
+)
+from iap.schemas.product import CategorySchema, ProductSchema
+from iap.schemas.receipt import ReceiptDetailSchema
+
+
+def _product(name: str, **kwargs) -> ProductSchema:
+    return ProductSchema(
+        id=1, name=name, order=1, google_sku=f"g_{name}", apple_sku=f"a_{name}", daily_limit=3, active=True,
+        rarity=ProductRarity.EPIC, size=ProductAssetUISize.ONE_BY_ONE, discount=10, l10n_key=f"PRODUCT_{name}",
+        path=f"{name}.png", fav_list=[{"ticker": "FAV__CRYSTAL", "amount": 1000}],
+        fungible_item_list=[{"sheet_item_id": 500000, "fungible_item_id": "item", "amount": 2}], **kwargs
+    )
+
+
+def test_catalog_render():
+    category = CategorySchema(name="Category", order=1, active=True, l10n_key="CATEGORY_1", path="category.png",
+                              product_list=[_product("A"), _product("B")])
+    catalog_category = CatalogCategory(
+        head=category.model_dump_json(exclude={"product_list"}).encode()[:-1] + b',"product_list":['
+    )
+    for i, product in enumerate(category.product_list):
+        catalog_category.product_list.append(CatalogProduct(
+            id=i, daily_limit=product.daily_limit, weekly_limit=None, account_limit=None, item_list=[],
+            body=product.model_dump_json(exclude=OVERLAY_FIELD_SET).encode()[:-1],
+        ))
+    catalog = Catalog(version="test", category_list=[catalog_category], fungible_id_set=set())
+
+    category.product_list[1].buyable = False
+    category.product_list[1].purchase_count = 3
+    expected = json.loads(dump_json(List[CategorySchema], [category]))
+    assert json.loads(catalog.render({1: (False, 3)})) == expected
+    assert json.loads(Catalog(version="empty", category_list=[], fungible_id_set=set()).render({})) == []
+
+
+def test_overlay(monkeypatch):
+    def catalog_product(id_: int, **kwargs) -> CatalogProduct:
+        return CatalogProduct(**{"id": id_, "daily_limit": None, "weekly_limit": None, "account_limit": None,
+                                 "item_list": [("item", 2)], "body": b"{", **kwargs})
+
+    catalog = Catalog(version="test", fungible_id_set={"item"}, category_list=[CatalogCategory(head=b"", product_list=[
+        catalog_product(1), catalog_product(2, daily_limit=3), catalog_product(3, weekly_limit=3),
+        catalog_product(4, account_limit=3), catalog_product(5, item_list=[("item", 20)]),
+    ])])
+    monkeypatch.setattr(iap.catalog, "get_iap_garage", lambda sess, fungible_id_list: [
+        SimpleNamespace(fungible_id=x, amount=10) for x in fungible_id_list
+    ])
+    queried = []
+
+    def get_purchase_count_dict(sess, product_id_list, *, planet_id, agent_addr):
+        queried.extend(product_id_list)
+        return {2: (3, 3, 3), 3: (1, 2, 5), 4: (1, 2, 5)}
+
+    monkeypatch.setattr(iap.catalog, "get_purchase_count_dict", get_purchase_count_dict)
+    assert get_overlay(None, catalog, PlanetID.ODIN, "0x0") == {
+        1: (True, 0), 2: (False, 3), 3: (True, 2), 4: (False, 5), 5: (False, 0),
+    }
+    # Purchase counts are queried once only for limited products
+    assert queried == [2, 3, 4]
+
+
+def test_get_catalog(monkeypatch):
+    version = {"value": "v1"}
+    built = []
+
+    def build_catalog(sess, version_):
+        built.append(version_)
+        return Catalog(version=version_, category_list=[], fungible_id_set=set())
+
+    monkeypatch.setattr(iap.catalog, "_catalog_cache", SerializedCache())
+    monkeypatch.setattr(iap.catalog, "get_catalog_version", lambda sess: version["value"])
+    monkeypatch.setattr(iap.catalog, "build_catalog", build_catalog)
+    catalog = get_catalog(None)
+    assert get_catalog(None) is catalog
+    version["value"] = "v2"
+    assert get_catalog(None).version == "v2"
+    # Catalog is built once for each version
+    assert built == ["v1", "v2"]
+
+
+def test_dump_json_from_attributes():
+    receipt = SimpleNamespace(store=Store.GOOGLE, uuid=uuid4(), order_id="order", status=ReceiptStatus.VALID,
+                              tx_id=None, tx_status=None, planet_id=PlanetID.ODIN)
+    missing = uuid4()
+    result = json.loads(dump_json(Dict[UUID, Optional[ReceiptDetailSchema]],
+                                  {receipt.uuid: receipt, missing: None}, from_attributes=True))
+    assert result[str(missing)] is None
+    assert result[str(receipt.uuid)]["order_id"] == "order"
+    assert result[str(receipt.uuid)]["planet_id"] == PlanetID.ODIN.decode()
+
+
+def test_serialized_cache():
+    cache = SerializedCache(max_size=2)
+    cache.set("a", b"a")
+    cache.set("b", b"b")
+    assert cache.get("a") == b"a"
+    # `b` is least recently used
+    cache.set("c", b"c")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"a"
+
+    cache.set("expired", b"expired", expires_at=time.time() - 1)
+    assert cache.get("expired") is None
+
+
+def test_is_not_modified():
+    assert is_not_modified('"a"', '"a"')
+    assert is_not_modified('"b", W/"a"', '"a"')
+    assert is_not_modified("*", '"a"')
+    assert not is_not_modified(None, '"a"')
+    assert not is_not_modified('"b"', '"a"')
+
+
+def test_etag_response():
+    def request(*header_list):
+        return Request({"type": "http", "method": "GET", "headers": list(header_list)})
+
+    resp = etag_response(request(), b'{"a":1}', cache_control="public, max-age=60")
+    assert resp.status_code == 200
+    assert resp.body == b'{"a":1}'
+    assert resp.headers["cache-control"] == "public, max-age=60"
+
+    etag = resp.headers["etag"]
+    resp = etag_response(request((b"if-none-match", etag.encode())), b'{"a":1}', cache_control="public, max-age=60")
+    assert resp.status_code == 304
+    assert resp.body == b""
+    assert resp.headers["etag"] == etag
+    assert etag_response(request((b"if-none-match", etag.encode())), b'{"a":2}', cache_control="").status_code == 200
+
+
+def test_file_etag(tmp_path, monkeypatch):
+    # Hashed by chunks without `hashlib.file_digest`, which is not in Python 3.10
+    monkeypatch.setattr(iap.response, "FILE_CHUNK_SIZE", 7)
+    path = tmp_path / "app.js"
+    content = b"console.log(1)\n" * 100
+    path.write_bytes(content)
+    stat = os.stat(path)
+    assert file_etag(str(path), stat.st_mtime, stat.st_size) == f'"{hashlib.sha1(content).hexdigest()}"'
+
+
+def test_static_files(tmp_path):
+    os.makedirs(tmp_path / "immutable")
+    (tmp_path / "immutable" / "app.1234.js").write_text("console.log(1)")
+    (tmp_path / "version.json").write_text("{}")
+    static = CachedStaticFiles(directory=tmp_path)
+
+    def get(path, *header_list):
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(static({"type": "http", "method": "GET", "path": path, "headers": list(header_list)},
+                           receive, send))
+        return sent[0]["status"], {k.decode(): v.decode() for k, v in sent[0]["headers"]}
+
+    status, header_dict = get("/immutable/app.1234.js")
+    assert status == 200
+    assert "immutable" in header_dict["cache-control"]
+    assert get("/immutable/app.1234.js", (b"if-none-match", header_dict["etag"].encode()))[0] == 304
+
+    status, header_dict = get("/version.json")
+    assert header_dict["cache-control"] == "public, no-cache"
+    (tmp_path / "version.json").write_text('{"version": 2}')
+    assert get("/version.json", (b"if-none-match", header_dict["etag"].encode()))[0] == 200
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from common._crypto import LocalAccount
+from simulator.aws import AWSError, AWSSimulator
+from simulator.fault import Fault, FaultInjector, parse_fault_list
+from simulator.headless import HeadlessSimulator
+
+
+def _gql(sim: HeadlessSimulator, query: str) -> dict:
+    return asyncio.run(sim.execute(query))
+
+
+def test_headless_tx_flow():
+    sim = HeadlessSimulator(confirm_delay=0)
+    account = LocalAccount()
+
+    data = _gql(sim, f'{{ transaction {{ nextTxNonce(address: "{account.address}") }} }}')
+    assert data["data"]["transaction"]["nextTxNonce"] == 0
+
+    data = _gql(sim, f'''{{ actionTxQuery(publicKey: "{account.pubkey.hex()}", nonce: 0) {{
+        unloadFromMyGarages(recipientAvatarAddr: "{account.address}",
+                            fungibleIdAndCounts: [{{fungibleId: "ab", count: 1}}])
+    }} }}''')
+    unsigned_tx = bytes.fromhex(data["data"]["actionTxQuery"]["unloadFromMyGarages"])
+
+    # Wrong signature is rejected
+    data = _gql(sim, f'''{{ transaction {{ signTransaction(
+        unsignedTransaction: "{unsigned_tx.hex()}", signature: "{LocalAccount().sign_tx(unsigned_tx).hex()}"
+    ) }} }}''')
+    assert data["errors"]
+
+    data = _gql(sim, f'''{{ transaction {{ signTransaction(
+        unsignedTransaction: "{unsigned_tx.hex()}", signature: "{account.sign_tx(unsigned_tx).hex()}"
+    ) }} }}''')
+    signed_tx = data["data"]["transaction"]["signTransaction"]
+    tx_id = _gql(sim, f'mutation {{ stageTransaction(payload: "{signed_tx}") }}')["data"]["stageTransaction"]
+
+    data = _gql(sim, f'{{ transaction {{ transactionResult(txId: "{tx_id}") {{ txStatus }} }} }}')
+    assert data["data"]["transaction"]["transactionResult"]["txStatus"] == "SUCCESS"
+    data = _gql(sim, f'{{ transaction {{ nextTxNonce(address: "{account.address}") }} }}')
+    assert data["data"]["transaction"]["nextTxNonce"] == 1
+
+
+def test_fault_injection():
+    fault = FaultInjector(fault_dict=parse_fault_list(["google=0:0:1"]))
+    assert asyncio.run(fault.inject("google"))
+    assert not asyncio.run(fault.inject("apple"))
+    fault.set("google", Fault())
+    assert not asyncio.run(fault.inject("google"))
+    assert fault.stats()["google"]["error"] == 1
+
+
+def test_aws_sqs_and_ssm():
+    aws = AWSSimulator(parameter_dict={"local_9c_SEASON_PASS_HOST": "http://localhost"})
+    aws.handle("AmazonSQS.SendMessage", {"QueueUrl": "queue", "MessageBody": "{}"})
+    assert [x[2] for x in aws.receive_message("queue")] == ["{}"]
+
+    resp = aws.handle("AmazonSSM.GetParameter", {"Name": "local_9c_SEASON_PASS_HOST"})
+    assert resp["Parameter"]["Value"] == "http://localhost"
+    with pytest.raises(AWSError):
+        aws.handle("AmazonSSM.GetParameter", {"Name": "x"})
@@ -0,0 +1,51 @@
+import jwt
+
+from common.utils import apple
+from common.utils.apple import get_notification_history_url, iter_refund_notifications
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+def _notification(transaction_id: str) -> dict:
+    transaction = jwt.encode({"transactionId": transaction_id, "revocationReason": 0}, "secret")
+    return {"signedPayload": jwt.encode({"notificationType": "REFUND",
+                                         "data": {"signedTransactionInfo": transaction}}, "secret")}
+
+
+def test_iter_refund_notifications(monkeypatch):
+    resp_list = [
+        {"notificationHistory": [_notification("1"), _notification("2")], "hasMore": True, "paginationToken": "next"},
+        {"notificationHistory": [_notification("3")], "hasMore": False},
+    ]
+    calls = []
+
+    def post(url, params=None, headers=None, json=None, timeout=None):
+        calls.append({"params": params, "headers": headers, "json": json})
+        return FakeResponse(resp_list[len(calls) - 1])
+
+    monkeypatch.setattr(apple.requests, "post", post)
+    token_list = iter(["token1", "token2"])
+    page_list = list(iter_refund_notifications("http://localhost/history", lambda: next(token_list), 1000, 2000))
+
+    assert [[x["transactionId"] for x in page] for page in page_list] == [["1", "2"], ["3"]]
+    assert calls[0]["params"] is None
+    assert calls[1]["params"] == {"paginationToken": "next"}
+    # New JWT for each page
+    assert [x["headers"]["Authorization"] for x in calls] == ["Bearer token1", "Bearer token2"]
+    assert calls[0]["json"] == {"startDate": 1000, "endDate": 2000, "notificationType": "REFUND"}
+
+
+def test_get_notification_history_url():
+    for host in ("https://api.storekit.itunes.apple.com", "https://api.storekit-sandbox.itunes.apple.com",
+                 "http://localhost:9000"):
+        validation_url = f"{host}/inApps/v1/transactions/{{transactionId}}"
+        assert get_notification_history_url(validation_url) == f"{host}/inApps/v1/notifications/history"
@@ -0,0 +1,54 @@
+import pytest
+
+from common.utils import aws
+from common.utils.aws import ParameterCache
+
+
+def test_parameter_cache_batch(monkeypatch):
+    store = {f"param_{i}": f"value_{i}" for i in range(3)}
+    called = []
+
+    def fetch_parameters(region, name_list, secure):
+        called.append(list(name_list))
+        return {x: store[x] for x in name_list if x in store}
+
+    monkeypatch.setattr(aws, "fetch_parameters", fetch_parameters)
+    cache = ParameterCache("us-east-2")
+    cache.preload(["param_0", "param_1", "param_2"])
+    assert [cache.get(f"param_{i}") for i in range(3)] == ["value_0", "value_1", "value_2"]
+    assert called == [["param_0", "param_1", "param_2"]]
+
+    with pytest.raises(KeyError):
+        cache.get("not_exist")
+    assert called[-1] == ["not_exist"]
+
+
+def test_parameter_cache_ttl(monkeypatch):
+    now = [1000.0]
+    called = []
+    monkeypatch.setattr(aws.time, "time", lambda: now[0])
+    monkeypatch.setattr(aws, "fetch_parameters",
+                        lambda region, name_list, secure: called.append(name_list) or {x: str(now[0]) for x in name_list})
+
+    cache = ParameterCache("us-east-2", ttl=60)
+    assert cache.get("param") == "1000.0"
+    now[0] += 30
+    assert cache.get("param") == "1000.0"
+    now[0] += 31
+    assert cache.get("param") == "1061.0"
+    assert len(called) == 2
+
+
+def test_parameter_cache_secure(monkeypatch):
+    called = []
+
+    def fetch_parameters(region, name_list, secure):
+        called.append(secure)
+        return {x: "decrypted" if secure else "encrypted" for x in name_list}
+
+    monkeypatch.setattr(aws, "fetch_parameters", fetch_parameters)
+    cache = ParameterCache("us-east-2")
+    assert cache.get("param", secure=False) == "encrypted"
+    assert cache.get("param") == "decrypted"
+    assert cache.get("param", secure=False) == "encrypted"
+    assert called == [False, True]
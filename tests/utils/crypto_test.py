@@ -0,0 +1,59 @@
+import hashlib
+import os
+
+import pytest
+from eth_keys import keys
+from eth_utils import to_checksum_address
+from pyasn1.codec.der.decoder import decode as der_decode
+
+from common._crypto import (
+    ECDSASignatureRecord, LocalAccount, SECP256K1_N, checksum_encode, derive_address, derive_address_cached,
+    get_account,
+)
+
+AGENT_ADDR = "0xdde23c49C0e36B5f8206Dbdac60675288484B37E"
+
+
+@pytest.mark.parametrize("addr", [os.urandom(20) for _ in range(10)] + [bytes(20), b"\xff" * 20])
+def test_checksum_encode(addr: bytes):
+    assert checksum_encode(addr) == to_checksum_address(addr)[2:]
+
+
+def test_derive_address_cached():
+    garage_addr = derive_address_cached(AGENT_ADDR, "garage")
+    assert garage_addr == derive_address(AGENT_ADDR, "garage")
+    fungible_id = os.urandom(32).hex()
+    assert derive_address_cached(garage_addr, fungible_id) == derive_address(garage_addr, fungible_id)
+
+
+def test_local_account_sign_tx():
+    account = LocalAccount()
+    unsigned_tx = os.urandom(128)
+    signature = account.sign_tx(unsigned_tx)
+
+    record, _ = der_decode(signature, asn1Spec=ECDSASignatureRecord())
+    r, s = int(record["r"]), int(record["s"])
+    assert s <= SECP256K1_N // 2
+    msg_hash = hashlib.sha256(unsigned_tx).digest()
+    public_key = keys.PublicKey(account.pubkey[1:])
+    assert any(
+        keys.Signature(vrs=(v, r, s)).recover_public_key_from_msg_hash(msg_hash) == public_key for v in (0, 1)
+    )
+    assert to_checksum_address(public_key.to_canonical_address()) == account.address
+
+
+def test_local_account_sign_tx_list():
+    account = LocalAccount(os.urandom(32).hex())
+    unsigned_tx_list = [os.urandom(64) for _ in range(5)]
+    assert account.sign_tx_list(unsigned_tx_list) == [account.sign_tx(x) for x in unsigned_tx_list]
+
+
+def test_get_account(monkeypatch):
+    key = os.urandom(32)
+    monkeypatch.setenv("SIGNER", "local")
+    monkeypatch.setenv("LOCAL_SIGNER_KEY", key.hex())
+    assert get_account("development", "us-east-2").address == LocalAccount(key).address
+    # Signer is kept in process
+    assert get_account("development", "us-east-2") is get_account("development", "us-east-2")
+    with pytest.raises(ValueError):
+        get_account("mainnet", "us-east-2")
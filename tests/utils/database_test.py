@@ -0,0 +1,54 @@
+import json
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool, QueuePool
+
+from common.utils.database import create_db_engine
+
+
+def test_queue_pool_metrics(tmp_path, capsys):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'db.sqlite'}", name="test", pool_size=1, max_overflow=1)
+    assert isinstance(engine.pool, QueuePool)
+
+    with Session(engine) as sess, Session(engine) as sess2:
+        sess.execute(text("SELECT 1"))
+        sess2.execute(text("SELECT 1"))
+        assert engine.pool_metrics.in_use == 2
+    with Session(engine) as sess:
+        sess.execute(text("SELECT 1"))
+
+    metrics = engine.pool_metrics.to_dict()
+    assert metrics["checkout"] == metrics["checkin"] == 3
+    assert metrics["max_in_use"] == 2
+    assert metrics["in_use"] == 0
+
+    engine.pool_metrics.emit()
+    emf = json.loads(capsys.readouterr().out)
+    assert emf["Trace"] == "test"
+    assert emf["db.checkout"] == 3
+    assert engine.pool_metrics.checkout == 0
+
+    # Emit is skipped within interval
+    engine.pool_metrics.emit(interval=60)
+    assert capsys.readouterr().out == ""
+
+
+def test_null_pool(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_POOL_MODE", "null")
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    assert isinstance(engine.pool, NullPool)
+    for _ in range(2):
+        with Session(engine) as sess:
+            sess.execute(text("SELECT 1"))
+    assert engine.pool_metrics.connect == 2
+
+
+def test_lambda_defaults(tmp_path, monkeypatch):
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_NAME", "iap")
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    assert engine.pool.size() == 1
+
+    with pytest.raises(ValueError):
+        create_db_engine(f"sqlite:///{tmp_path / 'db.sqlite'}", pool_mode="unknown")
@@ -0,0 +1,50 @@
+import pytest
+import requests
+
+from common._endpoint import EndpointPool
+
+URL_LIST = ["http://node-1/graphql", "http://node-2/graphql"]
+
+
+def test_call_fail_over():
+    pool = EndpointPool(URL_LIST)
+    called = []
+
+    def fn(url: str):
+        called.append(url)
+        if len(called) == 1:
+            raise requests.ConnectionError("Connection refused")
+        return url
+
+    result = pool.call(fn, retry_on=(requests.RequestException,))
+    assert result == called[1]
+    assert set(called) == set(URL_LIST)
+    stats = {x["url"]: x for x in pool.stats()}
+    assert stats[called[0]]["failure"] == 1
+    assert stats[called[1]]["success"] == 1
+
+
+def test_call_all_failed():
+    pool = EndpointPool(URL_LIST)
+
+    def fn(url: str):
+        raise requests.ConnectionError(url)
+
+    with pytest.raises(requests.ConnectionError):
+        pool.call(fn, retry_on=(requests.RequestException,))
+
+
+def test_circuit_open():
+    pool = EndpointPool(URL_LIST, failure_threshold=2, cooldown=60)
+    pool.record_failure(URL_LIST[0])
+    pool.record_failure(URL_LIST[0])
+    assert all(pool.select() == URL_LIST[1] for _ in range(20))
+
+    pool.record_success(URL_LIST[0], 0.1)
+    assert not {x["url"]: x for x in pool.stats()}[URL_LIST[0]]["open"]
+
+
+def test_select_all_open():
+    pool = EndpointPool(URL_LIST[:1], failure_threshold=1)
+    pool.record_failure(URL_LIST[0])
+    assert pool.select() == URL_LIST[0]
@@ -0,0 +1,105 @@
+import time
+
+import pytest
+
+from common.utils.google import BufferedSheetWriter, iter_voided_purchases
+
+
+class FakeSheet:
+    def __init__(self):
+        self.calls = []
+
+    def set_batch_values(self, data):
+        self.calls.append(data)
+
+
+class FailingSheet(FakeSheet):
+    def __init__(self, fail_count: int):
+        super().__init__()
+        self.fail_count = fail_count
+
+    def set_batch_values(self, data):
+        if self.fail_count:
+            self.fail_count -= 1
+            raise RuntimeError("Quota exceeded")
+        super().set_batch_values(data)
+
+
+def test_flush_by_size():
+    sheet = FakeSheet()
+    writer = BufferedSheetWriter(sheet, max_size=2, max_interval=None)
+    for i in range(5):
+        writer.write(f"Sheet!A{i + 2}:C", [[i, i, i]])
+    assert [len(x) for x in sheet.calls] == [2, 2]
+    writer.flush()
+    assert [len(x) for x in sheet.calls] == [2, 2, 1]
+    assert sheet.calls[-1] == [("Sheet!A6:C", [[4, 4, 4]])]
+
+
+def test_flush_on_exit_with_exception():
+    sheet = FakeSheet()
+    try:
+        with BufferedSheetWriter(sheet, max_size=100) as writer:
+            writer.write("Sheet!A2:C", [[1, 2, 3]])
+            raise RuntimeError("Stop")
+    except RuntimeError:
+        pass
+    assert sheet.calls == [[("Sheet!A2:C", [[1, 2, 3]])]]
+
+
+def test_keep_buffer_on_failure():
+    sheet = FailingSheet(fail_count=1)
+    writer = BufferedSheetWriter(sheet, max_size=100, max_interval=None)
+    writer.write("Sheet!A2:C", [[1, 2, 3]])
+    with pytest.raises(RuntimeError):
+        writer.flush()
+    assert len(writer) == 1
+
+    writer.write("Sheet!A3:C", [[4, 5, 6]])
+    writer.flush()
+    assert sheet.calls == [[("Sheet!A2:C", [[1, 2, 3]]), ("Sheet!A3:C", [[4, 5, 6]])]]
+    assert len(writer) == 0
+
+
+def test_flush_by_timer():
+    sheet = FakeSheet()
+    writer = BufferedSheetWriter(sheet, max_size=100, max_interval=0.05)
+    writer.write("Sheet!A2:C", [[1, 2, 3]])
+    # Flushed without any further write
+    for _ in range(100):
+        if sheet.calls:
+            break
+        time.sleep(0.01)
+    assert sheet.calls == [[("Sheet!A2:C", [[1, 2, 3]])]]
+    assert writer.flush_count == 1
+
+
+class FakeVoidedPurchases:
+    def __init__(self, page_list):
+        self.page_list = page_list
+        self.calls = []
+
+    def purchases(self):
+        return self
+
+    def voidedpurchases(self):
+        return self
+
+    def list(self, **kwargs):
+        self.calls.append(kwargs)
+        return self
+
+    def execute(self):
+        return self.page_list[len(self.calls) - 1]
+
+
+def test_iter_voided_purchases():
+    client = FakeVoidedPurchases([
+        {"voidedPurchases": [{"orderId": "GPA.1"}, {"orderId": "GPA.2"}], "tokenPagination": {"nextPageToken": "next"}},
+        {"voidedPurchases": [{"orderId": "GPA.3"}]},
+    ])
+    page_list = list(iter_voided_purchases(client, "com.example", 1000, 2000, page_size=2))
+    assert [[x["orderId"] for x in page] for page in page_list] == [["GPA.1", "GPA.2"], ["GPA.3"]]
+    assert "token" not in client.calls[0]
+    assert client.calls[1]["token"] == "next"
+    assert client.calls[1]["startTime"] == 1000 and client.calls[1]["endTime"] == 2000
@@ -0,0 +1,13 @@
+import pytest
+
+from common.utils.history import check_block_range
+
+
+def test_check_block_range():
+    block_list = [{"index": i, "hash": f"hash{i}"} for i in (12, 11, 10)]
+    assert [x["index"] for x in check_block_range(block_list, 10, 12)] == [10, 11, 12]
+
+    # Missing, shifted and duplicated blocks cannot be committed as synced range
+    for index_list in ((10, 12), (11, 12, 13), (10, 11, 11, 12), ()):
+        with pytest.raises(ValueError):
+            check_block_range([{"index": i, "hash": f"hash{i}"} for i in index_list], 10, 12)
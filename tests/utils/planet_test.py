@@ -0,0 +1,72 @@
+import json
+import threading
+import time
+
+from common.utils.planet import PlanetRegistry
+from common.utils.receipt import PlanetID
+
+REGISTRY = [
+    {
+        "id": "0x000000000000",
+        "name": "odin",
+        "rpcEndpoints": {"headless.gql": ["https://odin-rpc-1/graphql", "https://odin-rpc-2/graphql"]},
+        "bridges": {"0x000000000001": {"agent": "0xOdinAgent", "avatar": "0xOdinAvatar"}},
+    },
+    {
+        "id": "0x000000000001",
+        "name": "heimdall",
+        "rpcEndpoints": {"headless.gql": ["https://heimdall-rpc-1/graphql"]},
+        "bridges": {"0x000000000000": {"agent": "0xHeimdallAgent", "avatar": "0xHeimdallAvatar"}},
+    },
+]
+
+
+def test_lookup_and_disk_cache(tmp_path, monkeypatch):
+    cache_path = str(tmp_path / "planet.json")
+    registry = PlanetRegistry("https://planets", cache_path=cache_path)
+    fetched = []
+    monkeypatch.setattr(registry, "_fetch", lambda: fetched.append(1) or REGISTRY)
+
+    assert registry.get_gql_endpoints(PlanetID.ODIN) == REGISTRY[0]["rpcEndpoints"]["headless.gql"]
+    bridge = registry.get_bridge(PlanetID.ODIN, PlanetID.HEIMDALL)
+    assert (bridge.agent, bridge.avatar) == ("0xOdinAgent", "0xOdinAvatar")
+    assert len(fetched) == 1
+
+    # New registry (e.g., new process) uses disk cache without fetching
+    cached_registry = PlanetRegistry("https://planets", cache_path=cache_path)
+    monkeypatch.setattr(cached_registry, "_fetch", lambda: fetched.append(1) or REGISTRY)
+    assert cached_registry.get_gql_endpoints(PlanetID.HEIMDALL) == ["https://heimdall-rpc-1/graphql"]
+    assert len(fetched) == 1
+
+
+def test_fallback_bridge_data(tmp_path, monkeypatch):
+    registry = PlanetRegistry(
+        "https://planets", cache_path=str(tmp_path / "planet.json"),
+        fallback_bridge_data=json.dumps({"0x000000000001": {"agent": "0xAgent", "avatar": "0xAvatar"}}),
+    )
+
+    def _fetch():
+        raise ConnectionError("Registry is down")
+
+    monkeypatch.setattr(registry, "_fetch", _fetch)
+    assert registry.get_gql_endpoints(PlanetID.ODIN) == []
+    assert registry.get_bridge(PlanetID.ODIN, PlanetID.HEIMDALL).agent == "0xAgent"
+
+
+def test_first_load_once(tmp_path, monkeypatch):
+    registry = PlanetRegistry("https://planets", cache_path=str(tmp_path / "planet.json"))
+    fetched = []
+
+    def _fetch():
+        fetched.append(1)
+        time.sleep(0.1)
+        return REGISTRY
+
+    monkeypatch.setattr(registry, "_fetch", _fetch)
+    thread_list = [threading.Thread(target=registry.get_planet, args=(PlanetID.ODIN,)) for _ in range(8)]
+    for thread in thread_list:
+        thread.start()
+    for thread in thread_list:
+        thread.join()
+    assert len(fetched) == 1
+    assert registry.get_gql_endpoints(PlanetID.HEIMDALL) == ["https://heimdall-rpc-1/graphql"]
@@ -0,0 +1,36 @@
+import csv
+import io
+import json
+
+from sqlalchemy.dialects import postgresql
+
+from common.enums import ReceiptStatus
+from common.utils.receipt_export import EXPORT_FIELD_LIST, export_query, iter_csv, iter_ndjson
+
+ROW_LIST = [{field: f"{field}_{i}" for field in EXPORT_FIELD_LIST} for i in range(5)]
+
+
+def test_iter_csv():
+    chunk_list = list(iter_csv(iter(ROW_LIST), chunk_size=2))
+    # Header is written with first chunk
+    assert len(chunk_list) == 3
+    assert list(csv.DictReader(io.StringIO("".join(chunk_list)))) == ROW_LIST
+
+
+def test_iter_csv_empty():
+    assert list(iter_csv(iter([]))) == [",".join(EXPORT_FIELD_LIST) + "\r\n"]
+
+
+def test_iter_ndjson():
+    chunk_list = list(iter_ndjson(iter(ROW_LIST), chunk_size=2))
+    assert len(chunk_list) == 3
+    assert [json.loads(x) for x in "".join(chunk_list).splitlines()] == ROW_LIST
+    assert list(iter_ndjson(iter([]))) == []
+
+
+def test_export_query():
+    sql = str(export_query(status=ReceiptStatus.VALID).compile(dialect=postgresql.dialect()))
+    # Receipts without product must be exported too
+    assert "LEFT OUTER JOIN product" in sql
+    assert "receipt.status = " in sql
+    assert sql.endswith("ORDER BY receipt.purchased_at, receipt.id")
@@ -0,0 +1,71 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from common.enums import ReceiptStatus, Store
+from common.models.receipt import Receipt
+from common.utils.receipt import PlanetID
+from common.utils.receipt_query import decode_cursor, encode_cursor, filter_receipts, mark_refunded, paginate_receipts
+
+
+def _compile(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def test_cursor():
+    purchased_at = datetime(2023, 12, 1, 12, 34, 56, 789, tzinfo=timezone.utc)
+    cursor = encode_cursor(purchased_at, 1234)
+    assert decode_cursor(cursor) == (purchased_at, 1234)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_cursor(datetime.now(), 1)[:-4]])
+def test_malformed_cursor(cursor: str):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_filter_receipts():
+    sql = _compile(filter_receipts(select(Receipt)))
+    assert "WHERE" not in sql
+
+    sql = _compile(filter_receipts(select(Receipt), store=Store.GOOGLE, status=ReceiptStatus.VALID,
+                                   planet_id=PlanetID.ODIN, agent_addr="0xa"))
+    for column in ("store", "status", "planet_id", "agent_addr"):
+        assert f"receipt.{column} = " in sql
+
+
+def test_paginate_receipts():
+    sql = _compile(paginate_receipts(select(Receipt), None, 50))
+    assert "ORDER BY receipt.purchased_at DESC, receipt.id DESC" in sql
+    assert "OFFSET" not in sql
+
+    sql = _compile(paginate_receipts(select(Receipt), encode_cursor(datetime.now(), 1), 50))
+    # Row comparison can be used as index range condition
+    assert "(receipt.purchased_at, receipt.id) < (" in sql
+
+
+def test_mark_refunded():
+    class FakeSession:
+        def __init__(self):
+            self.stmt_list = []
+
+        def execute(self, stmt):
+            self.stmt_list.append(stmt)
+            return SimpleNamespace(rowcount=2)
+
+    sess = FakeSession()
+    assert mark_refunded(sess, (Store.GOOGLE,), []) == 0
+    assert sess.stmt_list == []
+
+    assert mark_refunded(sess, (Store.GOOGLE,), ["GPA.1", "GPA.2", "GPA.1"]) == 2
+    # One bulk update for all order IDs
+    assert len(sess.stmt_list) == 1
+    sql = _compile(sess.stmt_list[0])
+    assert sql.startswith("UPDATE receipt SET")
+    assert "receipt.order_id IN" in sql
+    assert "receipt.status NOT IN" in sql
+    # `/admin/refunded` lists refunded receipts by `updated_at`
+    assert "updated_at=now()" in sql
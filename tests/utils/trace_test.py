@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from common.utils.trace import current_trace, span, start_trace, timed, traced
+
+
+@timed("external.call")
+def call_external():
+    return "done"
+
+
+def test_trace_spans(capsys):
+    with start_trace("purchase", store="GOOGLE") as trace:
+        with span("db.query"):
+            pass
+        assert call_external() == "done"
+        assert call_external() == "done"
+    assert current_trace() is None
+
+    assert trace.count_dict == {"db.query": 1, "external.call": 2, "total": 1}
+    emf = json.loads(capsys.readouterr().out)
+    assert emf["Trace"] == "purchase"
+    assert emf["store"] == "GOOGLE"
+    assert emf["count"]["external.call"] == 2
+    assert {x["Name"] for x in emf["_aws"]["CloudWatchMetrics"][0]["Metrics"]} == {"db.query", "external.call",
+                                                                                   "total"}
+    assert emf["total"] >= emf["db.query"]
+
+
+def test_traced_error(capsys):
+    @traced()
+    def fail():
+        with span("db.query"):
+            raise ValueError("Invalid")
+
+    with pytest.raises(ValueError):
+        fail()
+    emf = json.loads(capsys.readouterr().out)
+    assert emf["Trace"] == "fail"
+    assert emf["error"] == "ValueError"
+    assert "db.query" in emf
+
+
+def test_no_trace(capsys):
+    with span("db.query"):
+        assert call_external() == "done"
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,81 @@
+import os
+import sys
+
+import pytest
+
+from common.enums import GoldenDustTxStatus as TxStatus
+from common.models.golden_dust import GoldenDustRequest
+from common.utils.planet import PlanetRegistry
+
+AGENT = "0x" + "a" * 40
+AVATAR = "0x" + "b" * 40
+TX_HASH = "c" * 64
+
+
+@pytest.fixture(scope="module")
+def gd(tmp_path_factory):
+    # Module loads secrets and DB engine at import
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("DB_URI", f"sqlite:///{tmp_path_factory.mktemp('db') / 'golden_dust.db'}")
+        mp.setenv("FORM_SHEET", "Form")
+        mp.setattr("common.utils.aws.fetch_parameter", lambda *args: {"Value": "{}"})
+        mp.setattr("common.utils.aws.fetch_secrets", lambda *args: {"password": ""})
+        mp.syspath_prepend(os.path.join(os.path.dirname(__file__), "..", "worker"))
+        import golden_dust_by_ncg
+        yield golden_dust_by_ncg
+        sys.modules.pop("golden_dust_by_ncg", None)
+
+
+def _row(**kwargs):
+    row = [AGENT, AVATAR, "", TX_HASH, "", "2", "test@example.com", "", "", "", "", "token"]
+    for index, value in kwargs.items():
+        row[int(index[1:])] = value
+    return row
+
+
+def test_validate_format(gd):
+    assert gd.validate_format(_row()) == []
+
+    work = gd.WorkData.from_request(_row(), row=2)
+    assert (work.agent_addr, work.request_tx_hash, work.request_dust_set, work.token) == (AGENT, TX_HASH, 2, "token")
+    assert work.request_tx_status == TxStatus.NOT_FOUND
+
+
+@pytest.mark.parametrize("row", [
+    _row()[:6],
+    _row(c0="0x1234"),
+    _row(c3="0x1234"),
+    _row(c5=""),
+    _row(c5="two"),
+    _row(c5="0"),
+])
+def test_malformed_row(gd, row):
+    # Malformed row is parsed to be recorded as invalid, instead of stopping whole run
+    assert gd.validate_format(row)
+    work = gd.WorkData.from_request(row, row=5)
+    assert work.token == (row[11] if len(row) == 12 else "Form!5")
+    assert isinstance(work.request_dust_set, int)
+
+
+def test_stage_rejected(gd):
+    req = GoldenDustRequest(tx_status=TxStatus.NOT_CREATED, nonce=3, plain_text="ab", stage_attempt=0)
+    for attempt in range(1, gd.MAX_STAGE_ATTEMPT):
+        gd.handle_stage_rejected(req, f"Rejected {attempt}")
+        # Stage again at next run
+        assert (req.stage_attempt, req.tx_status, req.nonce, req.plain_text) == (
+            attempt, TxStatus.NOT_CREATED, None, None
+        )
+
+    gd.handle_stage_rejected(req, "Rejected")
+    assert (req.stage_attempt, req.tx_status) == (gd.MAX_STAGE_ATTEMPT, TxStatus.FAILURE)
+    assert req.comment.split("\n")[-1] == f"Staging is rejected {gd.MAX_STAGE_ATTEMPT} times. Check manually."
+
+
+def test_gql_pool_of_planet(gd, monkeypatch, tmp_path):
+    registry = PlanetRegistry("https://planets", cache_path=str(tmp_path / "planet.json"))
+    endpoint_list = ["https://rpc-1/graphql", "https://rpc-2/graphql"]
+    monkeypatch.setattr(registry, "_fetch", lambda: [
+        {"id": gd.CURRENT_PLANET.value.decode(), "rpcEndpoints": {"headless.gql": endpoint_list}}
+    ])
+    monkeypatch.setattr(gd, "planet_registry", registry)
+    assert gd.get_gql_pool().url_list == endpoint_list
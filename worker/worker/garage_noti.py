@@ -1,13 +1,13 @@
 import os
 
 import requests
-from sqlalchemy import create_engine
 from sqlalchemy import select
 from sqlalchemy.orm import scoped_session, sessionmaker
 
 from common import logger
 from common.models.product import FungibleItemProduct
 from common.utils.aws import fetch_secrets
+from common.utils.database import create_db_engine
 from common.utils.garage import get_iap_garage, update_iap_garage
 
 DB_URI = os.environ.get("DB_URI")
@@ -32,7 +32,7 @@ COLOR_PROFILE = {
     },
 }
 
-engine = create_engine(DB_URI, pool_size=5, max_overflow=5)
+engine = create_db_engine(DB_URI, name="garage_noti")
 
 
 def noti(event, context):
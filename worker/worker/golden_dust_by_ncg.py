@@ -2,18 +2,25 @@ import concurrent.futures
 import json
 import logging
 import os
+import re
 from dataclasses import dataclass, field
 from datetime import datetime
-from enum import Enum
-from typing import Union, List, Optional
+from typing import Union, List, Optional, Dict, Tuple
 
 import requests
-from gql.dsl import dsl_gql, DSLQuery
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.orm import sessionmaker, scoped_session
 
-from common._crypto import Account
+from common._crypto import get_account
+from common._endpoint import EndpointPool
 from common._graphql import GQL
-from common.utils.aws import fetch_kms_key_id, fetch_parameter
+from common.enums import GoldenDustTxStatus as TxStatus, GoldenDustWorkStatus as WorkStatus
+from common.models.golden_dust import GoldenDustCursor, GoldenDustRequest
+from common.utils.aws import fetch_parameter, fetch_secrets
+from common.utils.database import create_db_engine
 from common.utils.google import Spreadsheet
+from common.utils.planet import get_planet_registry
+from common.utils.receipt import PlanetID
 
 GOOGLE_CREDENTIAL = fetch_parameter(
     os.environ.get("REGION_NAME"),
@@ -21,6 +28,17 @@ GOOGLE_CREDENTIAL = fetch_parameter(
     True
 )["Value"]
 
+DB_URI = os.environ.get("DB_URI")
+db_password = fetch_secrets(os.environ.get("REGION_NAME"), os.environ.get("SECRET_ARN"))["password"]
+DB_URI = DB_URI.replace("[DB_PASSWORD]", db_password)
+
+engine = create_db_engine(DB_URI, name="golden_dust", pool_size=1, max_overflow=0)
+
+CURRENT_PLANET = PlanetID.ODIN if os.environ.get("STAGE") == "mainnet" else PlanetID.ODIN_INTERNAL
+DEFAULT_GQL_URL_LIST = [f"{os.environ.get('HEADLESS')}/graphql"]
+
+planet_registry = get_planet_registry()
+
 AUTHORIZED_RECIPIENT = "0xE8D6c4b15269754fE7b26DA243052ECD2a88db07"
 NCG_TRANSFER_UNIT = 35
 GOLDEN_DUST_SET = 20
@@ -38,25 +56,19 @@ COMMENT_COL = "O"
 NONCE_COL = "P"
 PLAIN_VALUE_COL = "Q"
 
-TX_QUERY = """{{
-  stateQuery {{
-    agent(address: "{agent_addr}") {{
-      avatarStates {{ address }}
-    }}
-  }}
-  transaction {{
-    getTx(txId: "{tx_hash}")  {{
-      signer
-      actions {{
-        json
-      }}
-    }}
-    transactionResult(txId: "{tx_hash}") {{
-      txStatus
-      exceptionNames
-    }}
-  }}
-}}"""
+# Form sheet has columns A to L. Trailing empty cells are not returned from sheet.
+FORM_COLUMN_COUNT = 12
+
+ADDRESS_PATTERN = re.compile(r"^0x[0-9a-fA-F]{40}$")
+TX_HASH_PATTERN = re.compile(r"^(0x)?[0-9a-fA-F]{64}$")
+DUST_SET_PATTERN = re.compile(r"^[0-9]+$")
+
+# Unload Tx. rejected this many times is not staged again and marked as failure to be checked manually
+MAX_STAGE_ATTEMPT = 3
+
+# Number of request Tx.s queried in one aliased GQL request
+TX_BATCH_SIZE = 20
+MAX_GQL_CONCURRENCY = 4
 
 UNLOAD_QUERY = """{{
   actionTxQuery (
@@ -77,22 +89,9 @@ UNLOAD_QUERY = """{{
 }}"""
 
 
-class WorkStatus(Enum):
-    REQ = "Requested"
-    ACK = "Acknowledged"
-    VALID = "Valid"
-    INVALID = "Invalid"
-    INVALID_CAN_REFUND = "Invalid - Can Refund"
-    INVALID_CANNOT_REFUND = "Invalid - Cannot Refund"
-
-
-class TxStatus(Enum):
-    NOT_CREATED = "Not Created"
-    NOT_FOUND = "Not Found"
-    STAGING = "Staging"
-    SUCCESS = "Success"
-    INVALID = "Invalid"
-    FAILURE = "Failure"
+def get_gql_pool() -> EndpointPool:
+    # Shared pool keeps HTTP connections alive between batches and fails over to other RPC nodes of planet
+    return planet_registry.get_gql_pool(CURRENT_PLANET, DEFAULT_GQL_URL_LIST)
 
 
 @dataclass
@@ -130,11 +129,71 @@ class WorkData:
         self.request_dust_set = int(self.request_dust_set)
 
     @classmethod
-    def from_request(cls, req: List):
+    def from_request(cls, req: List, row: int) -> "WorkData":
+        """
+        Parse form sheet row. Malformed row is parsed too, to be recorded as invalid after `validate_format`.
+        Missing values are left empty, non-numeric dust set is `0` and row without token is keyed by its row number.
+        """
+        req = req + [""] * (FORM_COLUMN_COUNT - len(req))
+        dust_set = req[5].strip()
         return cls(
             agent_addr=req[0], avatar_addr=req[1],
-            request_tx_hash=req[3], request_dust_set=req[5],
-            email=req[6], token=req[11],
+            request_tx_hash=req[3], request_dust_set=int(dust_set) if DUST_SET_PATTERN.match(dust_set) else 0,
+            email=req[6], token=req[11] or f"{FORM_SHEET}!{row}",
+        )
+
+    @classmethod
+    def from_values(cls, row: List) -> "WorkData":
+        """
+        Parse work sheet row. Used to import requests recorded before ledger.
+        Unknown or malformed values are logged and replaced with defaults, so one hand-edited row does not block import.
+        """
+        row = row + [""] * (17 - len(row))
+
+        def parse(index: int, parser, default, unknown=None):
+            if not row[index]:
+                return default
+            try:
+                return parser(row[index])
+            except ValueError:
+                fallback = default if unknown is None else unknown
+                logging.warning(f"Unknown value {row[index]!r} in column {index + 1} of token {row[8]}. "
+                                f"Use {fallback} instead.")
+                return fallback
+
+        return cls(
+            agent_addr=row[0], avatar_addr=row[1], request_tx_hash=row[2],
+            request_tx_status=parse(3, TxStatus, TxStatus.NOT_FOUND),
+            request_duplicated=row[4], sent_ncg=parse(5, float, None),
+            request_dust_set=parse(6, int, 0), email=row[7], token=row[8],
+            status=parse(9, WorkStatus, WorkStatus.REQ), tx_hash=row[10],
+            tx_status=parse(11, TxStatus, TxStatus.NOT_CREATED, unknown=TxStatus.NOT_FOUND),
+            block_index=parse(12, int, 0),
+            timestamp=parse(13, datetime.fromisoformat, None),
+            comment=row[14].split("\n") if row[14] else [], nonce=parse(15, int, None),
+            plain_text=row[16],
+        )
+
+    @classmethod
+    def from_ledger(cls, req: GoldenDustRequest) -> "WorkData":
+        return cls(
+            agent_addr=req.agent_addr, avatar_addr=req.avatar_addr, request_tx_hash=req.request_tx_hash,
+            request_dust_set=req.request_dust_set, email=req.email or "", token=req.token,
+            request_duplicated="Duplicated" if req.request_duplicated else "",
+            request_tx_status=req.request_tx_status.value, sent_ncg=req.sent_ncg, status=req.status,
+            tx_hash=req.tx_hash or "", tx_status=req.tx_status, block_index=req.block_index or 0,
+            timestamp=req.updated_at, comment=req.comment.split("\n") if req.comment else [],
+            nonce=req.nonce, plain_text=req.plain_text or "",
+        )
+
+    def to_ledger(self, sheet_row: int, exported: bool = False) -> GoldenDustRequest:
+        return GoldenDustRequest(
+            agent_addr=self.agent_addr, avatar_addr=self.avatar_addr, request_tx_hash=self.request_tx_hash.lower(),
+            request_tx_status=self.request_tx_status, request_duplicated=bool(self.request_duplicated),
+            sent_ncg=self.sent_ncg, request_dust_set=self.request_dust_set, email=self.email, token=self.token,
+            status=self.status, tx_hash=self.tx_hash or None, tx_status=self.tx_status,
+            block_index=self.block_index or None, nonce=self.nonce, plain_text=self.plain_text or None,
+            comment="\n".join(self.comment) or None, sheet_row=sheet_row, exported=exported,
         )
 
     @property
@@ -201,75 +260,354 @@ def handle_tx_result(data: dict, result: TxData) -> TxData:
     return result
 
 
-def get_tx_result(agent_addr: str, tx_hash: str) -> TxData:
-    result = TxData(tx_hash)
+def validate_format(req: List) -> List[str]:
+    """
+    Check format of form sheet row before its values are used in GQL query and ledger.
+
+    :param req: Row of form sheet
+    :return: List of error messages. Empty if valid.
+    """
+    if len(req) < FORM_COLUMN_COUNT:
+        return [f"Request has only {len(req)} of {FORM_COLUMN_COUNT} columns"]
+
+    error_list = []
+    if not ADDRESS_PATTERN.match(req[0]):
+        error_list.append(f"{req[0]} is not a valid agent address")
+    if not TX_HASH_PATTERN.match(req[3]):
+        error_list.append(f"{req[3]} is not a valid Tx. hash")
+    if not DUST_SET_PATTERN.match(req[5].strip()) or int(req[5]) <= 0:
+        error_list.append(f"{req[5]} is not a valid Golden Dust set")
+    return error_list
+
+
+def build_batch_query(agent_list: List[str], tx_hash_list: List[str]) -> str:
+    """
+    Build one GQL document to get avatars of all agents and details/results of all Tx.s using alias.
+    Alias `a{i}` is used for i-th agent and `d{j}`/`r{j}` for detail/result of j-th Tx.
+    """
+    for agent_addr in agent_list:
+        if not ADDRESS_PATTERN.match(agent_addr):
+            raise ValueError(f"Invalid agent address: {agent_addr!r}")
+    for tx_hash in tx_hash_list:
+        if not TX_HASH_PATTERN.match(tx_hash):
+            raise ValueError(f"Invalid Tx. hash: {tx_hash!r}")
+
+    agent_query = "\n".join(
+        f'a{i}: stateQuery {{ agent(address: "{agent_addr}") {{ avatarStates {{ address }} }} }}'
+        for i, agent_addr in enumerate(agent_list)
+    )
+    tx_query = "\n".join(
+        f'd{j}: getTx(txId: "{tx_hash}") {{ signer actions {{ json }} }}\n'
+        f'r{j}: transactionResult(txId: "{tx_hash}") {{ txStatus exceptionNames }}'
+        for j, tx_hash in enumerate(tx_hash_list)
+    )
+    return f"{{\n{agent_query}\ntransaction {{\n{tx_query}\n}}\n}}"
+
+
+def query_tx_result(request_list: List[Tuple[str, str]]) -> Optional[Dict[Tuple[str, str], TxData]]:
+    """
+    Get Tx. data of many (agent address, Tx. hash) pairs with one GQL request.
+    Duplicated agents and Tx.s are queried only once.
+
+    :param request_list: List of (agent address, request Tx. hash)
+    :return: TxData for each (agent address, Tx. hash) pair. `None` if whole request failed.
+    """
+    agent_list = list(dict.fromkeys(agent_addr for agent_addr, _ in request_list))
+    tx_hash_list = list(dict.fromkeys(tx_hash for _, tx_hash in request_list))
+    agent_alias = {agent_addr: f"a{i}" for i, agent_addr in enumerate(agent_list)}
+    tx_alias = {tx_hash: j for j, tx_hash in enumerate(tx_hash_list)}
+    result_dict = {(agent_addr, tx_hash): TxData(tx_hash) for agent_addr, tx_hash in request_list}
 
-    resp = requests.post(f"{os.environ.get('HEADLESS')}/graphql",
-                         json={"query": TX_QUERY.format(agent_addr=agent_addr, tx_hash=tx_hash)})
+    try:
+        resp = get_gql_pool().post(json={"query": build_batch_query(agent_list, tx_hash_list)})
+    except requests.RequestException as e:
+        logging.error(f"Batch Tx. query failed: {e}")
+        return None
 
     if resp.status_code != 200:
-        result.comment.append("Failed to get Tx. status through GQL")
-        return result
+        logging.error(f"Batch Tx. query failed with status {resp.status_code}")
+        return None
 
     data = resp.json()
-    if "data" not in data:
-        result.comment.append("No right data returned from GQL")
-        return result
+    if data.get("data") is None:
+        logging.error(f"No data found from GQL: {data.get('errors')}")
+        return None
 
     data = data["data"]
-    if data is None:
-        result.comment.append("No data found from GQL")
-        return result
+    tx_data = data.get("transaction")
+    for (agent_addr, tx_hash), result in result_dict.items():
+        # avatar list in agent
+        handle_avatar(data.get(agent_alias[agent_addr]) or {}, result)
+
+        # Transaction
+        if tx_data is None:
+            result.comment.append("No right Tx. data found from GQL")
+            continue
 
-    # avatar list in agent
-    result = handle_avatar(data.get("stateQuery", {}), result)
+        j = tx_alias[tx_hash]
+        handle_tx_detail(tx_data.get(f"d{j}"), result)
+        if tx_data.get(f"r{j}") is None:
+            result.comment.append("No Tx. result found from GQL")
+        else:
+            handle_tx_result(tx_data[f"r{j}"], result)
+
+    return result_dict
+
+
+def get_tx_result_batch(request_list: List[Tuple[str, str]]) -> Dict[Tuple[str, str], TxData]:
+    """
+    Get Tx. data of a batch with one GQL request.
+    When whole batch failed, requests are queried one by one so one failure does not affect other requests.
+
+    :param request_list: List of (agent address, request Tx. hash)
+    :return: TxData for each (agent address, Tx. hash) pair. Requests failed to query are not included.
+    """
+    result_dict = query_tx_result(request_list)
+    if result_dict is not None:
+        return result_dict
+
+    result_dict = {}
+    if len(request_list) > 1:
+        logging.warning(f"Query {len(request_list)} requests of failed batch one by one.")
+        for request in request_list:
+            result_dict.update(query_tx_result([request]) or {})
+    return result_dict
+
+
+def get_tx_result_list(request_list: List[Tuple[str, str]]) -> Dict[Tuple[str, str], TxData]:
+    """
+    Get Tx. data of all requests in batches of `TX_BATCH_SIZE` with at most `MAX_GQL_CONCURRENCY` concurrent requests.
+    Requests failed to query are not included.
+    """
+    request_list = list(dict.fromkeys(request_list))
+    batch_list = [request_list[i:i + TX_BATCH_SIZE] for i in range(0, len(request_list), TX_BATCH_SIZE)]
+    result_dict = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_GQL_CONCURRENCY) as executor:
+        for i, batch_result in enumerate(executor.map(get_tx_result_batch, batch_list)):
+            result_dict.update(batch_result)
+            print(f"{i + 1} / {len(batch_list)} batches checked")
+    return result_dict
+
+
+def build_tx_status_query(tx_hash_list: List[str]) -> str:
+    """
+    Build one GQL document to get results of all Tx.s using alias `r{j}` for j-th Tx.
+    """
+    tx_query = "\n".join(
+        f'r{j}: transactionResult(txId: "{tx_hash}") {{ txStatus blockIndex exceptionNames }}'
+        for j, tx_hash in enumerate(tx_hash_list)
+    )
+    return f"{{\ntransaction {{\n{tx_query}\n}}\n}}"
 
-    # Transaction
-    if "transaction" not in data:
-        result.comment.append("No right Tx. data found from GQL")
-        return result
 
-    data = data["transaction"]
-    result = handle_tx_detail(data.get("getTx"), result)
-    result = handle_tx_result(data.get("transactionResult"), result)
+def get_tx_status_batch(tx_hash_list: List[str]) -> Dict[str, dict]:
+    """
+    Get results of many Tx.s with one GQL request.
 
-    return result
+    :param tx_hash_list: List of Tx. hash to get result
+    :return: `transactionResult` of each Tx. hash. Tx.s failed to get result are not included.
+    """
+    try:
+        resp = get_gql_pool().post(json={"query": build_tx_status_query(tx_hash_list)})
+    except requests.RequestException as e:
+        logging.error(f"Batch Tx. result query failed: {e}")
+        return {}
+
+    if resp.status_code != 200:
+        logging.error(f"Batch Tx. result query failed with status {resp.status_code}")
+        return {}
+
+    data = resp.json()
+    if data.get("errors"):
+        logging.error(f"GQL Failed to get tx result: {data['errors']}")
+    tx_data = (data.get("data") or {}).get("transaction") or {}
+    return {tx_hash: tx_data[f"r{j}"] for j, tx_hash in enumerate(tx_hash_list) if tx_data.get(f"r{j}")}
+
+
+def get_tx_status_list(tx_hash_list: List[str]) -> Dict[str, dict]:
+    """
+    Get results of all Tx.s in batches of `TX_BATCH_SIZE` with at most `MAX_GQL_CONCURRENCY` concurrent requests.
+    """
+    tx_hash_list = list(dict.fromkeys(tx_hash_list))
+    batch_list = [tx_hash_list[i:i + TX_BATCH_SIZE] for i in range(0, len(tx_hash_list), TX_BATCH_SIZE)]
+    result_dict = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_GQL_CONCURRENCY) as executor:
+        for batch_result in executor.map(get_tx_status_batch, batch_list):
+            result_dict.update(batch_result)
+    return result_dict
+
+
+def import_work_sheet(sess, work_sheet: Spreadsheet) -> int:
+    """
+    Import requests recorded in work sheet before ledger. Imported requests are already exported.
+    Requests treated before ledger keep their row and ownership of request Tx., and only their data is filled.
+    Only the first request can own request Tx., and later ones are imported as duplicated.
+
+    :return: Number of rows in work sheet
+    """
+    prev_data = work_sheet.get_values(f"{WORK_SHEET}!A2:{PLAIN_VALUE_COL}").get("values", [])
+    prev_dict = {x.token: x for x in sess.scalars(select(GoldenDustRequest))}
+    prev_treated = {x.request_tx_hash for x in prev_dict.values() if not x.request_duplicated}
+    for i, row in enumerate(prev_data):
+        work = WorkData.from_values(row)
+        if not work.token:
+            continue
+        prev = prev_dict.get(work.token)
+        if prev is not None:
+            work.request_duplicated = "Duplicated" if prev.request_duplicated else ""
+            ledger = work.to_ledger(sheet_row=prev.sheet_row, exported=True)
+            ledger.id = prev.id
+            sess.merge(ledger)
+            continue
+
+        if work.request_tx_hash.lower() in prev_treated:
+            work.request_duplicated = "Duplicated"
+        prev_treated.add(work.request_tx_hash.lower())
+        prev_dict[work.token] = work.to_ledger(sheet_row=i + 2, exported=True)
+        sess.add(prev_dict[work.token])
+    print(f"{len(prev_data)} rows imported from work sheet.")
+    return len(prev_data)
+
+
+def load_cursor(sess, work_sheet: Spreadsheet) -> GoldenDustCursor:
+    """
+    Load form sheet cursor.
+    At the very first run, requests in work sheet are imported to ledger and all form rows are read once.
+    """
+    cursor = sess.scalar(select(GoldenDustCursor).where(
+        GoldenDustCursor.form_sheet == FORM_SHEET, GoldenDustCursor.work_sheet == WORK_SHEET
+    ))
+    if cursor is not None and cursor.ledger_imported:
+        return cursor
+
+    print("Import work sheet to ledger.")
+    row_count = import_work_sheet(sess, work_sheet)
+    if cursor is None:
+        cursor = GoldenDustCursor(form_sheet=FORM_SHEET, work_sheet=WORK_SHEET, next_form_row=2,
+                                  next_work_row=row_count + 2)
+    cursor.ledger_imported = True
+    sess.add(cursor)
+    sess.commit()
+    return cursor
+
+
+def recover_nonce(sess, gql: GQL, address: str) -> int:
+    """
+    Recover requests which have nonce but no unload Tx. These are left when function is killed
+    after nonce is recorded but before staging result is recorded.
+
+    - Nonce not consumed in chain: Tx. is never staged. Nonce is cleared to stage again.
+    - Nonce consumed by another request in ledger: Tx. is never staged. Nonce is cleared to stage again.
+    - Nonce consumed by unknown Tx.: Tx. may be staged. It is not staged again and marked to be checked manually.
+
+    :return: Number of requests to stage again
+    """
+    req_list = sess.scalars(
+        select(GoldenDustRequest).where(
+            GoldenDustRequest.status == WorkStatus.VALID,
+            GoldenDustRequest.tx_status == TxStatus.NOT_CREATED,
+            GoldenDustRequest.nonce.is_not(None),
+        )
+    ).fetchall()
+    if not req_list:
+        return 0
+
+    next_nonce = gql.get_next_nonce(address)
+    if next_nonce < 0:
+        logging.error(f"Failed to get next nonce. Skip recovery of {len(req_list)} requests.")
+        return 0
+
+    used_nonce_set = set(sess.scalars(
+        select(GoldenDustRequest.nonce).where(
+            GoldenDustRequest.nonce.in_([x.nonce for x in req_list]),
+            GoldenDustRequest.tx_hash.is_not(None),
+        )
+    ))
+    recovered = 0
+    for req in req_list:
+        if req.nonce >= next_nonce or req.nonce in used_nonce_set:
+            req.nonce = None
+            req.plain_text = None
+            recovered += 1
+        else:
+            req.tx_status = TxStatus.NOT_FOUND
+            req.comment = "\n".join([
+                req.comment or "", f"Nonce {req.nonce} is used but unload Tx. is unknown. Check manually."
+            ]).strip()
+        req.exported = False
+    sess.commit()
+    print(f"{recovered} / {len(req_list)} requests with unstaged nonce will be staged again.")
+    return recovered
+
+
+def handle_stage_rejected(req: GoldenDustRequest, msg: str):
+    """
+    Record rejected staging of unload Tx. Nonce is not consumed, so it is cleared to stage again at next run.
+    After `MAX_STAGE_ATTEMPT` rejects, request is marked as failure and is not staged again.
+    """
+    req.stage_attempt = (req.stage_attempt or 0) + 1
+    req.nonce = None
+    req.plain_text = None
+    comment_list = [req.comment or "", msg]
+    if req.stage_attempt >= MAX_STAGE_ATTEMPT:
+        req.tx_status = TxStatus.FAILURE
+        comment_list.append(f"Staging is rejected {req.stage_attempt} times. Check manually.")
+    else:
+        req.tx_status = TxStatus.NOT_CREATED
+    req.comment = "\n".join(comment_list).strip()
 
 
 def handle_request(event, context):
-    account = Account(fetch_kms_key_id(os.environ.get("STAGE"), os.environ.get("REGION_NAME")))
+    account = get_account(os.environ.get("STAGE"), os.environ.get("REGION_NAME"))
     form_sheet = Spreadsheet(GOOGLE_CREDENTIAL, os.environ.get("GOLDEN_DUST_REQUEST_SHEET_ID"))
     work_sheet = Spreadsheet(GOOGLE_CREDENTIAL, os.environ.get("GOLDEN_DUST_WORK_SHEET_ID"))
-    gql = GQL()
-    # Get prev. data
-    prev_tokens = set()
-    prev_treated = set()
-    prev_data = work_sheet.get_values(f"{WORK_SHEET}!C2:{TX_STATUS_COL}").get("values", [])
-    for prev in prev_data:
-        prev_tokens.add(prev[6])
-        prev_treated.add(prev[0].lower())
-
-    # Get form data and filter new
-    form_data = [x for x in form_sheet.get_values(f"{FORM_SHEET}!A2:L").get("values", []) if x[-1] not in prev_tokens]
-    request_data = [WorkData.from_request(x) for x in form_data]
-
-    print(f"{len(request_data)} requests to treat.")
-    # Get Tx. data and validate
-    valid_request = set()
-
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        futures = {}
+    gql = GQL(pool=get_gql_pool())
+    sess = scoped_session(sessionmaker(bind=engine))
+    try:
+        cursor = load_cursor(sess, work_sheet)
+
+        # Get new form data only and filter new
+        form_row = cursor.next_form_row
+        form_data = form_sheet.get_values(f"{FORM_SHEET}!A{form_row}:L").get("values", [])
+        new_data = {}
+        for i, x in enumerate(form_data):
+            work = WorkData.from_request(x, row=form_row + i)
+            # Format errors are kept to mark request invalid after duplication check
+            work.comment.extend(validate_format(x))
+            new_data.setdefault(work.token, work)
+        prev_tokens = set(sess.scalars(
+            select(GoldenDustRequest.token).where(GoldenDustRequest.token.in_(new_data.keys()))
+        ))
+        request_data = [x for x in new_data.values() if x.token not in prev_tokens]
+        prev_treated = set(sess.scalars(
+            select(GoldenDustRequest.request_tx_hash).where(
+                GoldenDustRequest.request_tx_hash.in_([x.request_tx_hash.lower() for x in request_data]),
+                GoldenDustRequest.request_duplicated.is_(False),
+            )
+        ))
+
+        print(f"{len(request_data)} requests to treat from form row {form_row}.")
+        # Get Tx. data and validate
+        target_list = []
         for req in request_data:
             if req.request_tx_hash.lower() in prev_treated:
                 req.comment.append(f"Tx {req.request_tx_hash} is already treated.")
-                req.request_duplicated = True
+                req.request_duplicated = "Duplicated"
                 req.status = WorkStatus.INVALID_CANNOT_REFUND
             else:
-                futures[executor.submit(get_tx_result, req.agent_addr, req.request_tx_hash)] = req
-
-        for i, future in enumerate(concurrent.futures.as_completed(futures)):
-            req = futures[future]
-            tx_data = future.result()
+                prev_treated.add(req.request_tx_hash.lower())
+                if req.comment:
+                    req.status = WorkStatus.INVALID
+                else:
+                    target_list.append(req)
+
+        tx_result_dict = get_tx_result_list([(req.agent_addr, req.request_tx_hash) for req in target_list])
+        failed_tokens = set()
+        for i, req in enumerate(target_list):
+            tx_data = tx_result_dict.get((req.agent_addr, req.request_tx_hash))
+            if tx_data is None:
+                failed_tokens.add(req.token)
+                continue
             req.sent_ncg = tx_data.amount
             req.request_tx_status = tx_data.tx_status
             req.comment.extend(tx_data.comment)
@@ -299,93 +637,129 @@ def handle_request(event, context):
 
             if not req.comment:
                 req.status = WorkStatus.VALID
-                if req.request_tx_hash in valid_request:
-                    req.status = WorkStatus.INVALID_CANNOT_REFUND
-                    req.comment.append(f"Tx {req.request_tx_hash} is duplicated")
-                    req.request_duplicated = "Duplicated"
-                else:
-                    valid_request.add(req.request_tx_hash)
             elif req.status not in (
                     WorkStatus.INVALID, WorkStatus.INVALID_CANNOT_REFUND, WorkStatus.INVALID_CAN_REFUND
             ):
                 # This should be re-checked
                 req.status = WorkStatus.INVALID
 
-            print(f"{i + 1} / {len(futures)} checked")
-
-    # Send Golden Dust
-    nonce = gql.get_next_nonce(account.address)
-    for i, req in enumerate(request_data):
-        if req.status != WorkStatus.VALID:
-            work_sheet.set_values(f"{WORK_SHEET}!A{len(prev_data) + 2 + i}:{PLAIN_VALUE_COL}", [req.values])
-            print(f"{i + 1} / {len(request_data)} is invalid. Skip.")
-            continue
-
-        unsigned_tx = gql.create_action("unload_from_garage", pubkey=account.pubkey, nonce=nonce,
-                                        fav_data=[], avatar_addr=req.avatar_addr,
-                                        item_data=[{"fungibleId": GOLDEN_DUST_FUNGIBLE_ID,
-                                                    "count": req.request_dust_set * GOLDEN_DUST_SET}]
-                                        )
-        signature = account.sign_tx(unsigned_tx)
-        signed_tx = gql.sign(unsigned_tx, signature)
-        success, msg, tx_id = gql.stage(signed_tx)
-        req.nonce = nonce
-        req.plain_text = unsigned_tx.hex()
-        if success:
-            nonce += 1
-            req.tx_status = TxStatus.STAGING
-            req.tx_hash = tx_id
+        # Record to ledger
+        record_list = [x for x in request_data if x.token not in failed_tokens]
+        for i, req in enumerate(record_list):
+            sess.add(req.to_ledger(sheet_row=cursor.next_work_row + i))
+        if failed_tokens:
+            # Read same form rows again at next run. Recorded requests are skipped by token.
+            print(f"Failed to get Tx. data of {len(failed_tokens)} requests. They will be checked at next run.")
         else:
-            req.tx_status = TxStatus.NOT_CREATED
-            req.comment.append(msg)
-
-        print(f"{i + 1} / {len(request_data)} treated with nonce {nonce - 1}")
-        work_sheet.set_values(f"{WORK_SHEET}!A{len(prev_data) + 2 + i}:{PLAIN_VALUE_COL}", [req.values])
-
-    # Write result
-    # work_sheet.set_values(f"{WORK_SHEET}!A{len(prev_data) + 2}:{PLAIN_VALUE_COL}", [req.values for req in request_data])
-    print("Work result recorded to worksheet.")
+            cursor.next_form_row = form_row + len(form_data)
+        cursor.next_work_row += len(record_list)
+        sess.add(cursor)
+        sess.commit()
+
+        # Send Golden Dust
+        recover_nonce(sess, gql, account.address)
+        target_list = sess.scalars(
+            select(GoldenDustRequest).where(
+                GoldenDustRequest.status == WorkStatus.VALID,
+                GoldenDustRequest.tx_status == TxStatus.NOT_CREATED,
+                GoldenDustRequest.nonce.is_(None),
+            ).order_by(GoldenDustRequest.id)
+        ).fetchall()
+        print(f"{len(target_list)} valid requests to send Golden Dust.")
+        if not target_list:
+            return
+
+        nonce = gql.get_next_nonce(account.address)
+        for i, req in enumerate(target_list):
+            unsigned_tx = gql.create_action("unload_from_garage", pubkey=account.pubkey, nonce=nonce,
+                                            fav_data=[], avatar_addr=req.avatar_addr,
+                                            item_data=[{"fungibleId": GOLDEN_DUST_FUNGIBLE_ID,
+                                                        "count": req.request_dust_set * GOLDEN_DUST_SET}]
+                                            )
+            signature = account.sign_tx(unsigned_tx)
+            signed_tx = gql.sign(unsigned_tx, signature)
+            # Record nonce before consuming it, so a request is never sent twice even if this function is killed.
+            req.nonce = nonce
+            req.plain_text = unsigned_tx.hex()
+            req.exported = False
+            sess.commit()
+            success, msg, tx_id = gql.stage(signed_tx)
+            if success:
+                nonce += 1
+                req.tx_status = TxStatus.STAGING
+                req.tx_hash = tx_id
+            else:
+                handle_stage_rejected(req, msg)
+            sess.commit()
+            print(f"{i + 1} / {len(target_list)} treated with nonce {nonce - 1 if success else nonce}")
+    finally:
+        sess.close()
 
 
-def track_tx(event, context):
+def export_sheet(event, context):
+    """
+    Export updated requests in ledger to work sheet.
+    """
     sheet = Spreadsheet(GOOGLE_CREDENTIAL, os.environ.get("GOLDEN_DUST_WORK_SHEET_ID"))
-    tx_data = sheet.get_values(f"{WORK_SHEET}!{TX_HASH_COL}2:{COMMENT_COL}").get("values", [])
-    client = GQL()
-    for i, tx in enumerate(tx_data):
-        if tx[1] != "Staging":
-            print(f"{i + 1} / {len(tx_data)} : Invalid tx. status: {tx[1]}")
-            continue
-        query = dsl_gql(
-            DSLQuery(
-                client.ds.StandaloneQuery.transaction.select(
-                    client.ds.TransactionHeadlessQuery.transactionResult.args(
-                        txId=tx[0]
-                    ).select(
-                        client.ds.TxResultType.txStatus,
-                        client.ds.TxResultType.blockIndex,
-                        client.ds.TxResultType.blockHash,
-                        client.ds.TxResultType.exceptionNames,
-                    )
-                )
-            )
+    sess = scoped_session(sessionmaker(bind=engine))
+    try:
+        req_list = sess.scalars(
+            select(GoldenDustRequest).where(GoldenDustRequest.exported.is_(False)).order_by(GoldenDustRequest.sheet_row)
+        ).fetchall()
+        if not req_list:
+            return
+
+        with sheet.buffered_writer() as writer:
+            for req in req_list:
+                writer.write(f"{WORK_SHEET}!A{req.sheet_row}:{PLAIN_VALUE_COL}", [WorkData.from_ledger(req).values])
+
+        # Requests updated while exporting are exported again at next run
+        sess.execute(
+            update(GoldenDustRequest)
+            .where(tuple_(GoldenDustRequest.id, GoldenDustRequest.updated_at).in_(
+                [(x.id, x.updated_at) for x in req_list]
+            ))
+            .values(exported=True)
         )
-        resp = client.execute(query)
-        logging.debug(resp)
+        sess.commit()
+        print(f"{len(req_list)} requests exported to work sheet with {writer.flush_count} writes.")
+    finally:
+        sess.close()
 
-        if "errors" in resp:
-            logging.error(f"GQL Failed to get tx result: {resp['errors']}")
-            continue
 
-        data = resp["transaction"]["transactionResult"]
-        tx[1] = TxStatus[data["txStatus"]].value
-        tx[2] = data["blockIndex"]
-        if data.get("exceptionNames"):
-            tx[-1] = json.dumps(data["exceptionNames"])
-        sheet.set_values(f"{WORK_SHEET}!{TX_HASH_COL}{i + 2}:{COMMENT_COL}", [tx])
-        print(f"{i + 1} / {len(tx_data)} updated.")
+def track_tx(event, context):
+    sess = scoped_session(sessionmaker(bind=engine))
+    try:
+        req_list = sess.execute(
+            select(GoldenDustRequest.id, GoldenDustRequest.tx_hash, GoldenDustRequest.comment)
+            .where(GoldenDustRequest.tx_status == TxStatus.STAGING)
+        ).all()
+        print(f"{len(req_list)} staging Tx.s to track.")
+        tx_result_dict = get_tx_status_list([x.tx_hash for x in req_list])
+
+        update_list = []
+        for req in req_list:
+            data = tx_result_dict.get(req.tx_hash)
+            if data is None or data["txStatus"] not in TxStatus.__members__:
+                continue
+            tx_status = TxStatus[data["txStatus"]]
+            if tx_status == TxStatus.STAGING:
+                continue
+            update_list.append({
+                "id": req.id, "tx_status": tx_status, "block_index": data["blockIndex"], "exported": False,
+                "comment": json.dumps(data["exceptionNames"]) if data.get("exceptionNames") else req.comment,
+            })
+
+        if update_list:
+            sess.execute(update(GoldenDustRequest), update_list)
+            sess.commit()
+        print(f"{len(update_list)} / {len(req_list)} Tx.s updated.")
+    finally:
+        sess.close()
 
 
 if __name__ == "__main__":
     # handle_request(None, None)
     # track_tx(None, None)
+    # export_sheet(None, None)
     pass
@@ -4,41 +4,29 @@ import os
 from dataclasses import dataclass
 from typing import List, Optional, Tuple, Union
 
-import requests
-from sqlalchemy import create_engine, select
+from sqlalchemy import select
 from sqlalchemy.orm import Session, joinedload, scoped_session, sessionmaker
 
 from common import logger
-from common._crypto import Account
+from common._crypto import get_account
 from common._graphql import GQL
 from common.enums import TxStatus
 from common.models.product import Product
 from common.models.receipt import Receipt
-from common.utils.aws import fetch_secrets, fetch_kms_key_id
+from common.utils.aws import fetch_secrets
+from common.utils.database import create_db_engine
+from common.utils.planet import get_planet_registry
 from common.utils.receipt import PlanetID
 
 DB_URI = os.environ.get("DB_URI")
 db_password = fetch_secrets(os.environ.get("REGION_NAME"), os.environ.get("SECRET_ARN"))["password"]
 DB_URI = DB_URI.replace("[DB_PASSWORD]", db_password)
 CURRENT_PLANET = PlanetID.ODIN if os.environ.get("STAGE") == "mainnet" else PlanetID.ODIN_INTERNAL
-GQL_URL = f"{os.environ.get('headless')}/graphql"
-
-engine = create_engine(DB_URI, pool_size=5, max_overflow=5)
-
-planet_dict = {}
-try:
-    resp = requests.get(os.environ.get("PLANET_URL"))
-    data = resp.json()
-    GQL_URL = None
-    for planet in data:
-        if PlanetID(bytes(planet["id"], "utf-8")) == CURRENT_PLANET:
-            GQL_URL = planet["rpcEndpoints"]["headless.gql"][0]
-            planet_dict = {
-                PlanetID(bytes(k, "utf-8")): v for k, v in planet["bridges"].items()
-            }
-except:
-    # Fail over
-    planet_dict = json.loads(os.environ.get("BRIDGE_DATA", "{}"))
+DEFAULT_GQL_URL_LIST = [f"{os.environ.get('HEADLESS')}/graphql"]
+
+engine = create_db_engine(DB_URI, name="worker")
+
+planet_registry = get_planet_registry()
 
 
 @dataclass
@@ -69,8 +57,8 @@ def process(sess: Session, message: SQSMessageRecord, nonce: int = None) -> Tupl
     stage = os.environ.get("STAGE", "development")
     region_name = os.environ.get("REGION_NAME", "us-east-2")
     logging.debug(f"STAGE: {stage} || REGION: {region_name}")
-    account = Account(fetch_kms_key_id(stage, region_name))
-    gql = GQL(GQL_URL)
+    account = get_account(stage, region_name)
+    gql = GQL(pool=planet_registry.get_gql_pool(CURRENT_PLANET, DEFAULT_GQL_URL_LIST))
     if not nonce:
         nonce = gql.get_next_nonce(account.address)
 
@@ -86,8 +74,9 @@ def process(sess: Session, message: SQSMessageRecord, nonce: int = None) -> Tupl
     memo = json.dumps({"iap": {"g_sku": product.google_sku, "a_sku": product.apple_sku}})
     # Through bridge
     if planet_id != CURRENT_PLANET:
-        agent_address = planet_dict[planet_id]["agent"]
-        avatar_address = planet_dict[planet_id]["avatar"]
+        bridge = planet_registry.get_bridge(CURRENT_PLANET, planet_id)
+        agent_address = bridge.agent
+        avatar_address = bridge.avatar
         memo = json.dumps([message.body.get("agent_addr"), message.body.get("avatar_addr"), memo])
     fav_data = [x.to_fav_data(agent_address=agent_address, avatar_address=avatar_address) for x in product.fav_list]
 
@@ -150,3 +139,4 @@ def handle(event, context):
     finally:
         if sess is not None:
             sess.close()
+        engine.pool_metrics.emit()
@@ -1,8 +1,7 @@
 import os
 
-from common._crypto import Account
+from common._crypto import get_account
 from common._graphql import GQL
-from common.utils.aws import fetch_kms_key_id
 
 stage = os.environ.get("STAGE", "development")
 region_name = os.environ.get("REGION_NAME", "us-east-2")
@@ -17,7 +16,7 @@ def handle(event, context):
         print("!!! Delete your `unload_data.json` to avoid accident !!!")
         return
 
-    account = Account(fetch_kms_key_id(stage, region_name))
+    account = get_account(stage, region_name)
     gql = GQL()
     with open("unload_data.json", "r") as f:
         unload_data = f.read()
@@ -0,0 +1,89 @@
+import os
+import time
+from typing import Tuple
+
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from common import logger
+from common.enums import Store
+from common.utils.apple import get_jwt, get_notification_history_url, iter_refund_notifications
+from common.utils.aws import fetch_secrets, get_parameter_cache
+from common.utils.database import create_db_engine
+from common.utils.google import get_google_client, iter_voided_purchases
+from common.utils.receipt_query import mark_refunded
+
+stage = os.environ.get("STAGE", "development")
+REGION_NAME = os.environ.get("REGION_NAME")
+DB_URI = os.environ.get("DB_URI")
+db_password = fetch_secrets(REGION_NAME, os.environ.get("SECRET_ARN"))["password"]
+DB_URI = DB_URI.replace("[DB_PASSWORD]", db_password)
+
+engine = create_db_engine(DB_URI, name="refund")
+
+# Refunds in last N hours are read at each run. Windows of runs overlap not to miss refunds of failed run,
+# and receipts already refunded are not updated again.
+REFUND_LOOKBACK_HOURS = int(os.environ.get("REFUND_LOOKBACK_HOURS", 48))
+# Production or sandbox history is selected by `APPLE_VALIDATION_URL` of stage, same as receipt validation.
+APPLE_NOTIFICATION_HISTORY_URL = os.environ.get("APPLE_NOTIFICATION_HISTORY_URL") or get_notification_history_url(
+    os.environ.get("APPLE_VALIDATION_URL") or "https://api.storekit.itunes.apple.com"
+)
+
+
+def ingest_google(sess, start: int, end: int) -> Tuple[int, int]:
+    """
+    :return: Number of voided purchases and updated receipts
+    """
+    client = get_google_client(get_parameter_cache(REGION_NAME).get(f"{stage}_9c_IAP_GOOGLE_CREDENTIAL"))
+    found, updated = 0, 0
+    for page in iter_voided_purchases(client, os.environ.get("GOOGLE_PACKAGE_NAME"), start, end):
+        order_id_list = [x["orderId"] for x in page if x.get("orderId")]
+        found += len(order_id_list)
+        updated += mark_refunded(sess, (Store.GOOGLE, Store.GOOGLE_TEST), order_id_list)
+        sess.commit()
+    return found, updated
+
+
+def ingest_apple(sess, start: int, end: int) -> Tuple[int, int]:
+    """
+    :return: Number of refunded transactions and updated receipts
+    """
+    credential = get_parameter_cache(REGION_NAME).get(f"{stage}_9c_IAP_APPLE_CREDENTIAL")
+
+    def get_token() -> str:
+        return get_jwt(credential, os.environ.get("APPLE_BUNDLE_ID"), os.environ.get("APPLE_KEY_ID"),
+                       os.environ.get("APPLE_ISSUER_ID"))
+
+    found, updated = 0, 0
+    for page in iter_refund_notifications(APPLE_NOTIFICATION_HISTORY_URL, get_token, start, end):
+        # Order ID of apple receipt is transaction ID
+        order_id_list = [x["transactionId"] for x in page if x.get("transactionId")]
+        found += len(order_id_list)
+        updated += mark_refunded(sess, (Store.APPLE, Store.APPLE_TEST), order_id_list)
+        sess.commit()
+    return found, updated
+
+
+def ingest_refund(event, context):
+    """
+    Find refunded purchases from stores and mark receipts as `REFUNDED_BY_BUYER`.
+
+    - Google: Voided purchases API
+    - Apple: `REFUND` notifications in App Store Server Notifications history
+
+    Refunds are read page by page and receipts of each page are updated with one bulk UPDATE by store order ID.
+    """
+    end = int(time.time() * 1000)
+    start = end - REFUND_LOOKBACK_HOURS * 60 * 60 * 1000
+    sess = scoped_session(sessionmaker(bind=engine))
+    try:
+        for name, ingest in (("Google", ingest_google), ("Apple", ingest_apple)):
+            try:
+                found, updated = ingest(sess, start, end)
+                logger.info(f"{name}: {updated} receipts are refunded out of {found} refunds")
+            except Exception as e:
+                # Do not let one store block the other
+                sess.rollback()
+                logger.error(f"{name} refund ingestion failed: {e}")
+    finally:
+        sess.close()
+        engine.pool_metrics.emit()
@@ -3,9 +3,8 @@ import os
 from collections import defaultdict
 from typing import Optional, Tuple
 
-import requests
 from gql.dsl import dsl_gql, DSLQuery
-from sqlalchemy import create_engine, select
+from sqlalchemy import select
 from sqlalchemy.orm import sessionmaker, scoped_session
 
 from common import logger
@@ -13,33 +12,24 @@ from common._graphql import GQL
 from common.enums import TxStatus
 from common.models.receipt import Receipt
 from common.utils.aws import fetch_secrets
+from common.utils.database import create_db_engine
 from common.utils.garage import update_iap_garage
+from common.utils.planet import get_planet_registry
 from common.utils.receipt import PlanetID
 
 DB_URI = os.environ.get("DB_URI")
 db_password = fetch_secrets(os.environ.get("REGION_NAME"), os.environ.get("SECRET_ARN"))["password"]
 DB_URI = DB_URI.replace("[DB_PASSWORD]", db_password)
 CURRENT_PLANET = PlanetID.ODIN if os.environ.get("STAGE") == "mainnet" else PlanetID.ODIN_INTERNAL
-GQL_URL = f"{os.environ.get('HEADLESS')}/graphql"
+DEFAULT_GQL_URL_LIST = [f"{os.environ.get('HEADLESS')}/graphql"]
 
-planet_dict = {}
-try:
-    resp = requests.get(os.environ.get("PLANET_URL"))
-    data = resp.json()
-    for d in data:
-        if PlanetID(bytes(d["id"], "utf-8")) == CURRENT_PLANET:
-            GQL_URL = d["rpcEndpoints"]["headless.gql"][0]
-            planet_dict = {
-                PlanetID(bytes(k, "utf-8")): v for k, v in d["bridges"].items()
-            }
-except:
-    planet_dict = json.loads(os.environ.get("BRIDGE_DATA", "{}"))
+planet_registry = get_planet_registry()
 
-engine = create_engine(DB_URI, pool_size=5, max_overflow=5)
+engine = create_db_engine(DB_URI, name="tracker")
 
 
 def process(tx_id: str) -> Tuple[str, Optional[TxStatus], Optional[str]]:
-    client = GQL(GQL_URL)
+    client = GQL(pool=planet_registry.get_gql_pool(CURRENT_PLANET, DEFAULT_GQL_URL_LIST))
     query = dsl_gql(
         DSLQuery(
             client.ds.StandaloneQuery.transaction.select(
@@ -82,8 +72,10 @@ def track_tx(event, context):
         if msg:
             receipt.msg = "\n".join([receipt.msg or "", msg])
         sess.add(receipt)
-    update_iap_garage(sess, planet_dict[PlanetID.ODIN if os.environ.get("STAGE") == "mainnet" else PlanetID.ODIN_INTERNAL])
+    update_iap_garage(sess, pool=planet_registry.get_gql_pool(CURRENT_PLANET, DEFAULT_GQL_URL_LIST))
     sess.commit()
+    sess.close()
+    engine.pool_metrics.emit()
 
     logger.info(f"{len(receipt_list)} transactions are found to track status")
     for status, tx_list in result.items():
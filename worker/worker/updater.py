@@ -1,11 +1,11 @@
 import concurrent.futures
 import os
 
-from sqlalchemy import create_engine
 from sqlalchemy.orm import scoped_session, sessionmaker
 
 from common import logger
-from common.utils.aws import fetch_secrets, fetch_parameter
+from common.utils.aws import fetch_secrets, get_parameter_cache
+from common.utils.database import create_db_engine
 from common.utils.google import update_google_price
 
 stage = os.environ.get("STAGE", "development")
@@ -13,15 +13,14 @@ DB_URI = os.environ.get("DB_URI")
 secrets = fetch_secrets(os.environ.get("REGION_NAME"), os.environ.get("SECRET_ARN"))
 DB_URI = DB_URI.replace("[DB_PASSWORD]", secrets["password"])
 
-engine = create_engine(DB_URI, pool_size=5, max_overflow=5)
+engine = create_db_engine(DB_URI, name="updater")
 
 
 def update_google() -> str:
     sess = scoped_session(sessionmaker(bind=engine))
-    google_credential = fetch_parameter(
-        os.environ.get("REGION_NAME"),
+    google_credential = get_parameter_cache(os.environ.get("REGION_NAME")).get(
         f"{stage}_9c_IAP_GOOGLE_CREDENTIAL", True
-    )["Value"]
+    )
 
     try:
         updated_product_count, updated_price_count = update_google_price(
@@ -65,7 +65,7 @@ class WorkerStack(Stack):
         )
         role.add_to_policy(
             _iam.PolicyStatement(
-                actions=["ssm:GetParameter"],
+                actions=["ssm:GetParameter", "ssm:GetParameters"],
                 resources=[
                     shared_stack.google_credential_arn,
                     shared_stack.apple_credential_arn,
@@ -233,6 +233,52 @@ class WorkerStack(Stack):
 
         minute_event_rule.add_target(_event_targets.LambdaFunction(gd_tracker))
 
+        # Golden dust work sheet exporter
+        gd_exporter = _lambda.Function(
+            self, f"{config.stage}-9c-iap-goldendust-exporter-function",
+            function_name=f"{config.stage}-9c-iap-goldendust-exporter",
+            runtime=_lambda.Runtime.PYTHON_3_10,
+            description=f"Export golden dust request ledger to work sheet",
+            code=_lambda.AssetCode("worker/worker", exclude=exclude_list),
+            handler="golden_dust_by_ncg.export_sheet",
+            layers=[layer],
+            role=role,
+            vpc=shared_stack.vpc,
+            timeout=cdk_core.Duration.seconds(50),
+            environment=env,
+            memory_size=256,
+            reserved_concurrent_executions=1,
+        )
+
+        minute_event_rule.add_target(_event_targets.LambdaFunction(gd_exporter))
+
+        # Refund ingestion from store refund lists
+        env["APPLE_BUNDLE_ID"] = config.apple_bundle_id
+        env["APPLE_KEY_ID"] = config.apple_key_id
+        env["APPLE_ISSUER_ID"] = config.apple_issuer_id
+        env["APPLE_VALIDATION_URL"] = config.apple_validation_url
+        refund = _lambda.Function(
+            self, f"{config.stage}-9c-iap-refund-function",
+            function_name=f"{config.stage}-9c-iap-refund",
+            runtime=_lambda.Runtime.PYTHON_3_10,
+            description="Refund ingestion from google voided purchases and apple refund notifications",
+            code=_lambda.AssetCode("worker/worker", exclude=exclude_list),
+            handler="refund.ingest_refund",
+            layers=[layer],
+            role=role,
+            vpc=shared_stack.vpc,
+            timeout=cdk_core.Duration.minutes(5),
+            environment=env,
+            memory_size=256,
+            reserved_concurrent_executions=1,
+        )
+
+        hourly_refund_event_rule = _events.Rule(
+            self, f"{config.stage}-9c-iap-refund-event",
+            schedule=_events.Schedule.cron(minute="30")  # Every hour
+        )
+        hourly_refund_event_rule.add_target(_event_targets.LambdaFunction(refund))
+
         # Manual unload function
         # This function does not have trigger. Go to AWS console and run manually.
         if config.stage != "mainnet":